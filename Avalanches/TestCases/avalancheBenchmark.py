@@ -0,0 +1,333 @@
+##############################################################################
+# Project: Test Case Data Generation for Neuronal Avalanche Detection Program
+# Creation Date: 10/18/2026
+# Date of Last Modification: 10/18/2026
+##############################################################################
+# Purpose:	To measure how the avalanche detection programs scale, using
+#           workloads with a known number of avalanches made by the test case
+#           generators in this directory.
+#
+# For every workload (generator x spike count) and every engine the benchmark
+# records the wall time, spikes/sec, the peak RSS of the engine process and
+# whether the number of avalanches found matches the ground truth. Results
+# are written as JSON; with --baseline, the throughput of every run is
+# compared with an earlier results file and slowdowns are reported.
+#
+# Ground truth follows the generators' thresholds (TAU = 50 time steps,
+# RADIUS = 8 neuron distances): spikes of one avalanche are chained within
+# both, and avalanches (and single spikes) are more than TAU apart.
+#   - spatiotemporal: number of generated avalanches
+#   - temporal: runs of spikes with gaps < TAU, at least 2 spikes long
+#
+# Workloads are cached in --data-dir as <case>_<spikes>_<seed>.csv plus a
+# .json file with the ground truth, so each one is generated only once. The
+# vectorized case (vectorizedAvalanches.py) is generated with NumPy and also
+# writes the ground truth label of every spike; use it for large --sizes.
+
+import argparse
+import contextlib
+import csv
+import io
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import basicAvalanches
+import mergingAvalanches
+import noAvSpatial
+import noAvTemporal
+import vectorizedAvalanches
+
+# generator thresholds, see spatialCheck() and the time steps in the generators
+TAU = 50
+RADIUS = 8
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PYTHON_DIR = os.path.join(HERE, '..', 'python')
+DEFAULT_SIZES = [10 ** 4, 10 ** 5, 10 ** 6]
+
+# ---------------------------------------------------------------------------
+# Engines
+# Each engine is run as its own process on an allSpikeTime.csv style input
+# and writes <input>_size.csv (one line per avalanche), or the table named by
+# output (after header lines). truth names the ground truth the avalanche
+# count is checked against (None: not checked).
+ENGINES = {
+    'clustering': {
+        'command': lambda infile: [sys.executable, os.path.join(PYTHON_DIR, 'clustering.py'),
+                                   infile, str(TAU), str(RADIUS)],
+        'truth': 'spatiotemporal',
+    },
+    # the same clustering split over all cores (time partitions, see parallelClustering.py)
+    'clustering-parallel': {
+        'command': lambda infile: [sys.executable, os.path.join(PYTHON_DIR, 'clustering.py'),
+                                   infile, str(TAU), str(RADIUS), str(max(2, os.cpu_count()))],
+        'truth': 'spatiotemporal',
+    },
+    # temporal grouping by meanISI followed by a spatial filter (fixed thresholds)
+    'clustering1': {
+        'command': lambda infile: [sys.executable, os.path.join(PYTHON_DIR, 'clustering1.py'), infile],
+        'truth': None,
+    },
+    # vectorized temporal-only detection, with the benchmark's TAU as meanISI
+    'temporal': {
+        'command': lambda infile: [sys.executable, os.path.join(PYTHON_DIR, 'temporalAvalanches.py'),
+                                   infile, '--mean-isi', str(TAU)],
+        'output': lambda infile: os.path.join(os.path.dirname(infile), 'allAvalanche.csv'),
+        'header': 1,
+        'truth': 'temporal',
+    },
+}
+
+
+# ---------------------------------------------------------------------------
+# Workload generation
+# Each case returns (temporalQueue, number of avalanches) for about numSpikes
+# spikes; temporalQueue holds (timestamp, [(x, y), ...]) tuples.
+def caseBasic(numSpikes):
+    # 10% single spikes, avalanches of about 100 spikes on average
+    singles = numSpikes // 10
+    avalanches = max(1, (numSpikes - singles) // 100)
+    return basicAvalanches.makeStuff(numSpikes - singles, avalanches, singles), avalanches
+
+
+def caseMerging(numSpikes):
+    # every avalanche is two branches of length spikes joined at a root
+    avalanches = max(1, int(math.sqrt(numSpikes / 8)))
+    length = max(2 * avalanches, (numSpikes // avalanches - 1) // 2)
+    return mergingAvalanches.makeStuff(length, avalanches), avalanches
+
+
+def caseNoAvSpatial(numSpikes):
+    return noAvSpatial.generateData(numSpikes), 0
+
+
+def caseNoAvTemporal(numSpikes):
+    return noAvTemporal.generateData(numSpikes, False), 0
+
+
+CASES = {
+    'basic': caseBasic,
+    'merging': caseMerging,
+    'noAvSpatial': caseNoAvSpatial,
+    'noAvTemporal': caseNoAvTemporal,
+    'vectorized': None,
+}
+
+# cases that write the workload themselves, seeded with a numpy Generator
+# (fast enough for 1e8 spikes); they return the ground truth
+DIRECT_CASES = {
+    # as basic, but avalanche sizes follow a power law (alpha = 2, up to 1e4 spikes)
+    'vectorized': lambda path, numSpikes, seed: vectorizedAvalanches.makeData(
+        path, numSpikes, seed, alpha=2.0, maxSize=10 ** 4),
+}
+
+
+# ---------------------------------------------------------------------------
+# Temporal ground truth
+# runs of spikes whose gaps are all < TAU, counted when they hold 2+ spikes
+def temporalAvalanches(times, counts, tau=TAU):
+    if len(times) == 0:
+        return 0
+    starts = np.flatnonzero(np.diff(times) >= tau) + 1
+    sizes = np.add.reduceat(counts, np.concatenate(([0], starts)))
+    return int(np.sum(sizes > 1))
+
+
+# ---------------------------------------------------------------------------
+# Write one workload
+# rows of the same timestamp are merged, as in a real allSpikeTime.csv
+def writeWorkload(path, queue):
+    grid = basicAvalanches.makeGrid()
+    rows = {}
+    for timestamp, spikes in queue:
+        rows.setdefault(timestamp, []).extend(grid[x][y] for x, y in spikes)
+    times = np.array(sorted(rows), dtype=np.int64)
+    counts = np.array([len(rows[t]) for t in times], dtype=np.int64)
+    with open(path, 'w', newline='') as csvfile:
+        write = csv.writer(csvfile)
+        for t in times.tolist():
+            write.writerow([t] + rows[t])
+    return times, counts
+
+
+def makeWorkload(dataDir, case, numSpikes, seed):
+    name = case + '_' + str(numSpikes) + '_' + str(seed)
+    path = os.path.join(dataDir, name + '.csv')
+    truthFile = os.path.join(dataDir, name + '.json')
+    if os.path.isfile(path) and os.path.isfile(truthFile):
+        with open(truthFile) as f:
+            return path, json.load(f)
+
+    start = time.time()
+    if case in DIRECT_CASES:
+        data = DIRECT_CASES[case](path, numSpikes, seed)
+        # events are more than TAU apart, so every avalanche is also a temporal one
+        truth = {'case': case, 'seed': seed, 'spikes': data['spikes'],
+                 'tau': TAU, 'radius': RADIUS,
+                 'spatiotemporal': data['avalanches'],
+                 'temporal': data['avalanches'],
+                 'generateSeconds': time.time() - start}
+        with open(truthFile, 'w') as f:
+            json.dump(truth, f, indent=1)
+        return path, truth
+
+    random.seed(seed)
+    # some generators print every spike they make
+    with contextlib.redirect_stdout(io.StringIO()):
+        queue, avalanches = CASES[case](numSpikes)
+    times, counts = writeWorkload(path, queue)
+    truth = {'case': case, 'seed': seed, 'spikes': int(counts.sum()), 'timesteps': len(times),
+             'tau': TAU, 'radius': RADIUS,
+             'spatiotemporal': avalanches,
+             'temporal': temporalAvalanches(times, counts),
+             'generateSeconds': time.time() - start}
+    with open(truthFile, 'w') as f:
+        json.dump(truth, f, indent=1)
+    return path, truth
+
+
+# ---------------------------------------------------------------------------
+# Run one engine
+# the input is linked into a scratch directory so outputs land there
+def runEngine(name, infile, truth, timeout):
+    engine = ENGINES[name]
+    scratch = tempfile.mkdtemp(prefix='bench_')
+    try:
+        link = os.path.join(scratch, os.path.basename(infile))
+        os.symlink(os.path.abspath(infile), link)
+        command = engine['command'](link)
+
+        # stderr goes to a file, a full pipe would stall the engine
+        errFile = open(os.path.join(scratch, 'stderr.txt'), 'w+')
+        start = time.time()
+        proc = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=errFile,
+                                cwd=os.path.dirname(command[1]))
+        status = 'ok'
+        try:
+            # wait4 gives the resource usage of this child alone
+            while True:
+                pid, exitStatus, usage = os.wait4(proc.pid, os.WNOHANG)
+                if pid != 0:
+                    break
+                if timeout and time.time() - start > timeout:
+                    proc.kill()
+                    pid, exitStatus, usage = os.wait4(proc.pid, 0)
+                    status = 'timeout'
+                    break
+                time.sleep(0.01)
+        finally:
+            proc.returncode = 0     # reaped above, keep Popen from waiting again
+        seconds = time.time() - start
+        errFile.seek(0)
+        stderr = errFile.read()
+        errFile.close()
+        if status == 'ok' and exitStatus != 0:
+            status = 'failed'
+
+        found = None
+        sizeFile = engine['output'](link) if 'output' in engine else os.path.splitext(link)[0] + '_size.csv'
+        if status == 'ok' and os.path.isfile(sizeFile):
+            with open(sizeFile) as f:
+                found = sum(1 for line in f if line.strip()) - engine.get('header', 0)
+
+        expected = truth.get(engine['truth']) if engine['truth'] else None
+        result = {'engine': name, 'status': status, 'seconds': seconds,
+                  'spikesPerSecond': truth['spikes'] / seconds if status == 'ok' and seconds > 0 else None,
+                  # ru_maxrss is in kilobytes on Linux
+                  'peakRssMB': usage.ru_maxrss / 1024.0,
+                  'truth': engine['truth'], 'expected': expected, 'found': found,
+                  'correct': (found == expected) if expected is not None and found is not None else None}
+        if status == 'failed':
+            result['error'] = stderr.strip().splitlines()[-1:]
+        return result
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------------
+# Compare with an earlier results file
+# returns the runs that are slower than the baseline by more than tolerance
+def compareBaseline(results, baselineFile, tolerance):
+    with open(baselineFile) as f:
+        baseline = json.load(f)
+    key = lambda r: (r['case'], r['spikes'], r['engine'])
+    old = {key(r): r for r in baseline['results']}
+    regressions = []
+    for r in results:
+        b = old.get(key(r))
+        if b is None or not b.get('spikesPerSecond') or not r.get('spikesPerSecond'):
+            continue
+        ratio = r['spikesPerSecond'] / b['spikesPerSecond']
+        r['baselineRatio'] = ratio
+        if ratio < 1 - tolerance:
+            regressions.append(r)
+    return regressions
+
+
+def gitVersion():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=HERE,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# main()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the avalanche detection engines')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='spike counts of the workloads (default: 1e4 1e5 1e6)')
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=sorted(CASES),
+                        help='test case generators to use')
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES),
+                        help='engines to run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join('.', 'data', 'benchmark'),
+                        help='where generated workloads are kept')
+    parser.add_argument('--timeout', type=float, default=3600,
+                        help='seconds before an engine run is stopped (0: no limit)')
+    parser.add_argument('--output', default='benchmark.json', help='results file')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed throughput drop against the baseline (default: 0.2)')
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    for numSpikes in args.sizes:
+        for case in args.cases:
+            infile, truth = makeWorkload(args.data_dir, case, numSpikes, args.seed)
+            for name in args.engines:
+                r = runEngine(name, infile, truth, args.timeout)
+                r.update({'case': case, 'spikes': truth['spikes'], 'workload': os.path.basename(infile)})
+                results.append(r)
+                rate = '%12.0f spikes/s' % r['spikesPerSecond'] if r['spikesPerSecond'] else '%20s' % r['status']
+                print(f"{case:14s} {truth['spikes']:>11d} {name:14s} {rate} {r['peakRssMB']:9.1f} MB"
+                      f"  found {r['found']} expected {r['expected']}")
+
+    report = {'version': gitVersion(), 'python': platform.python_version(),
+              'machine': platform.node(), 'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'tau': TAU, 'radius': RADIUS, 'results': results}
+    regressions = []
+    if args.baseline:
+        regressions = compareBaseline(results, args.baseline, args.tolerance)
+        for r in regressions:
+            print(f"Slower than baseline: {r['case']} {r['spikes']} {r['engine']} "
+                  f"({r['baselineRatio']:.2f}x)")
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f'Results written to {args.output}')
+
+    incorrect = [r for r in results if r['correct'] is False]
+    sys.exit(1 if regressions or incorrect else 0)
@@ -148,6 +148,8 @@ def makeStuff(numSpikes, numAvalanches, singleSpikes):
             spikesRemainingAva = spikesRemainingAva - spikesToUse
             avalanchesRemaining = avalanchesRemaining - 1
             temporalQueue = temporalQueue + tempQueue
+            # continue after the last spike of this avalanche, not its first
+            currentTime = tempQueue[-1][0]
 
         currentTime = currentTime + random.randint(51, 1400)
 
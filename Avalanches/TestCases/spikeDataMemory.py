@@ -0,0 +1,147 @@
+##############################################################################
+# Project: Test Case Data Generation for Neuronal Avalanche Detection Program
+# Creation Date: 10/18/2026
+# Date of Last Modification: 10/18/2026
+##############################################################################
+# Purpose:	To measure the memory used per spike by the Spike/Avalanche
+#           classes in SpikeData.py, against the object-per-spike layout they
+#           replaced.
+#
+# The spikes of a workload (an allSpikeTime.csv style file, e.g. one written
+# by avalancheBenchmark.py, or a basicAvalanches.py workload generated on the
+# fly) are grouped into avalanches the way clustering1.py does it (a new
+# avalanche whenever the gap to the previous spike is at least meanISI), once
+# with the current classes and once with LegacyAvalanche, a copy of the old
+# classes. tracemalloc reports the memory held once all avalanches are built.
+#
+# LegacyAvalanche.add_node appends at the tail instead of walking the list
+# from the head, which keeps large workloads tractable and does not change
+# the memory used.
+
+import argparse
+import csv
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+import numpy as np
+
+import basicAvalanches
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python'))
+import SpikeData
+
+MEAN_ISI = 50       # temporal grouping threshold (time steps), as TAU in the benchmark
+
+
+# ---------------------------------------------------------------------------
+# Legacy classes
+# one Python object per spike holding NumPy scalars, as SpikeData.py had them
+class LegacySpike(object):
+    def __init__(self, ts, i):
+        self.ts = ts
+        self.id = i
+        self.next = None
+        self.prev = None
+
+
+class LegacyAvalanche(object):
+    def __init__(self):
+        self.head = None
+        self.tail = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add_node(self, ts, i):
+        new_node = LegacySpike(ts, i)
+        if self.head is None:
+            self.head = new_node
+        else:
+            self.tail.next = new_node
+            new_node.prev = self.tail
+        self.tail = new_node
+        self.size = self.size + 1
+
+
+# ---------------------------------------------------------------------------
+# Read a workload
+# returns (timestamps, ids) rows as clustering1.py reads them
+def readWorkload(path):
+    rows = []
+    with open(path) as f:
+        for line in csv.reader(f, delimiter=','):
+            rows.append((int(line[0]), [int(n) for n in line[1:] if n.strip()]))
+    return rows
+
+
+def makeWorkload(numSpikes, seed):
+    random.seed(seed)
+    grid = basicAvalanches.makeGrid()
+    singles = numSpikes // 10
+    queue = basicAvalanches.makeStuff(numSpikes - singles, max(1, (numSpikes - singles) // 100), singles)
+    rows = {}
+    for timestamp, spikes in queue:
+        rows.setdefault(timestamp, []).extend(grid[x][y] for x, y in spikes)
+    return sorted(rows.items())
+
+
+# ---------------------------------------------------------------------------
+# Build the avalanches and measure them
+def buildAvalanches(rows, makeAvalanche):
+    A = []
+    for ts, ids in rows:
+        current_ts = np.uint32(ts)
+        for n in ids:
+            current_id = np.uint16(n)
+            if len(A) > 0 and (current_ts - A[-1].tail.ts) < MEAN_ISI:
+                A[-1].add_node(current_ts, current_id)
+            else:
+                new_a = makeAvalanche()
+                A.append(new_a)
+                new_a.add_node(current_ts, current_id)
+    return A
+
+
+def measure(rows, makeAvalanche):
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    A = buildAvalanches(rows, makeAvalanche)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return used, len(A)
+
+
+# ---------------------------------------------------------------------------
+# main()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bytes per spike of the SpikeData classes')
+    parser.add_argument('workload', nargs='?', help='allSpikeTime.csv style file')
+    parser.add_argument('--spikes', type=int, default=100000,
+                        help='size of the generated workload when no file is given')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    rows = readWorkload(args.workload) if args.workload else makeWorkload(args.spikes, args.seed)
+    numSpikes = sum(len(ids) for ts, ids in rows)
+
+    results = {'spikes': numSpikes}
+    # every avalanche of the run shares one (still empty) pool
+    pool = SpikeData.SpikePool()
+    for name, makeAvalanche in (('legacy', LegacyAvalanche),
+                                ('struct-of-arrays', lambda: SpikeData.Avalanche(pool))):
+        used, avalanches = measure(rows, makeAvalanche)
+        results[name] = {'bytes': used, 'bytesPerSpike': used / numSpikes, 'avalanches': avalanches}
+        print(f'{name:18s} {used / numSpikes:8.1f} bytes/spike  ({used} bytes, {avalanches} avalanches)')
+
+    print(f"{numSpikes} spikes, {results['legacy']['bytes'] / results['struct-of-arrays']['bytes']:.1f}x smaller")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=1)
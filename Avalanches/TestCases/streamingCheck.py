@@ -0,0 +1,105 @@
+##############################################################################
+# Project: Test Case Data Generation for Neuronal Avalanche Detection Program
+# Creation Date: 10/18/2026
+# Date of Last Modification: 10/18/2026
+##############################################################################
+# Purpose:	To check that the streaming AvalancheEngine (a sink, retiring
+#           closed avalanches and trimming their spikes) finds the same
+#           avalanches as the engine that keeps every spike.
+#
+# Workloads are small random grids with many spikes per time step, so open
+# and closed avalanches interleave and trims cut through retired ones.
+# TRIM_SIZE is lowered to trim as often as possible. For every workload the
+# streaming output (size, StartT, EndT and member spikes, in the order of
+# their first spike) must equal avalanches() of the full engine, also when
+# the run is checkpointed (saveCheckpoint() trims too) and resumed half way.
+# Exits with status 1 on the first mismatch.
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..', 'python'))
+import avalancheEngine
+from avalancheEngine import AvalancheEngine, loadCheckpoint, saveCheckpoint
+from neuronLayout import gridLayout
+
+TAU = 2.5
+RADIUS = 1.5
+
+
+# ---------------------------------------------------------------------------
+# Random workload
+# rows of (time step, neuron ids) on a grid x grid layout
+def makeRows(rng, grid):
+    rows = []
+    t = 0
+    for k in range(rng.randint(5, 150)):
+        t += rng.choice([1, 1, 2, 3, 5])
+        rows.append((t, rng.sample(range(1, grid * grid + 1), rng.randint(1, min(12, grid * grid)))))
+    return rows
+
+
+def reference(layout, rows):
+    engine = AvalancheEngine(*layout, tau=TAU, radius=RADIUS)
+    for t, ids in rows:
+        engine.addTimestep(t, ids)
+    table = engine.avalanches()
+    return [(int(size), int(start), int(end), [engine.nid[j] for j in engine.members(int(r))])
+            for size, start, end, r in zip(table['size'], table['StartT'], table['EndT'], table['root'])]
+
+
+class ListSink(object):
+    # avalanches in memory; state() as the file sinks' for saveCheckpoint()
+    def __init__(self):
+        self.out = []
+
+    def __call__(self, x):
+        self.out.append((x['size'], x['StartT'], x['EndT'], x['ids']))
+
+    def state(self):
+        return {'count': len(self.out)}
+
+
+def streaming(layout, rows, checkpoint=None):
+    sink = ListSink()
+    engine = AvalancheEngine(*layout, tau=TAU, radius=RADIUS, sink=sink, members=True)
+    for k, (t, ids) in enumerate(rows):
+        engine.addTimestep(t, ids)
+        if checkpoint and k == len(rows) // 2:
+            # continue in a new engine from the checkpoint
+            saveCheckpoint(checkpoint, engine, k + 1)
+            state, sinkState, position = loadCheckpoint(checkpoint)
+            engine = AvalancheEngine(*layout, tau=TAU, radius=RADIUS, sink=sink, members=True)
+            engine.setState(state)
+    engine.finish()
+    return sink.out
+
+
+# ---------------------------------------------------------------------------
+# main()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare streaming and full AvalancheEngine output')
+    parser.add_argument('--workloads', type=int, default=400)
+    parser.add_argument('--trim-size', type=int, default=2, help='TRIM_SIZE of the streaming engine')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    avalancheEngine.TRIM_SIZE = args.trim_size
+    rng = random.Random(args.seed)
+    checkpoint = os.path.join(tempfile.mkdtemp(), 'checkpoint.npz')
+    for w in range(args.workloads):
+        grid = rng.randint(3, 8)
+        layout = gridLayout(grid)
+        rows = makeRows(rng, grid)
+        expected = reference(layout, rows)
+        for name, path in (('streaming', None), ('checkpointed', checkpoint)):
+            if streaming(layout, rows, path) != expected:
+                print(f"workload {w} (grid {grid}, seed {args.seed}): {name} output differs")
+                sys.exit(1)
+    os.remove(checkpoint)
+    os.rmdir(os.path.dirname(checkpoint))
+    print(f"{args.workloads} workloads: streaming output matches (TRIM_SIZE {args.trim_size})")
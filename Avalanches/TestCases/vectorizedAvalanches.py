@@ -0,0 +1,269 @@
+##############################################################################
+# Project: Test Case Data Generation for Neuronal Avalanche Detection Program
+# Creation Date: 10/18/2026
+# Date of Last Modification: 10/18/2026
+##############################################################################
+# Purpose:	To create large test cases (1e8 spikes and more) with a known
+#           avalanche for every spike, using NumPy instead of one
+#           random.randint() call per spike.
+#
+# The data follows basicAvalanches.py: avalanches are chains of spikes where
+# each spike is less than RADIUS from the previous one and less than TAU time
+# steps after it (the time step advances with probability 0.7, else the spike
+# shares the previous spike's time step). Avalanches and single spikes are
+# separated by more than TAU time steps, so every avalanche is exactly one
+# cluster of the detection programs and single spikes join nothing.
+#
+# Whole avalanches are sampled as arrays:
+#   - a step of the chain is drawn directly from the integer offsets inside
+#     the RADIUS disk (no rejection loop); positions are the running sum of
+#     the steps, folded back at the grid edges (folding never lengthens a
+#     step, so the chain stays within RADIUS)
+#   - time offsets are the running sum of the per-spike gaps
+#   - neuron numbers come from (x, y) directly: y * GRID + x + 1
+#   - a neuron spikes at most once per time step: a spike that repeats an
+#     earlier (time step, neuron) of its event (a chain stepping back within
+#     one time step, or a step folded to no move at the edge) gets its step
+#     redrawn, which keeps event sizes and labels as planned
+# Events (avalanches and single spikes, in random order) are generated and
+# written CHUNK_SIZE spikes at a time, to a spike store (see spikeStore.py)
+# or an allSpikeTime.csv file, together with the ground truth label of every
+# spike (int32, the avalanche number or -1 for single spikes) in labels.bin.
+# All randomness comes from one seeded numpy.random.Generator.
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..', 'python'))
+from spikeStore import SpikeStore, SpikeStoreWriter
+
+GRID = 100              # 100 x 100 neurons
+TAU = 50                # temporal threshold of the generators
+RADIUS = 8              # spatial threshold of the generators
+MAX_GAP = 1400          # gaps between events are TAU + 1 .. MAX_GAP time steps
+SAME_STEP = 0.3         # chance that a spike shares the previous spike's time step
+CHUNK_SIZE = 1 << 20    # spikes generated and written at a time
+
+
+# ---------------------------------------------------------------------------
+# Disk offsets
+# every integer (dx, dy) != (0, 0) with dx^2 + dy^2 < radius^2
+def diskOffsets(radius=RADIUS):
+    r = int(np.ceil(radius))
+    dx, dy = np.meshgrid(np.arange(-r, r + 1), np.arange(-r, r + 1))
+    inside = (dx * dx + dy * dy < radius * radius) & ((dx != 0) | (dy != 0))
+    return np.column_stack((dx[inside], dy[inside]))
+
+
+# ---------------------------------------------------------------------------
+# Avalanche sizes
+# at least 2 spikes each: 1 + geometric (mean meanSize), or a discrete
+# power law P(s) ~ s^-alpha for s >= 2 (Zipf, redrawn above maxSize)
+def avalancheSizes(rng, count, meanSize=100, alpha=None, maxSize=None):
+    if alpha is None:
+        return 1 + rng.geometric(1.0 / max(meanSize - 1, 1), size=count)
+    sizes = rng.zipf(alpha, size=count) + 1
+    if maxSize:
+        big = sizes > maxSize
+        while big.any():
+            sizes[big] = rng.zipf(alpha, size=int(big.sum())) + 1
+            big = sizes > maxSize
+    return sizes
+
+
+# ---------------------------------------------------------------------------
+# Plan events
+# sizes of the events (avalanches and single spikes) in time order, and the
+# avalanche number of each (-1 for a single spike), for numSpikes spikes
+def planEvents(rng, numSpikes, singleFraction=0.1, **sizeArgs):
+    singles = int(round(numSpikes * singleFraction))
+    target = numSpikes - singles
+    sizes = []
+    total = 0
+    while total < target:
+        batch = avalancheSizes(rng, max(16, (target - total) // 50 + 1), **sizeArgs)
+        sizes.append(batch)
+        total += int(batch.sum())
+    sizes = np.concatenate(sizes) if sizes else np.empty(0, dtype=np.int64)
+    # cut at the target, the last avalanche keeps at least 2 spikes
+    end = np.cumsum(sizes)
+    count = int(np.searchsorted(end, target, side='left')) + 1 if target > 0 else 0
+    sizes = sizes[:count]
+    if count:
+        sizes[-1] -= end[count - 1] - target
+        if sizes[-1] < 2:
+            singles -= 2 - int(sizes[-1])
+            sizes[-1] = 2
+    singles = max(singles, 0)
+
+    eventSize = np.concatenate((sizes, np.ones(singles, dtype=np.int64)))
+    eventLabel = np.concatenate((np.arange(count), np.full(singles, -1)))
+    order = rng.permutation(len(eventSize))
+    # avalanches keep their numbers in time order
+    eventSize = eventSize[order]
+    eventLabel = eventLabel[order]
+    aval = eventLabel >= 0
+    eventLabel[aval] = np.arange(int(aval.sum()))
+    return eventSize, eventLabel
+
+
+# ---------------------------------------------------------------------------
+# Repeated spikes
+# mask of the spikes whose (ts, neuron) already occurred earlier in the arrays
+def repeatedSpikes(ts, neuron):
+    key = np.asarray(ts, dtype=np.int64) * (1 << 32) + np.asarray(neuron, dtype=np.int64)
+    repeated = np.ones(len(key), dtype=bool)
+    repeated[np.unique(key, return_index=True)[1]] = False
+    return repeated
+
+
+# ---------------------------------------------------------------------------
+# Generate spikes
+# yields (ts, neuron, label) arrays of about chunkSize spikes in time order;
+# a chunk always ends with a whole event
+def generateSpikes(rng, eventSize, eventLabel, grid=GRID, tau=TAU, radius=RADIUS,
+                   maxGap=MAX_GAP, chunkSize=CHUNK_SIZE):
+    offsets = diskOffsets(radius)
+    period = 2 * (grid - 1)
+    end = np.cumsum(eventSize)
+    lastT = int(rng.integers(0, 601)) - (tau + 1)
+    e0 = 0
+    while e0 < len(eventSize):
+        done = int(end[e0 - 1]) if e0 else 0
+        e1 = max(e0 + 1, int(np.searchsorted(end, done + chunkSize, side='right')))
+        size = eventSize[e0:e1]
+        n = int(size.sum())
+        first = np.concatenate(([0], np.cumsum(size)[:-1]))
+        event = np.repeat(np.arange(len(size)), size)
+
+        # time offsets within the event: the time step advances by 0..tau-1
+        gaps = rng.integers(0, tau, size=n) * (rng.random(n) >= SAME_STEP)
+        gaps[first] = 0
+        offsetT = np.cumsum(gaps)
+        offsetT -= np.repeat(offsetT[first], size)
+        duration = offsetT[first + size - 1]
+        # events start more than tau after the previous one ends
+        between = rng.integers(tau + 1, maxGap + 1, size=len(size))
+        start = lastT + np.cumsum(between) + np.concatenate(([0], np.cumsum(duration)[:-1]))
+        lastT = int(start[-1] + duration[-1])
+        ts = start[event] + offsetT
+
+        # positions: a start anywhere on the grid, then steps inside the disk
+        steps = offsets[rng.integers(0, len(offsets), size=n)]
+        steps[first] = rng.integers(0, grid, size=(len(size), 2))
+        while True:
+            pos = np.cumsum(steps, axis=0)
+            pos -= np.repeat(pos[first] - steps[first], size, axis=0)
+            pos %= period
+            pos = np.where(pos > grid - 1, period - pos, pos)
+            neuron = pos[:, 1] * grid + pos[:, 0] + 1
+            # events do not share time steps, so only steps inside an event
+            # repeat a spike, never the first one of an event
+            repeated = repeatedSpikes(ts, neuron)
+            if not repeated.any():
+                break
+            steps[repeated] = offsets[rng.integers(0, len(offsets), size=int(repeated.sum()))]
+        yield ts, neuron, np.repeat(eventLabel[e0:e1], size).astype(np.int32)
+        e0 = e1
+
+
+# ---------------------------------------------------------------------------
+# Writers
+# spike store directory (labels.bin inside) or allSpikeTime.csv (labels in
+# <name>_labels.bin); both return the number of spikes written
+def writeStore(path, chunks):
+    with SpikeStoreWriter(path) as writer, open(os.path.join(path, 'labels.bin'), 'wb') as labels:
+        for ts, neuron, label in chunks:
+            writer.appendArrays(ts, neuron)
+            label.tofile(labels)
+    return writer.count
+
+
+def writeCsv(path, chunks):
+    count = 0
+    with open(path, 'w') as f, open(os.path.splitext(path)[0] + '_labels.bin', 'wb') as labels:
+        for ts, neuron, label in chunks:
+            # one row per time step, as in a real allSpikeTime.csv
+            bounds = np.concatenate(([0], np.flatnonzero(np.diff(ts)) + 1, [len(ts)]))
+            ids = neuron.astype(str)
+            f.write("".join("%i,%s\n" % (t, ",".join(ids[lo:hi]))
+                            for t, lo, hi in zip(ts[bounds[:-1]].tolist(), bounds[:-1].tolist(),
+                                                 bounds[1:].tolist())))
+            label.tofile(labels)
+            count += len(ts)
+    return count
+
+
+def checkData(path):
+    """Return (repeated (ts, neuron) spikes, spikes, labels) of a written test case."""
+    if path.endswith('.csv'):
+        labelFile = os.path.splitext(path)[0] + '_labels.bin'
+        repeated = spikes = 0
+        with open(path) as f:
+            for line in f:
+                ids = [n for n in line.strip().split(',')[1:] if n]
+                repeated += len(ids) - len(set(ids))
+                spikes += len(ids)
+    else:
+        labelFile = os.path.join(path, 'labels.bin')
+        store = SpikeStore(path)
+        repeated = 0
+        lo = 0
+        while lo < len(store):
+            # whole time steps per chunk
+            hi = min(lo + CHUNK_SIZE, len(store))
+            if hi < len(store):
+                hi = lo + int(np.searchsorted(store.ts[lo:], store.ts[hi - 1], side='right'))
+            repeated += int(repeatedSpikes(store.ts[lo:hi], store.neuron[lo:hi]).sum())
+            lo = hi
+        spikes = len(store)
+    return repeated, spikes, os.path.getsize(labelFile) // 4
+
+
+def makeData(path, numSpikes, seed=0, singleFraction=0.1, meanSize=100, alpha=None, maxSize=None,
+             chunkSize=CHUNK_SIZE):
+    """Write a test case to path (.csv file, else spike store) and return its ground truth."""
+    rng = np.random.default_rng(seed)
+    eventSize, eventLabel = planEvents(rng, numSpikes, singleFraction,
+                                       meanSize=meanSize, alpha=alpha, maxSize=maxSize)
+    chunks = generateSpikes(rng, eventSize, eventLabel, chunkSize=chunkSize)
+    if path.endswith('.csv'):
+        spikes = writeCsv(path, chunks)
+    else:
+        spikes = writeStore(path, chunks)
+    aval = eventLabel >= 0
+    return {'seed': seed, 'spikes': spikes, 'tau': TAU, 'radius': RADIUS, 'grid': GRID,
+            'avalanches': int(aval.sum()), 'singles': int((~aval).sum()),
+            'largest': int(eventSize[aval].max()) if aval.any() else 0}
+
+
+# ---------------------------------------------------------------------------
+# main()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a large test case with ground truth labels')
+    parser.add_argument('spikes', type=int, help='number of spikes')
+    parser.add_argument('output', help='allSpikeTime.csv style file (.csv) or spike store directory')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--singles', type=float, default=0.1, help='fraction of single spikes')
+    parser.add_argument('--mean-size', type=float, default=100, help='mean avalanche size (geometric sizes)')
+    parser.add_argument('--alpha', type=float, help='power law exponent of the avalanche sizes instead')
+    parser.add_argument('--max-size', type=int, help='largest avalanche with --alpha')
+    parser.add_argument('--check', action='store_true',
+                        help='read the output back: no repeated (ts, neuron) spikes, one label per spike')
+    args = parser.parse_args()
+
+    truth = makeData(args.output, args.spikes, args.seed, args.singles, args.mean_size, args.alpha,
+                     args.max_size)
+    with open(args.output.rstrip(os.sep) + '.json', 'w') as f:
+        json.dump(truth, f, indent=1)
+    print(f"Generated: {args.output} ({truth['spikes']} spikes, {truth['avalanches']} avalanches)")
+    if args.check:
+        repeated, spikes, labels = checkData(args.output.rstrip(os.sep))
+        print(f"Check: {repeated} repeated spikes, {spikes} spikes, {labels} labels")
+        if repeated or spikes != labels or spikes != truth['spikes']:
+            sys.exit(1)
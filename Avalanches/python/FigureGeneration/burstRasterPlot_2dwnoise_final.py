@@ -10,15 +10,23 @@ Usage:
     python3 burstRasterPlot_2dwnoise_final.py
 """
 
+import os
+import sys
 import pandas as pd
 import matplotlib.pyplot as plt
 import re
 from collections import defaultdict
 from tqdm import tqdm
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from avalancheStore import AvalancheStore
+
 # File paths (update if needed)
 csv_file = "/DATA/arjun79/GraphSystemsAnalysis/Avalanches/cpp/lastQuarter.csv"
 t15_file = "/DATA/arjun79/GraphSystemsAnalysis/Avalanches/cpp/output/SpaTemporal_lastQuarter_tau-1.txt"
+# Avalanche store of clustering.py (see avalancheStore.py); when set it is read
+# instead of the t15_file text dump
+aval_store = None
 
 # Burst boundaries (hardcoded)
 burst_start = 584822105
@@ -32,38 +40,52 @@ before_spikes = set()
 after_spikes = set()
 all_avalanche_spikes = set()
 
-# Parse avalanche file line-by-line
-with open(t15_file, 'r') as file:
-    current_spikes = set()
-    current_size = 0
-    current_times = []
-
-    for line in tqdm(file, desc="Parsing avalanche file"):
-        line = line.strip()
-        if line.startswith("Avalanche"):
-            # Process previous avalanche
-            if current_spikes:
-                min_t, max_t = min(current_times), max(current_times)
-                if min_t == burst_start and max_t == burst_end:
-                    burst_spikes.update(current_spikes)
-                elif 2 <= current_size <= 16:
-                    if burst_start - 50 <= max_t < burst_start:
-                        before_spikes.update(current_spikes)
-                    elif burst_end < min_t <= burst_end + 50:
-                        after_spikes.update(current_spikes)
-                all_avalanche_spikes.update(current_spikes)
-            # Start new avalanche
-            match = re.search(r"Size\s*=\s*(\d+)", line)
-            current_size = int(match.group(1)) if match else 0
-            current_spikes = set()
-            current_times = []
-        elif ',' in line:
-            time_str, neuron_str = line.split(',')
-            t = int(time_str.strip())
-            n = int(neuron_str.strip())
-            if start_time <= t <= end_time:
-                current_spikes.add((t, n))
-                current_times.append(t)
+# Sort one avalanche's in-window spikes into the sets above
+def categorize(current_spikes, current_times, current_size):
+    min_t, max_t = min(current_times), max(current_times)
+    if min_t == burst_start and max_t == burst_end:
+        burst_spikes.update(current_spikes)
+    elif 2 <= current_size <= 16:
+        if burst_start - 50 <= max_t < burst_start:
+            before_spikes.update(current_spikes)
+        elif burst_end < min_t <= burst_end + 50:
+            after_spikes.update(current_spikes)
+    all_avalanche_spikes.update(current_spikes)
+
+if aval_store:
+    # only the avalanches overlapping the window are read, no parsing
+    avals = AvalancheStore(aval_store)
+    for i in tqdm(avals.overlapping(start_time, end_time + 1), desc="Reading avalanche store"):
+        ts, neurons = avals.spikes(i)
+        inside = (ts >= start_time) & (ts <= end_time)
+        if inside.any():
+            categorize(set(zip(ts[inside].tolist(), neurons[inside].tolist())),
+                       ts[inside].tolist(), int(avals.summary['TotalSpikes'][i]))
+else:
+    # Parse avalanche file line-by-line
+    with open(t15_file, 'r') as file:
+        current_spikes = set()
+        current_size = 0
+        current_times = []
+
+        for line in tqdm(file, desc="Parsing avalanche file"):
+            line = line.strip()
+            if line.startswith("Avalanche"):
+                # Process previous avalanche
+                if current_spikes:
+                    categorize(current_spikes, current_times, current_size)
+                # Start new avalanche
+                match = re.search(r"Size\s*=\s*(\d+)", line)
+                current_size = int(match.group(1)) if match else 0
+                current_spikes = set()
+                current_times = []
+            elif ',' in line:
+                time_str, neuron_str = line.split(',')
+                t = int(time_str.strip())
+                n = int(neuron_str.strip())
+                if start_time <= t <= end_time:
+                    current_spikes.add((t, n))
+                    current_times.append(t)
 
 # Load spike CSV and filter time window
 spikes = []
@@ -12,13 +12,18 @@ Usage:
 import sys
 sys.path.append("/home/NETID/arjun79/.local/bin")
 
-import csv
+import os
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from powerLawFit import fitPowerLaw, loadHistogram, powerLawPmf
+
 # -----------------------------------------------------------------------------
 # INPUT FILE PATH AND FILENAME CONFIGURATION
 # -----------------------------------------------------------------------------
+# (avalancheSweep.py writes the SpaTemporal_* tables of several tau in one pass;
+# powerLawFit.py fits and bootstraps all of them in one run)
 infile = "/DATA/arjun79/GraphSystemsAnalysis/Avalanches/cpp/output/"
 # filename = "SpaTemporal_lastQuarter_tau-1"
 # filename = "SpaTemporal_lastQuarter_tau-3"
@@ -33,46 +38,26 @@ filename = "SpaTemporal_lastQuarter_tau-50"
 
 
 # -----------------------------------------------------------------------------
-# READ CSV AND COUNT AVALANCHE SIZES
+# COUNT AVALANCHE SIZES
 # -----------------------------------------------------------------------------
-readCSV = csv.reader(open(infile+filename+".csv"), delimiter=',')
-
-avalSizes = {}  # Dictionary: avalanche size -> count
-i = 0
-burstCount = 0
-
-for line in readCSV:
-    if(i == 0):
-        i = i + 1
-        continue
-    
-    aval_size = np.uint32(line[-1])
-    if(aval_size > 1e4):
-        # Count 'bursts' as avalanches with size > 10,000
-        burstCount += 1
-
-    if aval_size in avalSizes:
-        avalSizes[aval_size] += 1
-    else:
-        avalSizes[aval_size] = 1
+# exact histogram of the TotalSpikes column (np.bincount), cached while the
+# CSV is unchanged
+hist = loadHistogram(infile+filename+".csv")
+sizeValues = np.asarray(hist['size'])
+sizeCounts = np.asarray(hist['count'])
 
-    i = i + 1
+# Count 'bursts' as avalanches with size > 10,000
+burstCount = int(sizeCounts[sizeValues > 1e4].sum())
 
 print(f'Number of bursts in {filename}: {burstCount}\n')
 
-numAvalanches = i-1     # Total avalanches
+numAvalanches = int(sizeCounts.sum())     # Total avalanches
 
 # -----------------------------------------------------------------------------
 # LOG-LOG PLOT: avalSize vs probability
 # -----------------------------------------------------------------------------
-x = []
-for key in avalSizes:
-    x.append(key)
-x.sort()
-
-y = []
-for size in x:
-    y.append(float(avalSizes[size])/numAvalanches)
+x = sizeValues
+y = sizeCounts / numAvalanches
 
 print("\n")
 
@@ -106,31 +91,16 @@ plt.text(
 # -----------------------------------------------------------------------------
 # PLOT POWER-LAW TREND (NON-BURST AVALANCHES ONLY)
 # -----------------------------------------------------------------------------
-x = np.array(x)
-y = np.array(y)
-
-# Plot line of best fit for non-burst avalanches only
-mask = x < 1e4
-x_nonburst = x[mask]
-y_nonburst = y[mask]
-
-# Perform linear fit in log-log space
-log_x = np.log10(x_nonburst)
-log_y = np.log10(y_nonburst)
-slope, intercept = np.polyfit(log_x, log_y, 1)
-
-# Compute R^2
-fit_y = slope * log_x + intercept
-ss_res = np.sum((log_y - fit_y) ** 2)
-ss_tot = np.sum((log_y - np.mean(log_y)) ** 2)
-r_squared = 1 - (ss_res / ss_tot)
+# Discrete power-law MLE of the non-burst sizes, xmin chosen by KS distance
+fit = fitPowerLaw(sizeValues, sizeCounts, xmax=1e4)
+alpha, xmin = fit['alpha'], fit['xmin']
 
-# Generate fitted line
-x_fit = np.logspace(np.log10(min(x_nonburst)), np.log10(max(x_nonburst)), 100)
-y_fit = 10 ** (slope * np.log10(x_fit) + intercept)
+# Fitted probabilities, scaled by the share of avalanches in the fitted range
+x_fit = np.unique(np.logspace(np.log10(xmin), 4, 100).astype(np.int64))
+y_fit = fit['ntail'] / numAvalanches * powerLawPmf(x_fit, alpha, xmin, 1e4)
 
 # Plot the best-fit line
-plt.loglog(x_fit, y_fit, color='red', linestyle='--', label=f'Fit (slope={slope:.2f}), R²={r_squared:.3f}')
+plt.loglog(x_fit, y_fit, color='red', linestyle='--', label=f'MLE fit (α={alpha:.2f}, xmin={xmin})')
 
 # Add legend
 plt.legend( 
@@ -13,70 +13,56 @@ import sys
 sys.path.append("/home/NETID/arjun79/.local/bin")
 
 import csv
+import os
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from analysisCache import AnalysisCache
+from intervalJoin import IntervalIndex
+
 # Input file path
 infile = "/DATA/arjun79/GraphSystemsAnalysis/Avalanches/cpp/output/SpaTemporal_lastQuarter_tau-1.csv"
 
-bursts = []
-mids = []
-
-# Read avalanche data from csv file
-with open(infile, newline='') as csvfile:
-    reader = csv.DictReader(csvfile)
-    for row in reader:
-        aval_size = int(row['TotalSpikes'])
-        start_time = int(row['StartT'])
-        end_time = int(row['EndT'])
-
-        if aval_size > 1e4:
-            bursts.append((start_time, end_time))
-        elif 16 < aval_size < 1000:
-            mids.append((start_time, end_time))
-
-# Sort bursts by start time to enable efficient proximity checks
-bursts.sort()
-print(f'Number of mid-sized avalanches - {len(mids)}')
+
+def readAvalancheTable(path):
+    # the columns this figure needs from an avalanche table
+    size, startT, endT = [], [], []
+    with open(path, newline='') as csvfile:
+        reader = csv.DictReader(csvfile)
+        for row in reader:
+            size.append(int(row['TotalSpikes']))
+            startT.append(int(row['StartT']))
+            endT.append(int(row['EndT']))
+    return {'TotalSpikes': np.array(size, dtype=np.int64),
+            'StartT': np.array(startT, dtype=np.int64),
+            'EndT': np.array(endT, dtype=np.int64)}
+
+
+# Read avalanche data from csv file (cached while the file is unchanged)
+table = AnalysisCache().call(readAvalancheTable, infile)
+aval_size = table['TotalSpikes']
+isBurst = aval_size > 1e4
+isMid = (16 < aval_size) & (aval_size < 1000)
+bursts = IntervalIndex(table['StartT'][isBurst], table['EndT'][isBurst])
+midStart = table['StartT'][isMid]
+midEnd = table['EndT'][isMid]
+print(f'Number of mid-sized avalanches - {len(midStart)}')
 print(f'Number of burst-sized avalanches - {len(bursts)}')
 
-# Result containers
-before_burst_distances = []
-after_burst_distances = []
-overlaps = 0
-
-# Process each mid-sized avalanche
-for mid_start, mid_end in mids:
-    preceding = None
-    following = None
-
-    # Scan through bursts to find nearest preceding and following burst
-    for burst_start, burst_end in bursts:
-        if((burst_start < mid_start and burst_end < mid_start) or (burst_start > mid_end and burst_end > mid_end)):
-            if burst_end < mid_start:
-                preceding = burst_end  # update until last one before mid_start
-            elif burst_start > mid_end and following is None:
-                following = burst_start
-                break  # no need to check further, as bursts are sorted
-        else:                           
-            preceding = None
-            following = None
-            break
-
-    # Compute distances if found
-    dist_to_preceding = abs(mid_start - preceding) if preceding is not None else 0
-    dist_to_following = abs(mid_end - following) if following is not None else 0
-
-    # if dist_to_following is 0 and dist_to_preceding is 0:
-    #     overlaps += 1
-    #     continue
-
-    # Categorize based on which burst is closer
-    if dist_to_preceding is not None and (dist_to_following is None or dist_to_preceding < dist_to_following):
-        after_burst_distances.append(dist_to_preceding)
-            
-    elif dist_to_following is not None:
-        before_burst_distances.append(dist_to_following)
+# Nearest preceding burst end and following burst start of every mid-sized
+# avalanche in one pass over the sorted bursts (-1 for none, and both -1
+# where a burst overlaps the avalanche; see intervalJoin.py)
+preceding, following, overlapping = bursts.nearest(midStart, midEnd)
+
+# Compute distances if found
+dist_to_preceding = np.where(preceding >= 0, np.abs(midStart - preceding), 0)
+dist_to_following = np.where(following >= 0, np.abs(midEnd - following), 0)
+
+# Categorize based on which burst is closer
+nearerPreceding = dist_to_preceding < dist_to_following
+after_burst_distances = dist_to_preceding[nearerPreceding]
+before_burst_distances = dist_to_following[~nearerPreceding]
 
 
 # Convert lists to numpy arrays
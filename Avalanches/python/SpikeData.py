@@ -1,33 +1,118 @@
 """
-@file     SpikeData.py 
+@file     SpikeData.py
 @author   Jewel Lee (jewel87@uw.edu)
 @date     5/5/2018
 
-@brief    Spike and Avalanche class implementation 
+@brief    Spike and Avalanche class implementation
+
+          Spikes are stored struct-of-arrays in a SpikePool: four 4-byte
+          typed arrays of time step, neuron ID and next/prev node index (16
+          bytes per spike plus array growth slack and the free list, instead
+          of a Python object with a __dict__ and NumPy scalars per spike;
+          spikeDataMemory.py measures about 28 bytes per spike in all,
+          Avalanche objects included). An Avalanche is a doubly linked list
+          of pool indices with the same API as before; a Spike is a small
+          handle to one pool entry that is created when a node is looked at
+          (head, tail, next, prev).
+          Nodes freed by remove() are reused by later spikes.
 
 """
+import array
 import numpy as np
-GRID = 100
+from neuronLayout import GRID, NeuronLayout, gridLayout
+LAYOUT = NeuronLayout(*gridLayout(GRID))     # x, y of neuron ID - 1
+NONE = -1           # index of a missing node
+
+
+# -----------------------------------------------------------------------------
+# CLASS: SpikePool()
+# growable typed arrays holding every spike of every avalanche
+# -----------------------------------------------------------------------------
+class SpikePool(object):
+    def __init__(self):
+        self.ts = array.array('I')      # uint32 time step
+        self.id = array.array('I')      # neuron ID
+        self.next = array.array('i')    # index of the next node, or NONE
+        self.prev = array.array('i')    # index of the previous node, or NONE
+        self.free = array.array('i')    # removed nodes, reused first
+
+    def __len__(self):
+        return len(self.ts) - len(self.free)
+
+    def alloc(self, ts, i):
+        if len(self.free) > 0:
+            k = self.free.pop()
+            self.ts[k] = int(ts)
+            self.id[k] = int(i)
+            self.next[k] = NONE
+            self.prev[k] = NONE
+            return k
+        self.ts.append(int(ts))
+        self.id.append(int(i))
+        self.next.append(NONE)
+        self.prev.append(NONE)
+        return len(self.ts) - 1
+
+    def release(self, k):
+        self.free.append(k)
+
+    def nbytes(self):
+        return sum(a.itemsize * a.buffer_info()[1]
+                   for a in (self.ts, self.id, self.next, self.prev, self.free))
+
+
+# spikes of all avalanches live here unless an Avalanche is given its own pool
+POOL = SpikePool()
+
 
 # -----------------------------------------------------------------------------
 # CLASS: Spike()
 # each Spike is a node contains it's spiking timestep (ts) and neuron ID
 # -----------------------------------------------------------------------------
 class Spike(object):
-    def __init__(self, ts, i):
-        self.ts = ts
-        self.id = i
-        self.next = None  # the pointer initially points to nothing
-        self.prev = None  # the pointer initially points to nothing
+    __slots__ = ('pool', 'k')
+
+    def __init__(self, ts, i, pool=POOL, k=None):
+        self.pool = pool
+        # Spike(ts, i) makes a new node, Spike(..., k=index) refers to one
+        self.k = pool.alloc(ts, i) if k is None else k
+
+    def __eq__(self, other):
+        return isinstance(other, Spike) and self.pool is other.pool and self.k == other.k
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((id(self.pool), self.k))
+
+    @property
+    def ts(self):
+        # np.uint32 as the callers stored it, so time differences behave as before
+        return np.uint32(self.pool.ts[self.k])
+
+    @property
+    def id(self):
+        return self.pool.id[self.k]
+
+    @property
+    def next(self):
+        return node(self.pool, self.pool.next[self.k])
+
+    @property
+    def prev(self):
+        return node(self.pool, self.pool.prev[self.k])
 
     def x(self):
-        y = np.floor_divide((self.id - 1), GRID) + 1
-        x = self.id - (GRID*y) + GRID
-        return x
+        return int(LAYOUT.x[self.id - 1])
 
     def y(self):
-        y = np.floor_divide((self.id - 1), GRID) + 1
-        return y
+        return int(LAYOUT.y[self.id - 1])
+
+
+def node(pool, k):
+    # Spike handle for index k, None for NONE
+    return None if k == NONE else Spike(0, 0, pool, k)
 
 
 # -----------------------------------------------------------------------------
@@ -35,10 +120,12 @@ class Spike(object):
 # each Avalanche is a doubly linked list
 # -----------------------------------------------------------------------------
 class Avalanche(object):
+    __slots__ = ('pool', '_head', '_tail', 'size')
 
-    def __init__(self):
-        self.head = None
-        self.tail = None
+    def __init__(self, pool=POOL):
+        self.pool = pool
+        self._head = NONE
+        self._tail = NONE
         self.size = 0
         return
 
@@ -46,135 +133,100 @@ class Avalanche(object):
         return self.size
 
     def __del__(self):
-        node = self.head
-        while node is not None:
-            curr = node.next
-            del node
-            node = curr
-        del self
+        # hand the nodes back to the pool
+        k = self._head
+        while k != NONE:
+            curr = self.pool.next[k]
+            self.pool.release(k)
+            k = curr
         return None
 
+    @property
+    def head(self):
+        return node(self.pool, self._head)
+
+    @property
+    def tail(self):
+        return node(self.pool, self._tail)
+
     def is_empty(self):
         return len(self) == 0
 
     # -----------------------------------------------------------------------------
-    # create a new node and add it to this avalanche
+    # create a new node and add it to this avalanche (at the tail)
     # -----------------------------------------------------------------------------
     def add_node(self, ts, i):
-        new_node = Spike(ts, i)
+        k = self.pool.alloc(ts, i)
         # if no head, set new node as head
-        if self.head is None:
-            self.head = new_node
-            self.tail = new_node
+        if self._head == NONE:
+            self._head = k
         else:
-            curr_node = self.head
-            # if next not none (tail) continue traversing
-            while curr_node.next is not None:
-                curr_node = curr_node.next
-            # end while
-            # if tail, add to end
-            curr_node.next = new_node
-            # set prev pointer to current node
-            new_node.prev = curr_node
-            # set new tail to new node
-            self.tail = new_node
-        # increment size
-        self.size = self.size + 1
-        return
-
-    # -----------------------------------------------------------------------------
-    # insert an existed node to be the tail of this avalanche
-    # -----------------------------------------------------------------------------
-    def __insert_tail(self, new_node):
-        old_tail = self.tail
-        old_tail.next = new_node
-        new_node.prev = old_tail
-        new_node.next = None
-        self.tail = new_node
-        # increment size
-        self.size = self.size + 1
-        return
-
-    # -----------------------------------------------------------------------------
-    # insert an existed node to be the head of this avalanche
-    # -----------------------------------------------------------------------------
-    def __insert_head(self, new_node):
-        old_head = self.head
-        old_head.prev = new_node
-        new_node.next = old_head
-        new_node.prev = None
-        self.head = new_node
-        # increment size
-        self.size = self.size + 1
-        return
-
-    # -----------------------------------------------------------------------------
-    # insert an existed node into the middle of this avalanche
-    # -----------------------------------------------------------------------------
-    def __insert(self, new_node):
-        curr_node = self.head
-        while curr_node.ts < new_node.ts:
-            curr_node = curr_node.next
-        prev_node = curr_node.prev
-        prev_node.next = new_node
-        new_node.next = curr_node
-        curr_node.prev = new_node
-        new_node.prev = prev_node
-
+            self.pool.next[self._tail] = k
+            self.pool.prev[k] = self._tail
+        self._tail = k
         # increment size
         self.size = self.size + 1
         return
 
     # -----------------------------------------------------------------------------
-    #
+    # unlink a node from this avalanche and free it
     # -----------------------------------------------------------------------------
     def remove(self, curr_node):
-        if curr_node is self.head:
-            next_node = self.head.next
-            self.head = next_node
-            next_node.prev = None
-
-        elif curr_node is self.tail:
-            prev_node = self.tail.prev
-            self.tail = prev_node
-            prev_node.next = None
+        pool = self.pool
+        k = curr_node.k
+        prev_k = pool.prev[k]
+        next_k = pool.next[k]
+        if prev_k == NONE:
+            self._head = next_k
         else:
-            prev_node = curr_node.prev
-            next_node = curr_node.next
-            prev_node.next = next_node
-            next_node.prev = prev_node
-        # endif
+            pool.next[prev_k] = next_k
+        if next_k == NONE:
+            self._tail = prev_k
+        else:
+            pool.prev[next_k] = prev_k
         # decrement size
         self.size = self.size - 1
-        del curr_node
+        pool.release(k)
         return
 
     # -----------------------------------------------------------------------------
     # merge two avalanches into one
+    # both lists are in time order, so they are merged in a single pass; a node
+    # of aval goes before nodes of this avalanche with the same time step
     # -----------------------------------------------------------------------------
     def merge(self, aval):
-        # print("In merge: self:")
-        # self.display()
-        # print("          aval:")
-        # aval.display()
-        node = aval.head
-        while node is not None:
-            dummy_head = node.next
-            if node.ts <= self.head.ts:
-                self.__insert_head(node)
-            elif node.ts >= self.tail.ts:
-                self.__insert_tail(node)
+        if aval.pool is not self.pool:
+            raise ValueError("can only merge avalanches of the same pool")
+        pool = self.pool
+        a = self._head
+        b = aval._head
+        head = tail = NONE
+        while a != NONE or b != NONE:
+            if b != NONE and (a == NONE or pool.ts[b] <= pool.ts[a]):
+                k, b = b, pool.next[b]
+            else:
+                k, a = a, pool.next[a]
+            pool.prev[k] = tail
+            if tail == NONE:
+                head = k
             else:
-                self.__insert(node)
-            node = dummy_head
-        del aval
+                pool.next[tail] = k
+            tail = k
+        if tail != NONE:
+            pool.next[tail] = NONE
+        self._head = head
+        self._tail = tail
+        self.size = self.size + aval.size
+        # aval no longer owns its nodes
+        aval._head = aval._tail = NONE
+        aval.size = 0
 
     # -----------------------------------------------------------------------------
     # display avalanche list in tuples (ts, id)
     # -----------------------------------------------------------------------------
     def display(self):
-        current_node = self.head
-        while current_node is not None:
-            print(current_node.ts, current_node.id)
-            current_node = current_node.next
-        return
\ No newline at end of file
+        k = self._head
+        while k != NONE:
+            print(self.pool.ts[k], self.pool.id[k])
+            k = self.pool.next[k]
+        return
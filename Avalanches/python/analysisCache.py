@@ -0,0 +1,216 @@
+"""
+@file     analysisCache.py
+@date     10/18/2026
+
+@brief    On-disk cache for arrays derived from simulation output
+
+          A result is looked up by a key built from
+            - the identity of every source file: path, size and mtime, plus
+              a SHA-1 of the contents when hashContent is set
+            - the producing function: module, name, the file defining it,
+              a SHA-1 of its source and an optional version number
+            - the keyword parameters of the call
+          so editing, replacing or touching an input, editing the function
+          or calling with other parameters, gives a new key. Nothing is ever
+          invalidated by hand, except for changes to helpers the function
+          calls: set func.cacheVersion for those.
+
+          A single array is stored as <key>.npy; a dict of arrays as a
+          <key>/ directory with one .npy per entry. Both are opened with
+          mmap_mode='r', so a hit costs an mmap rather than a re-read of the
+          source, and the data is only paged in when it is touched.
+
+          Every hit refreshes the entry's mtime. After each store the oldest
+          entries are removed until the cache fits in its disk budget (least
+          recently used first).
+
+          The cache lives in $GSA_CACHE_DIR (default
+          ~/.cache/GraphSystemsAnalysis) and the budget is $GSA_CACHE_BUDGET
+          bytes (default 10 GB).
+
+Usage:
+    cache = AnalysisCache()
+    sizes = cache.call(readAvalancheSizes, "tau-50.csv")
+    spike_count = cache.call(count_spikes, "spikes.csv", num_timesteps=600000000)
+
+    python3 analysisCache.py [cache directory]     (list entries and usage)
+"""
+import hashlib
+import inspect
+import json
+import linecache
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+CACHE_DIR = os.environ.get("GSA_CACHE_DIR",
+                           os.path.join(os.path.expanduser("~"), ".cache", "GraphSystemsAnalysis"))
+CACHE_BUDGET = int(os.environ.get("GSA_CACHE_BUDGET", 10 * 1024 ** 3))
+HASH_BLOCK = 1 << 20    # bytes read at a time when hashing a source file
+
+
+def sourceKey(path, hashContent=False):
+    """Identity of a source file: absolute path, size, mtime (and SHA-1)."""
+    st = os.stat(path)
+    key = [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+    if hashContent:
+        sha = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b''):
+                sha.update(block)
+        # the content hash alone identifies the data, wherever it is
+        key = [st.st_size, sha.hexdigest()]
+    return key
+
+
+def codeKey(func):
+    # defining file and source hash, so script functions (__module__ is
+    # '__main__') of different scripts or versions never share entries
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return None
+    try:
+        # re-read the file if it changed since it was last looked at
+        linecache.checkcache(code.co_filename)
+        text = inspect.getsource(func)
+    except (OSError, TypeError):
+        text = repr((code.co_code, code.co_consts, code.co_names))
+    return [os.path.abspath(code.co_filename), hashlib.sha1(text.encode()).hexdigest()]
+
+
+def functionKey(func):
+    # a function may set .cacheVersion to invalidate results after a change
+    # to code outside of it
+    return [getattr(func, '__module__', ''), getattr(func, '__qualname__', repr(func)),
+            codeKey(func), getattr(func, 'cacheVersion', 0)]
+
+
+def entrySize(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, n)) for n in os.listdir(path))
+    return os.path.getsize(path)
+
+
+# -----------------------------------------------------------------------------
+# CLASS: AnalysisCache()
+# content-addressed store of arrays and dicts of arrays with LRU eviction
+# -----------------------------------------------------------------------------
+class AnalysisCache(object):
+    def __init__(self, path=CACHE_DIR, budget=CACHE_BUDGET, hashContent=False):
+        self.path = path
+        self.budget = budget
+        self.hashContent = hashContent
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, sources, func, params=None):
+        """Hex key of func(sources, **params)."""
+        if isinstance(sources, (str, os.PathLike)):
+            sources = [sources]
+        desc = {'sources': [sourceKey(s, self.hashContent) for s in sources],
+                'function': functionKey(func),
+                'params': params or {}}
+        return hashlib.sha1(json.dumps(desc, sort_keys=True, default=str).encode()).hexdigest()
+
+    def __entry(self, key):
+        # whichever form the entry was stored in, or None
+        for path in (os.path.join(self.path, key + '.npy'), os.path.join(self.path, key)):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def get(self, key):
+        """Memory-mapped result stored under key, or None."""
+        path = self.__entry(key)
+        if path is None:
+            return None
+        try:
+            if os.path.isdir(path):
+                result = {n[:-len('.npy')]: np.load(os.path.join(path, n), mmap_mode='r')
+                          for n in sorted(os.listdir(path)) if n.endswith('.npy')}
+            else:
+                result = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            # removed by another process's eviction, or cut short
+            return None
+        os.utime(path)
+        return result
+
+    def put(self, key, result):
+        """Store an array or a dict of arrays under key and return it memory-mapped."""
+        # write next to the final name and rename, so readers never see a partial entry
+        tmp = tempfile.mkdtemp(prefix='.tmp_', dir=self.path)
+        try:
+            if isinstance(result, dict):
+                for name, value in result.items():
+                    np.save(os.path.join(tmp, name + '.npy'), np.asarray(value))
+                target = os.path.join(self.path, key)
+                if os.path.isdir(target):
+                    shutil.rmtree(target)
+                os.replace(tmp, target)
+            else:
+                np.save(os.path.join(tmp, 'data.npy'), np.asarray(result))
+                os.replace(os.path.join(tmp, 'data.npy'), os.path.join(self.path, key + '.npy'))
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        # map it before evicting: a mapping stays valid even if the entry goes
+        stored = self.get(key)
+        self.evict()
+        return stored
+
+    def call(self, func, sources, **params):
+        """
+        Return func(sources, **params) from the cache, computing it on a miss.
+
+        Args:
+            func: function returning an array or a dict of arrays
+            sources (str or list): input file(s); passed to func unchanged
+            params: keyword arguments of func, part of the key
+        """
+        key = self.key(sources, func, params)
+        result = self.get(key)
+        if result is None:
+            result = self.put(key, func(sources, **params))
+        return result
+
+    def entries(self):
+        """(last use, size, path) of every entry, least recently used first."""
+        entries = []
+        for name in os.listdir(self.path):
+            if name.startswith('.tmp_'):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                entries.append((os.stat(path).st_mtime, entrySize(path), path))
+            except OSError:
+                continue
+        return sorted(entries)
+
+    def evict(self, budget=None):
+        """Remove least recently used entries until the cache fits in budget bytes."""
+        budget = self.budget if budget is None else budget
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for mtime, size, path in entries:
+            if total <= budget:
+                break
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+            total -= size
+        return total
+
+    def clear(self):
+        self.evict(0)
+
+
+if __name__ == '__main__':
+    cache = AnalysisCache(sys.argv[1] if len(sys.argv) > 1 else CACHE_DIR)
+    entries = cache.entries()
+    for mtime, size, path in entries:
+        print("%s  %12d  %s" % (time.strftime('%Y-%m-%d %H:%M', time.localtime(mtime)),
+                                size, os.path.basename(path)))
+    print("%d entries, %d of %d bytes" % (len(entries), sum(e[1] for e in entries), cache.budget))
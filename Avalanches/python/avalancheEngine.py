@@ -0,0 +1,545 @@
+"""
+@file     avalancheEngine.py
+@date     10/18/2026
+
+@brief    Union-find avalanche engine for spatiotemporal clustering
+
+          Every spike gets an integer index in arrival (time) order. Two
+          spikes belong to the same avalanche when they are less than TAU
+          time steps and less than RADIUS apart, directly or through other
+          spikes, so avalanches are the sets of a disjoint-set forest over
+          spike indices (union by size, path halving). A merge is a couple
+          of array writes, however large the avalanches are.
+
+          The root of each set holds the aggregates of its avalanche: size,
+          first spike (so StartT), EndT and the x/y extent. A circular next
+          array links the members of each set (a union swaps two entries),
+          so one avalanche can be listed without scanning all spikes.
+
+          Candidate spikes are found through the grid index in
+          spatialIndex.py, whose cells remember the index of their last
+          spike; find() of that index is the avalanche.
+
+          writeSizeCsv() / writeListCsv() write the <_size.csv> and
+          <_list.csv> files of clustering.py: avalanches with at least two
+          spikes, ordered by their first spike.
+
+          Streaming: given a sink, the engine retires avalanches as soon as
+          they are closed, i.e. their last spike is TAU or more time steps
+          before the current one, so no later spike can reach them. Each
+          retired avalanche of at least minSize spikes is handed to the sink
+          as a dict (size, StartT, EndT, x/y extent and, with members=True,
+          the neuron ids and spike numbers of its spikes in time order; see
+          avalancheStore.py for a sink keeping them). Spikes of retired
+          avalanches are dropped from the front of the arrays, so memory
+          follows the active window instead of the simulation length. With
+          ordered=True (the default) closed avalanches wait until every
+          avalanche that started before them is closed, so the sink sees
+          them in the same order as writeSizeCsv(); ordered=False hands them
+          over the moment they close. Spike indices are relative to the
+          spikes still held (engine.base of them have been dropped).
+
+          Checkpoints: getState() returns the open state (the spikes still
+          held, the grid index and the closed avalanches waiting in the
+          heap) as arrays, so it costs about the size of the TAU window.
+          saveCheckpoint() writes it with the sink's output position and the
+          input position; a new engine given setState() and a sink reopened
+          with resume= carry on with identical output.
+
+Usage:
+    engine = AvalancheEngine(*gridLayout(), tau=TAU, radius=RADIUS)
+    for current_ts, ids in spikes:
+        engine.addTimestep(current_ts, ids)
+    writeSizeCsv(engine, outfile)
+
+    with SizeCsvSink(outfile) as sink:
+        engine = AvalancheEngine(*gridLayout(), tau=TAU, radius=RADIUS, sink=sink)
+        for current_ts, ids in spikes:
+            engine.addTimestep(current_ts, ids)
+        engine.finish()
+"""
+import array
+import heapq
+import math
+import os
+import numpy as np
+from spatialIndex import SpatialIndex
+
+TRIM_SIZE = 1 << 16     # retired spikes dropped at a time (at least)
+BATCH_SIZE = 8          # spikes in a time step from which lookups are batched
+STATE_ARRAYS = ('ts', 'nid', 'parent', 'nxt', 'size', 'first', 'last', 'endT',
+                'minX', 'maxX', 'minY', 'maxY')
+PENDING_COLUMNS = ('size', 'StartT', 'EndT', 'minX', 'maxX', 'minY', 'maxY')
+
+
+# -----------------------------------------------------------------------------
+# CLASS: AvalancheEngine()
+# disjoint-set forest over spike indices with per-root aggregates
+# -----------------------------------------------------------------------------
+class AvalancheEngine(object):
+    def __init__(self, xloc, yloc, tau, radius, idBase=1, sink=None, minSize=2,
+                 members=False, ordered=True, lookup=True):
+        self.tau = tau
+        self.radius = radius
+        self.idBase = idBase
+        # without lookup the joins come from outside (addLinked(), see avalancheSweep.py)
+        self.index = SpatialIndex(xloc, yloc, radius, idBase, ownerDtype=np.int64) if lookup else None
+        self.xloc = np.asarray(xloc, dtype=np.int64).tolist()
+        self.yloc = np.asarray(yloc, dtype=np.int64).tolist()
+
+        # per spike
+        self.ts = array.array('q')
+        self.nid = array.array('l')
+        self.parent = array.array('q')
+        self.nxt = array.array('q')     # circular list of the members of a set
+        # per root (entries of non-roots are stale)
+        self.size = array.array('q')
+        self.first = array.array('q')
+        self.last = array.array('q')
+        self.endT = array.array('q')
+        self.minX = array.array('l')
+        self.maxX = array.array('l')
+        self.minY = array.array('l')
+        self.maxY = array.array('l')
+
+        # streaming
+        self.sink = sink
+        self.minSize = minSize
+        self.withMembers = members
+        self.ordered = ordered
+        self.base = 0       # spikes dropped from the front of the arrays
+        self.expired = 0    # spikes before this one are TAU or more old
+        self.oldest = 0     # spikes before this one belong to retired avalanches
+        self.pending = []   # heap of closed avalanches waiting for older ones (ordered)
+        self.retired = 0
+        # counters (see engineMetrics.py)
+        self.merges = 0     # unions of two different sets
+        self.largest = 0    # size of the largest avalanche closed so far
+
+    def __len__(self):
+        return len(self.ts)
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            # path halving
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, a, b):
+        ra = self.find(a)
+        rb = self.find(b)
+        if ra == rb:
+            return ra
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.merges += 1
+        self.size[ra] += self.size[rb]
+        self.first[ra] = min(self.first[ra], self.first[rb])
+        self.last[ra] = max(self.last[ra], self.last[rb])
+        self.endT[ra] = max(self.endT[ra], self.endT[rb])
+        self.minX[ra] = min(self.minX[ra], self.minX[rb])
+        self.maxX[ra] = max(self.maxX[ra], self.maxX[rb])
+        self.minY[ra] = min(self.minY[ra], self.minY[rb])
+        self.maxY[ra] = max(self.maxY[ra], self.maxY[rb])
+        self.nxt[ra], self.nxt[rb] = self.nxt[rb], self.nxt[ra]
+        return ra
+
+    # -----------------------------------------------------------------------------
+    # add one spike, joining it to every avalanche within TAU and RADIUS
+    # -----------------------------------------------------------------------------
+    def add(self, t, n):
+        t = int(t)
+        n = int(n)
+        i = len(self.ts)
+        x = self.xloc[n - self.idBase]
+        y = self.yloc[n - self.idBase]
+        self.ts.append(t)
+        self.nid.append(n)
+        self.parent.append(i)
+        self.nxt.append(i)
+        self.size.append(1)
+        self.first.append(i)
+        self.last.append(i)
+        self.endT.append(t)
+        self.minX.append(x)
+        self.maxX.append(x)
+        self.minY.append(y)
+        self.maxY.append(y)
+
+        for owner in self.index.neighbors(n, t, self.tau).tolist():
+            self.union(i, owner)
+        self.index.update(n, t, i)
+        return i
+
+    def extend(self, t, ids):
+        """Append spikes of neurons ids at time step t as single-spike sets; returns the first index."""
+        i = len(self.ts)
+        if len(ids) == 1:
+            n = ids[0]
+            x = self.xloc[n - self.idBase]
+            y = self.yloc[n - self.idBase]
+            for a, v in ((self.ts, t), (self.nid, n), (self.parent, i), (self.nxt, i), (self.size, 1),
+                         (self.first, i), (self.last, i), (self.endT, t), (self.minX, x),
+                         (self.maxX, x), (self.minY, y), (self.maxY, y)):
+                a.append(v)
+            return i
+        new = list(range(i, i + len(ids)))
+        x = [self.xloc[n - self.idBase] for n in ids]
+        y = [self.yloc[n - self.idBase] for n in ids]
+        self.ts.extend([t] * len(ids))
+        self.nid.extend(ids)
+        self.parent.extend(new)
+        self.nxt.extend(new)
+        self.size.extend([1] * len(ids))
+        self.first.extend(new)
+        self.last.extend(new)
+        self.endT.extend([t] * len(ids))
+        self.minX.extend(x)
+        self.maxX.extend(x)
+        self.minY.extend(y)
+        self.maxY.extend(y)
+        return i
+
+    # -----------------------------------------------------------------------------
+    # add all spikes of time step t at once: one stencil lookup for the whole
+    # row against the earlier spikes, then one against the row itself
+    # -----------------------------------------------------------------------------
+    def addTimestep(self, t, ids):
+        if self.sink is not None:
+            self.retire(t)
+        ids = [int(n) for n in ids]
+        if len(ids) < BATCH_SIZE:
+            # a lookup per spike is cheaper for a few spikes
+            for n in ids:
+                self.add(t, n)
+            return
+        t = int(t)
+        i = self.extend(t, ids)
+        new = list(range(i, i + len(ids)))
+
+        index = self.index
+        cells = index.cellsMany(ids)
+        pairs = [index.ownersIn(cells, t, self.tau)]
+        index.updateMany(ids, t, new)
+        if self.tau > 0:
+            # spikes of this time step: the cells just updated (t - lastTs < 1)
+            pairs.append(index.ownersIn(cells, t, 1))
+        union = self.union
+        for rows, owners in pairs:
+            rows = rows + i
+            # (a neuron listed twice in the row owns its cell from both spikes)
+            keep = owners != rows
+            for j, owner in zip(rows[keep].tolist(), owners[keep].tolist()):
+                union(j, owner)
+
+    # -----------------------------------------------------------------------------
+    # add the spikes of time step t with joins found by the caller: spikes[k] and
+    # owners[k] are spike numbers counted from the first spike ever added (so
+    # they stay valid across trims), spikes[k] being one of the new spikes
+    # -----------------------------------------------------------------------------
+    def addLinked(self, t, ids, spikes, owners):
+        if self.sink is not None:
+            self.retire(t)
+        self.extend(int(t), ids)
+        if len(spikes) == 0:
+            return
+        union = self.union
+        for j, owner in zip((spikes - self.base).tolist(), (owners - self.base).tolist()):
+            if j != owner:
+                union(j, owner)
+
+    # -----------------------------------------------------------------------------
+    # hand avalanches closed at time step t to the sink and drop their spikes
+    # -----------------------------------------------------------------------------
+    def retire(self, t):
+        ts = self.ts
+        i = self.expired
+        if i >= len(ts) or t - ts[i] < self.tau:
+            return
+        while i < len(ts) and t - ts[i] >= self.tau:
+            r = self.find(i)
+            # the last spike of an avalanche expiring closes it
+            if self.last[r] == i:
+                self.close(r)
+            i += 1
+        self.expired = i
+
+        size = self.size
+        j = self.oldest
+        while j < i and size[self.find(j)] == 0:
+            j += 1
+        self.oldest = j
+        while self.pending and self.pending[0][0] < self.base + j:
+            self.sink(heapq.heappop(self.pending)[2])
+        if j >= TRIM_SIZE and 2 * j >= len(ts):
+            self.trim(j)
+
+    def finish(self):
+        """Retire every avalanche (at the end of the input)."""
+        self.retire(math.inf)
+
+    def close(self, r):
+        size = self.size[r]
+        self.retired += 1
+        self.largest = max(self.largest, size)
+        if size < self.minSize:
+            self.detach(r)
+            return
+        x = {'size': size, 'StartT': self.ts[self.first[r]], 'EndT': self.endT[r],
+             'minX': self.minX[r], 'maxX': self.maxX[r], 'minY': self.minY[r], 'maxY': self.maxY[r]}
+        if self.withMembers:
+            members = self.members(r)
+            x['ids'] = [self.nid[j] for j in members]
+            x['spikes'] = [self.base + j for j in members]
+        self.detach(r)
+        if self.ordered:
+            heapq.heappush(self.pending, (self.base + self.first[r], self.retired, x))
+        else:
+            self.sink(x)
+
+    # -----------------------------------------------------------------------------
+    # make every member of the retired set of root r a root of size 0: trim()
+    # may cut through a retired set (oldest stops at the first spike of an
+    # open one), so no kept spike may point at a dropped one
+    # -----------------------------------------------------------------------------
+    def detach(self, r):
+        parent, nxt, size = self.parent, self.nxt, self.size
+        j = r
+        while True:
+            k = nxt[j]
+            parent[j] = j
+            nxt[j] = j
+            size[j] = 0
+            if k == r:
+                return
+            j = k
+
+    # -----------------------------------------------------------------------------
+    # drop the first k spikes (all of retired avalanches, detached) and shift
+    # the indices
+    # -----------------------------------------------------------------------------
+    def trim(self, k):
+        def shifted(a):
+            return array.array('q', (np.frombuffer(a, dtype=np.int64)[k:] - k).tobytes())
+        self.parent = shifted(self.parent)
+        self.nxt = shifted(self.nxt)
+        self.first = shifted(self.first)
+        self.last = shifted(self.last)
+        for name in ('ts', 'nid', 'size', 'endT', 'minX', 'maxX', 'minY', 'maxY'):
+            setattr(self, name, getattr(self, name)[k:])
+        # owners of dropped spikes go negative; their cells are TAU or more old
+        if self.index is not None:
+            self.index.owner -= k
+        self.base += k
+        self.expired -= k
+        self.oldest -= k
+
+    # -----------------------------------------------------------------------------
+    # open avalanche state as arrays (the active window only, see trim()) and
+    # back; a restored engine continues exactly like the one that was saved
+    # -----------------------------------------------------------------------------
+    def getState(self):
+        state = {name: np.asarray(getattr(self, name)) for name in STATE_ARRAYS}
+        for name in ('tau', 'radius', 'base', 'expired', 'oldest', 'retired', 'merges', 'largest'):
+            state[name] = np.asarray(getattr(self, name))
+        if self.index is not None:
+            state['lastTs'] = self.index.lastTs
+            state['owner'] = self.index.owner
+        # closed avalanches still waiting for older ones, in heap order
+        pending = [x for key, retired, x in self.pending]
+        state['pendingKey'] = np.array([p[:2] for p in self.pending], dtype=np.int64).reshape(-1, 2)
+        for c in PENDING_COLUMNS:
+            state['pending.' + c] = np.array([x[c] for x in pending], dtype=np.int64)
+        if self.withMembers:
+            state['pending.offsets'] = np.cumsum([0] + [len(x['ids']) for x in pending])
+            state['pending.ids'] = np.array([n for x in pending for n in x['ids']], dtype=np.int64)
+            state['pending.spikes'] = np.array([j for x in pending for j in x['spikes']], dtype=np.int64)
+        return state
+
+    def setState(self, state):
+        if float(state['tau']) != self.tau or float(state['radius']) != self.radius:
+            raise ValueError("state was saved with TAU %g, RADIUS %g" % (state['tau'], state['radius']))
+        for name in STATE_ARRAYS:
+            a = array.array(getattr(self, name).typecode)
+            a.frombytes(np.ascontiguousarray(state[name], dtype=np.dtype(a.typecode)).tobytes())
+            setattr(self, name, a)
+        for name in ('base', 'expired', 'oldest', 'retired', 'merges', 'largest'):
+            setattr(self, name, int(state[name]))
+        if self.index is not None:
+            self.index.lastTs[:] = state['lastTs']
+            self.index.owner[:] = state['owner']
+        self.pending = []
+        for k, (key, retired) in enumerate(state['pendingKey'].tolist()):
+            x = {c: int(state['pending.' + c][k]) for c in PENDING_COLUMNS}
+            if self.withMembers:
+                lo, hi = state['pending.offsets'][k], state['pending.offsets'][k + 1]
+                x['ids'] = state['pending.ids'][lo:hi].tolist()
+                x['spikes'] = state['pending.spikes'][lo:hi].tolist()
+            # the saved list is a heap already
+            self.pending.append((key, retired, x))
+
+    # -----------------------------------------------------------------------------
+    # members of the avalanche of spike i, in time order
+    # -----------------------------------------------------------------------------
+    def members(self, i):
+        out = [i]
+        j = self.nxt[i]
+        while j != i:
+            out.append(j)
+            j = self.nxt[j]
+        out.sort()
+        return out
+
+    def labels(self):
+        """Root of every spike (vectorized pointer jumping, no path updates)."""
+        labels = np.array(self.parent, dtype=np.int64)
+        while True:
+            up = labels[labels]
+            if np.array_equal(up, labels):
+                return labels
+            labels = up
+
+    # -----------------------------------------------------------------------------
+    # table of avalanches with at least minSize spikes, ordered by first spike
+    # -----------------------------------------------------------------------------
+    def avalanches(self, minSize=2):
+        parent = np.array(self.parent, dtype=np.int64)
+        size = np.array(self.size, dtype=np.int64)
+        roots = np.flatnonzero((parent == np.arange(len(parent))) & (size >= minSize))
+        first = np.array(self.first, dtype=np.int64)[roots]
+        order = np.argsort(first, kind='stable')
+        roots = roots[order]
+        first = first[order]
+        return {'root': roots, 'first': first, 'size': size[roots],
+                'StartT': np.array(self.ts, dtype=np.int64)[first],
+                'EndT': np.array(self.endT, dtype=np.int64)[roots],
+                'minX': np.array(self.minX, dtype=np.int64)[roots],
+                'maxX': np.array(self.maxX, dtype=np.int64)[roots],
+                'minY': np.array(self.minY, dtype=np.int64)[roots],
+                'maxY': np.array(self.maxY, dtype=np.int64)[roots]}
+
+
+# -----------------------------------------------------------------------------
+# CLASS: SizeCsvSink() / ListCsvSink()
+# streaming counterparts of writeSizeCsv() / writeListCsv()
+# (ListCsvSink needs an engine with members=True)
+# -----------------------------------------------------------------------------
+class SizeCsvSink(object):
+    def __init__(self, outfile, resume=None):
+        if resume is None:
+            self.f = open(outfile, 'w')
+        else:
+            # drop whatever was written after the checkpoint
+            self.f = open(outfile, 'r+')
+            self.f.seek(int(resume['offset']))
+            self.f.truncate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.f.close()
+
+    def state(self):
+        """Output written so far, on disk (see saveCheckpoint())."""
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return {'offset': self.f.tell()}
+
+    def __call__(self, x):
+        self.f.write("%i\n" % x['size'])
+
+
+class ListCsvSink(SizeCsvSink):
+    def __call__(self, x):
+        self.f.write("%i" % x['StartT'])
+        self.f.write("".join(",%i" % n for n in x['ids']))
+        self.f.write("\n")
+
+
+# -----------------------------------------------------------------------------
+# CLASS: TableCsvSink()
+# avalanche table in the format of spatiotemporal.cpp
+# (ID,StartRow,EndRow,StartT,EndT,Width,TotalSpikes; rows are not tracked: 0)
+# -----------------------------------------------------------------------------
+class TableCsvSink(SizeCsvSink):
+    def __init__(self, outfile, resume=None):
+        SizeCsvSink.__init__(self, outfile, resume)
+        if resume is None:
+            self.f.write("ID,StartRow,EndRow,StartT,EndT,Width,TotalSpikes\n")
+            self.count = 0
+        else:
+            self.count = int(resume['count'])
+
+    def state(self):
+        return dict(SizeCsvSink.state(self), count=self.count)
+
+    def __call__(self, x):
+        self.count += 1
+        self.f.write("%i,0,0,%i,%i,%i,%i\n" % (self.count, x['StartT'], x['EndT'],
+                                                x['EndT'] - x['StartT'] + 1, x['size']))
+
+
+# -----------------------------------------------------------------------------
+# writeSizeCsv() write sizes of all avalanches to outfile (<_size.csv>)
+# -----------------------------------------------------------------------------
+def writeSizeCsv(engine, outfile, minSize=2):
+    with open(outfile, 'w') as f:
+        for size in engine.avalanches(minSize)['size'].tolist():
+            f.write("%i\n" % size)
+
+
+# -----------------------------------------------------------------------------
+# writeListCsv() write all avalanche lists to outfile (<_list.csv>):
+# first time step, then the neuron ids of its spikes in time order
+# -----------------------------------------------------------------------------
+def writeListCsv(engine, outfile, minSize=2):
+    table = engine.avalanches(minSize)
+    labels = engine.labels()
+    # spikes grouped by avalanche (in table order), time order within each
+    rank = np.full(len(labels), -1, dtype=np.int64)
+    rank[table['root']] = np.arange(len(table['root']))
+    spikeRank = rank[labels]
+    order = np.argsort(spikeRank, kind='stable')
+    order = order[spikeRank[order] >= 0]
+    nid = np.array(engine.nid, dtype=np.int64)[order]
+    bounds = np.concatenate(([0], np.cumsum(table['size'])))
+    with open(outfile, 'w') as f:
+        for k, startT in enumerate(table['StartT'].tolist()):
+            f.write("%i" % startT)
+            f.write("".join(",%i" % n for n in nid[bounds[k]:bounds[k + 1]].tolist()))
+            f.write("\n")
+
+
+# -----------------------------------------------------------------------------
+# saveCheckpoint() snapshot of an engine, its sink and the input position
+# (one .npz file, replaced atomically so a crash leaves the previous one)
+# -----------------------------------------------------------------------------
+def saveCheckpoint(path, engine, position):
+    # spikes of retired avalanches need not be saved
+    if engine.oldest > 0:
+        engine.trim(engine.oldest)
+    arrays = {'engine.' + k: v for k, v in engine.getState().items()}
+    if engine.sink is not None:
+        arrays.update({'sink.' + k: np.asarray(v) for k, v in engine.sink.state().items()})
+    arrays['position'] = np.asarray(position)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def loadCheckpoint(path):
+    """(engine state, sink state, input position) of a saveCheckpoint() file."""
+    with np.load(path) as data:
+        engine = {k[len('engine.'):]: data[k] for k in data.files if k.startswith('engine.')}
+        sink = {k[len('sink.'):]: data[k] for k in data.files if k.startswith('sink.')}
+        return engine, sink, int(data['position'])
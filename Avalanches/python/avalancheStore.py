@@ -0,0 +1,246 @@
+"""
+@file     avalancheStore.py
+@date     10/18/2026
+
+@brief    Binary, memory-mapped avalanche results with CSR spike membership
+
+          An avalanche store is a directory holding
+            avalanches.bin  - one AVAL_DTYPE record per avalanche (ID, StartT,
+                              EndT, Width, TotalSpikes, x/y extent), ordered
+                              by first spike when the engine was ordered
+            offsets.bin     - int64, avalanche i owns spikes.bin entries
+                              [offsets[i], offsets[i+1])
+            spikes.bin      - int64 spike numbers (rows of the spike store,
+                              see spikeStore.py) in time order per avalanche
+            meta.json       - avalanche count, spike count, TAU, RADIUS, the
+                              spike store the spike numbers refer to and
+                              whether StartT is sorted (sortedStart)
+
+          This replaces the <_list.csv> file and the text dumps of the C++
+          code: nothing is formatted or parsed, and AvalancheStore maps the
+          files, so one avalanche's spikes are two offset reads and a slice
+          (O(size)) however large the store is.
+
+          AvalancheStoreWriter is a sink for AvalancheEngine(members=True),
+          so avalanches are written as they close; writeAvalancheStore()
+          writes the avalanches of a finished (non-streaming) engine.
+
+Usage:
+    with AvalancheStoreWriter(path, tau=TAU, radius=RADIUS, spikeStore=storeDir) as sink:
+        engine = AvalancheEngine(xloc, yloc, TAU, RADIUS, sink=sink, members=True)
+        ...
+    avals = AvalancheStore(path)
+    avals.summary['TotalSpikes']            # every size
+    ts, neuron = avals.spikes(i)            # spikes of avalanche i (ID i + 1)
+"""
+import json
+import os
+import numpy as np
+from spikeStore import SpikeStore
+
+BUFFER_SIZE = 1 << 20   # member spikes buffered by the writer before each write
+AVAL_DTYPE = np.dtype([('ID', '<i8'), ('StartT', '<i8'), ('EndT', '<i8'), ('Width', '<i8'),
+                       ('TotalSpikes', '<i8'), ('minX', '<i2'), ('maxX', '<i2'),
+                       ('minY', '<i2'), ('maxY', '<i2')])
+
+
+# -----------------------------------------------------------------------------
+# CLASS: AvalancheStoreWriter()
+# appends avalanches (engine sink dicts with 'spikes') in the order given
+# -----------------------------------------------------------------------------
+class AvalancheStoreWriter(object):
+    def __init__(self, path, tau=None, radius=None, spikeStore=None, resume=None):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.meta = {'tau': tau, 'radius': radius,
+                     'spikeStore': os.path.abspath(spikeStore) if spikeStore else None}
+        self.count = 0          # avalanches written so far
+        self.spikeCount = 0     # member spikes written so far
+        # an AvalancheEngine(ordered=False) closes avalanches out of StartT order
+        self.sortedStart = True
+        self.lastStart = None
+        if resume is None:
+            self.avalFile = open(os.path.join(path, 'avalanches.bin'), 'wb')
+            self.offsetFile = open(os.path.join(path, 'offsets.bin'), 'wb')
+            self.spikeFile = open(os.path.join(path, 'spikes.bin'), 'wb')
+            np.zeros(1, dtype=np.int64).tofile(self.offsetFile)
+        else:
+            # drop whatever was written after the checkpoint (see state())
+            self.count = int(resume['count'])
+            self.spikeCount = int(resume['spikeCount'])
+            self.sortedStart = bool(resume['sortedStart'])
+            self.lastStart = int(resume['lastStart']) if self.count else None
+            self.avalFile = self.__reopen('avalanches.bin', self.count * AVAL_DTYPE.itemsize)
+            self.offsetFile = self.__reopen('offsets.bin', (self.count + 1) * 8)
+            self.spikeFile = self.__reopen('spikes.bin', self.spikeCount * 8)
+        self.rows = []
+        self.spikes = []
+        self.buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __call__(self, x):
+        self.__started(x['StartT'], x['StartT'])
+        self.rows.append((self.count + len(self.rows) + 1, x['StartT'], x['EndT'],
+                          x['EndT'] - x['StartT'] + 1, x['size'],
+                          x['minX'], x['maxX'], x['minY'], x['maxY']))
+        self.spikes.append(x['spikes'])
+        self.buffered += len(x['spikes'])
+        if self.buffered >= BUFFER_SIZE:
+            self.flush()
+
+    def write(self, table, spikes):
+        """Append a table of avalanches (columns as in engine.avalanches()) and
+        their member spikes, concatenated in table order."""
+        self.flush()
+        if len(table['StartT']):
+            start = np.asarray(table['StartT'])
+            if np.any(np.diff(start) < 0):
+                self.sortedStart = False
+            self.__started(start[0], start[-1])
+        rows = np.zeros(len(table['size']), dtype=AVAL_DTYPE)
+        rows['ID'] = np.arange(self.count + 1, self.count + len(rows) + 1)
+        rows['StartT'] = table['StartT']
+        rows['EndT'] = table['EndT']
+        rows['Width'] = rows['EndT'] - rows['StartT'] + 1
+        rows['TotalSpikes'] = table['size']
+        for c in ('minX', 'maxX', 'minY', 'maxY'):
+            rows[c] = table[c]
+        self.__append(rows, np.asarray(table['size'], dtype=np.int64),
+                      np.asarray(spikes, dtype=np.int64))
+
+    def __started(self, first, last):
+        # StartT of the first and last avalanche appended next
+        if self.lastStart is not None and first < self.lastStart:
+            self.sortedStart = False
+        self.lastStart = int(last)
+
+    def flush(self):
+        if not self.rows:
+            return
+        rows = np.array(self.rows, dtype=AVAL_DTYPE)
+        sizes = np.array([len(s) for s in self.spikes], dtype=np.int64)
+        spikes = np.fromiter((j for s in self.spikes for j in s), dtype=np.int64,
+                             count=int(sizes.sum()))
+        self.rows = []
+        self.spikes = []
+        self.buffered = 0
+        self.__append(rows, sizes, spikes)
+
+    def __append(self, rows, sizes, spikes):
+        rows.tofile(self.avalFile)
+        (self.spikeCount + np.cumsum(sizes)).tofile(self.offsetFile)
+        spikes.tofile(self.spikeFile)
+        self.count += len(rows)
+        self.spikeCount += len(spikes)
+
+    def __reopen(self, name, size):
+        f = open(os.path.join(self.path, name), 'r+b')
+        f.truncate(size)
+        f.seek(size)
+        return f
+
+    def state(self):
+        """Avalanches written so far, on disk (see avalancheEngine.saveCheckpoint())."""
+        self.flush()
+        for f in (self.avalFile, self.offsetFile, self.spikeFile):
+            f.flush()
+            os.fsync(f.fileno())
+        return {'count': self.count, 'spikeCount': self.spikeCount,
+                'sortedStart': self.sortedStart, 'lastStart': self.lastStart or 0}
+
+    def close(self):
+        if self.avalFile.closed:
+            return
+        self.flush()
+        self.avalFile.close()
+        self.offsetFile.close()
+        self.spikeFile.close()
+        meta = dict(self.meta, count=self.count, spikeCount=self.spikeCount,
+                    sortedStart=self.sortedStart)
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+
+# -----------------------------------------------------------------------------
+# CLASS: AvalancheStore()
+# read-only, memory-mapped view of an avalanche store directory
+# -----------------------------------------------------------------------------
+class AvalancheStore(object):
+    def __init__(self, path, spikeStore=None):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.path = path
+        self.count = meta['count']
+        self.tau = meta['tau']
+        self.radius = meta['radius']
+        # stores written before sortedStart was recorded are checked on first use
+        self.sortedStart = meta.get('sortedStart')
+        self.summary = self.__map('avalanches.bin', AVAL_DTYPE, self.count)
+        self.offsets = np.fromfile(os.path.join(path, 'offsets.bin'), dtype=np.int64)
+        self.spikeNumbers = self.__map('spikes.bin', np.int64, meta['spikeCount'])
+        if spikeStore is None and meta['spikeStore'] and os.path.isdir(meta['spikeStore']):
+            spikeStore = meta['spikeStore']
+        if isinstance(spikeStore, str):
+            spikeStore = SpikeStore(spikeStore)
+        self.spikeStore = spikeStore
+
+    def __map(self, name, dtype, count):
+        # np.memmap refuses empty files
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode='r', shape=(count,))
+
+    def __len__(self):
+        return self.count
+
+    def members(self, i):
+        """Spike numbers of avalanche i (a zero-copy view), in time order."""
+        return self.spikeNumbers[self.offsets[i]:self.offsets[i + 1]]
+
+    def spikes(self, i):
+        """(ts, neuron) arrays of the spikes of avalanche i, from the spike store."""
+        if self.spikeStore is None:
+            raise ValueError("no spike store for the spike numbers of %s" % self.path)
+        rows = np.asarray(self.members(i))
+        return np.asarray(self.spikeStore.ts[rows]), np.asarray(self.spikeStore.neuron[rows])
+
+    def overlapping(self, t0, t1):
+        """Indices of the avalanches with spikes in [t0, t1), in store order."""
+        start = self.summary['StartT']
+        if self.sortedStart is None:
+            self.sortedStart = bool(np.all(np.diff(start) >= 0))
+        if not self.sortedStart:
+            # unordered engine: scan every avalanche
+            return np.flatnonzero((start < t1) & (self.summary['EndT'] >= t0))
+        hi = int(np.searchsorted(start, t1, side='left'))
+        return np.flatnonzero(self.summary['EndT'][:hi] >= t0)
+
+    def labels(self):
+        """Avalanche index of every member spike, in spike store order (-1 for none)."""
+        total = len(self.spikeStore) if self.spikeStore is not None else \
+            int(self.spikeNumbers.max()) + 1 if len(self.spikeNumbers) else 0
+        labels = np.full(total, -1, dtype=np.int64)
+        labels[self.spikeNumbers] = np.repeat(np.arange(self.count), np.diff(self.offsets))
+        return labels
+
+
+# -----------------------------------------------------------------------------
+# writeAvalancheStore() write all avalanches of an engine that was not
+# streaming (spike numbers are the engine's, i.e. rows of its input)
+# -----------------------------------------------------------------------------
+def writeAvalancheStore(engine, path, minSize=2, spikeStore=None):
+    table = engine.avalanches(minSize)
+    labels = engine.labels()
+    # spikes grouped by avalanche (in table order), time order within each
+    rank = np.full(len(labels), -1, dtype=np.int64)
+    rank[table['root']] = np.arange(len(table['root']))
+    spikeRank = rank[labels]
+    order = np.argsort(spikeRank, kind='stable')
+    order = order[spikeRank[order] >= 0]
+    with AvalancheStoreWriter(path, engine.tau, engine.radius, spikeStore) as writer:
+        writer.write(table, order + engine.base)
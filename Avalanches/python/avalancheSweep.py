@@ -0,0 +1,128 @@
+"""
+@file     avalancheSweep.py
+@date     10/18/2026
+
+@brief    Spatiotemporal clustering for several (TAU, RADIUS) pairs in one pass
+
+          Every pair used to be a separate run over the whole spike stream.
+          AvalancheSweep reads the stream once and keeps one union-find
+          state (an AvalancheEngine without its own index) per pair; all of
+          them share one grid index sized for the largest RADIUS:
+
+            - the cells of a time step's spikes are gathered once with the
+              full stencil; a pair with a smaller RADIUS uses a prefix of it
+              (the stencil is sorted by distance, see spatialIndex.py)
+            - the candidates (last spikes of those cells within the largest
+              TAU) are found once, and one comparison of their ages and
+              stencil positions against every pair's TAU and stencil size
+              tells which pairs each of them joins
+            - cell owners are spike numbers, the same for every pair: the
+              last spike of a cell is within TAU of t whenever an earlier
+              one is, and the two are joined for that pair too
+
+          Each pair streams its avalanches (two or more spikes, in the order
+          of their first spike) to its own sink, by default a table in the
+          format of spatiotemporal.cpp, so memory follows the window of the
+          largest TAU.
+
+Usage:
+    python3 avalancheSweep.py <allSpikeTime.csv | spike store | h5file>
+                              --tau 1 3 6 12 25 33 50 100 --radius 8 [--outdir DIR]
+"""
+import argparse
+import os
+import time
+import numpy as np
+from avalancheEngine import AvalancheEngine, TableCsvSink
+from clustering import PROGRESS, readSpikes
+from neuronLayout import loadLayout
+from spatialIndex import SpatialIndex
+
+
+# -----------------------------------------------------------------------------
+# CLASS: AvalancheSweep()
+# one shared grid index, one AvalancheEngine per (tau, radius) pair
+# -----------------------------------------------------------------------------
+class AvalancheSweep(object):
+    def __init__(self, xloc, yloc, params, sinks=None, idBase=1, minSize=2):
+        self.params = [(tau, radius) for tau, radius in params]
+        self.idBase = idBase
+        self.index = SpatialIndex(xloc, yloc, max(r for t, r in self.params), idBase,
+                                  ownerDtype=np.int64)
+        self.taus = np.array([tau for tau, radius in self.params], dtype=np.float64)
+        self.maxTau = self.taus.max()
+        self.stencil = np.array([self.index.stencilSize(radius) for tau, radius in self.params])
+        sinks = sinks or [None] * len(self.params)
+        self.engines = [AvalancheEngine(xloc, yloc, tau, radius, idBase, sink=sink, minSize=minSize,
+                                        lookup=False)
+                        for (tau, radius), sink in zip(self.params, sinks)]
+        self.count = 0      # spikes added so far (the spike number of the next one)
+
+    def addTimestep(self, t, ids):
+        t = int(t)
+        ids = [int(n) for n in ids]
+        if len(ids) == 0:
+            return
+        index = self.index
+        cells = index.cellsMany(ids)
+        # candidates of any pair: earlier spikes within the largest TAU ...
+        rows, cols = np.nonzero((t - index.lastTs[cells]) < self.maxTau)
+        age = t - index.lastTs[cells[rows, cols]]
+        owner = index.owner[cells[rows, cols]]
+        index.updateMany(ids, t, np.arange(self.count, self.count + len(ids)))
+        if len(ids) > 1 and self.maxTau > 0:
+            # ... and the other spikes of this time step (age 0)
+            rows2, cols2 = np.nonzero(index.lastTs[cells] == t)
+            rows = np.concatenate((rows, rows2))
+            cols = np.concatenate((cols, cols2))
+            age = np.concatenate((age, np.zeros(len(rows2), dtype=age.dtype)))
+            owner = np.concatenate((owner, index.owner[cells[rows2, cols2]]))
+        spikes = rows + self.count
+
+        # candidate k joins pair p when it is within both of its windows
+        inside = (age[:, None] < self.taus) & (cols[:, None] < self.stencil)
+        for p, engine in enumerate(self.engines):
+            mine = inside[:, p]
+            engine.addLinked(t, ids, spikes[mine], owner[mine])
+        self.count += len(ids)
+
+    def finish(self):
+        for engine in self.engines:
+            engine.finish()
+
+
+def tableName(infile, tau, radius, withRadius):
+    name = "SpaTemporal_%s_tau-%g" % (os.path.splitext(os.path.basename(infile))[0], tau)
+    if withRadius:
+        name += "_radius-%g" % radius
+    return name + ".csv"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Spatiotemporal avalanches for several TAU/RADIUS pairs')
+    parser.add_argument('infile', help='allSpikeTime.csv, spike store directory or Graphitti .h5 file')
+    parser.add_argument('--tau', type=float, nargs='+', required=True, help='temporal windows (time steps)')
+    parser.add_argument('--radius', type=float, nargs='+', required=True,
+                        help='spatial windows (neuron distances); every TAU is run with every RADIUS')
+    parser.add_argument('--outdir', help='where the tables go (default: next to the input)')
+    args = parser.parse_args()
+
+    infile = args.infile.rstrip(os.sep)
+    outdir = args.outdir or os.path.dirname(os.path.abspath(infile))
+    layout = loadLayout(infile)
+    xloc, yloc = layout.x, layout.y
+
+    params = [(tau, radius) for tau in args.tau for radius in args.radius]
+    sinks = [TableCsvSink(os.path.join(outdir, tableName(infile, tau, radius, len(args.radius) > 1)))
+             for tau, radius in params]
+    sweep = AvalancheSweep(xloc, yloc, params, sinks)
+    lastProgress = time.time()
+    for current_ts, ids in readSpikes(infile):
+        if PROGRESS and time.time() - lastProgress >= PROGRESS:
+            print("time step %i" % current_ts)
+            lastProgress = time.time()
+        sweep.addTimestep(current_ts, ids)
+    sweep.finish()
+    for (tau, radius), sink in zip(params, sinks):
+        print("tau %g radius %g: %i avalanches" % (tau, radius, sink.count))
+        sink.close()
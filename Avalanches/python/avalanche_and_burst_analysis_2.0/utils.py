@@ -6,6 +6,36 @@ from mpl_toolkits.mplot3d import Axes3D
 from matplotlib import cm
 from matplotlib import colors
 from matplotlib import rcParams
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from analysisCache import AnalysisCache
+
+
+def count_spikes(spikes_file, num_timesteps):
+    """
+    Counts the spikes of every time step in a spikes csv file.
+
+    Args:
+        spikes_file (str): csv file with a time_step column
+        num_timesteps (int): length of the simulation in time steps
+
+    Returns:
+        spike_count(2D array): time steps in row 0, spike counts in row 1
+    """
+    time_step = pd.read_csv(spikes_file, usecols=['time_step'])['time_step'].values
+    counts = np.bincount(time_step, minlength=num_timesteps)[:num_timesteps]
+    return np.vstack((np.arange(num_timesteps), counts))
+
+
+def load_spike_count(spikes_file, num_timesteps, cache=None):
+    """
+    count_spikes() through the analysis cache, so the csv is only parsed
+    again when it changes. The result is memory-mapped and read-only.
+    """
+    cache = cache if cache is not None else AnalysisCache()
+    return cache.call(count_spikes, spikes_file, num_timesteps=num_timesteps)
 
 
 def extract_sequence(spike_count, num_bursts, burst_mask, duration, seq_type, into_burst=0, offset=0):
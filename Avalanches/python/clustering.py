@@ -5,182 +5,169 @@
 
 @brief    Perform spatiotemporal clustering on spikes
           
-          1. have an empty list of avalanches (A)
+          1. have an empty set of avalanches (A)
           2. read <allSpikeTime.csv> line by line, spike by spike (Spike S) 
+             (a spike store or a Graphitti .h5 file can be given instead,
+             see spikeStore.py and spikeStream.py)
           3. check if S can be added to existed avalanches by finding avalanches 
              from A which has spike that is close in time and space from S
             
              3.1 if no matches, create a new avalanche in A for S (avalanche size = 1)
              3.2 if one match, add S into the existed avalanche  (avalanche size + 1)
-             3.3 if more than one matches, add S to the latest avalanche (close in time)
+             3.3 if more than one matches, add S to the matched avalanches
                  and merge those matched avalanches into one avalanche
+             (matches are found through the grid index in spatialIndex.py,
+             which looks at every spike within TAU, not only the last few
+             avalanches; avalanches are union-find sets, see avalancheEngine.py)
           
-          4. after all spikes in <allSpikeTime.csv> get processed, remove avalanches 
-             in A that has only one spike (size = 1)
-          5. output sizes of avalanches in A to <allAvalSizes.csv>
+          4. once no later spike can reach an avalanche (its last spike is TAU
+             or more time steps old) it is closed: avalanches that have only
+             one spike (size = 1) are dropped, the others are written out and
+             their spikes freed, so memory follows the active window
+          5. output sizes of avalanches to <allAvalSizes.csv>, in the order
+             of their first spike
              (optional) output all spike ids for each avalanche to <allAvalList.csv>
+             (optional) or a binary avalanche store with the spike numbers of
+             each avalanche, see avalancheStore.py
           
 """
 import os
 import sys
-import csv
+import time
 import numpy as np
-from SpikeData import Spike
-from SpikeData import Avalanche
+from avalancheEngine import AvalancheEngine, SizeCsvSink, loadCheckpoint, saveCheckpoint
+from engineMetrics import EngineMetrics
+from parallelClustering import clusterParallel, writeTableSizes
+from spikeStream import spikeStream
+from spikeStore import SpikeStore
+from neuronLayout import loadLayout
 
 ###############################################################################
 # USER DEFINED VARIABLES
 ###############################################################################
-GRID = 100          # grid size (e.g. 100 is 100 x 100, 10000 neurons)
 TAU = 1.5      	    # temporal window (unit: time steps (0.1ms))
 RADIUS = 1.5        # spatial window (unit: neuron distances)
+PROGRESS = 10       # seconds between progress lines (0: no progress output)
+CHECKPOINT = 600    # seconds between checkpoints (0: no checkpoints)
 ###############################################################################
 
 # -----------------------------------------------------------------------------
-# getXY()
-# get X, Y location using its neuron ID
+# readSpikes()
+# yield (timestep, neuron ids) rows from <allSpikeTime.csv>, a spike store
+# directory (see spikeStore.py) or, for .h5 input, straight from the Graphitti
+# output without the intermediate CSV
 # -----------------------------------------------------------------------------
-def getXY(n):
-    y = np.floor_divide((n-1), GRID) + 1
-    x = n - (GRID*y) + GRID
-    return x, y
+def readSpikes(infile):
+    for current_ts, ids, position in readSpikesAt(infile):
+        yield current_ts, ids
 
-# -----------------------------------------------------------------------------
-# getDistance()
-# get distance between two neurons
-# -----------------------------------------------------------------------------
-def getDistance(n1, n2):
-    x1, y1 = getXY(n1)
-    x2, y2 = getXY(n2)
-    d = np.sqrt((x1 - x2)**2 + (y1 - y2)**2)
-    return abs(d)
 
 # -----------------------------------------------------------------------------
-# mergeAval()
-# merge list of matched avalanches into one
-# -----------------------------------------------------------------------------
-def mergeKAvals(match):
-    k = len(match) - 1      # latest avalanche in the list
-    i = 0                   # earliest avalanche in the list
-    while i < k:
-        # merge later avalanche into early avalanche
-        A[match[i+1]].merge(A[match[i]])
-        # so removing later avalanche doesn't affect indexes
-        A.remove(A[match[i]])
-        i = i + 1
-    return
-
-# -----------------------------------------------------------------------------
-# findAval()
-# find if current spike belongs to any existed avalanches (within TAU and RADIUS)
-# return True when one or more matched avalanches were found and spike was added
-# return False so new avalanche has to be created for this spike
-# -----------------------------------------------------------------------------
-def findAval(t, n, avals):
-    if len(avals) != 0:
-        count = 0
-        match = []  # save the indexes of matched avalanche (high to low)
-        # find matched avalanche in reversed order (look for latest first)
-        for i, a in reversed(list(enumerate(avals))):
-            # (only look back at most TAU times to save time)
-            count = count + 1
-            if count > TAU:
-                k = len(match)
-                # no matches, return false to create new avalanche
-                if k == 0:
-                    return False
-                # only 1 match, add spike into this avalanche
-                elif k == 1:
-                    avals[match[0]].add_node(t, n)
-                # more than 1 match, add spike into earliest match and merge all matches
-                elif k > 1:
-                    avals[match[k-1]].add_node(t, n)
-                    mergeKAvals(match)
-                return True
-            # traverse avalanche from the end
-            node = a.tail
-            while node and (t - node.ts) < TAU:
-                d = getDistance(node.id, n)
-                if d < RADIUS:
-                    # record matched avalanches
-                    match.append(i)
-                    break
-                else:
-                    node = node.prev
-    return False
-
-# -----------------------------------------------------------------------------
-# removeSingles()
-# remove single spike avalanches that has no impact on current spikes
-# -----------------------------------------------------------------------------
-def removeSingles():
-    for a in reversed(A):
-        if len(a) < 2 or a is None:
-            A.remove(a)
-
-# -----------------------------------------------------------------------------
-# outputAvalSize() write sizes of all avalanches to outfile
-# -----------------------------------------------------------------------------
-def outputAvalSize(outfile1):
-    f = open(outfile1, 'w')
-    for a in A:
-        #print(len(a))
-        f.write("%i\n" % len(a))
-    f.close()
-
-# -----------------------------------------------------------------------------
-# outputAvalList() write all avalanche lists to outfile
-# -----------------------------------------------------------------------------
-def outputAvalList(outfile2):
-    f = open(outfile2, 'w')
-    for a in A:
-        # print(a.head.ts)
-        node = a.head
-        f.write("%i" % node.ts)
-        while node is not None:
-            f.write(",%i" % node.id)
-            node = node.next
-        f.write("\n")
-    f.close()
+# readSpikesAt()
+# readSpikes() from an input position, also yielding the position after each
+# row: a byte offset of the CSV file, a spike row of the store or, for .h5
+# input, the next time step (spikeStream() seeks every neuron to it)
+# -----------------------------------------------------------------------------
+def readSpikesAt(infile, position=0):
+    if os.path.isdir(infile):
+        for current_ts, ids in SpikeStore(infile).timesteps(position):
+            position += len(ids)
+            yield current_ts, ids, position
+    elif infile.endswith('.h5'):
+        # neuron numbers stay uint32, Graphitti graphs may have over 65535 neurons
+        for current_ts, ids in spikeStream(infile, start=position):
+            yield np.uint32(current_ts), ids, int(current_ts) + 1
+    else:
+        with open(infile, 'rb') as f:
+            f.seek(position)
+            for line in f:
+                position += len(line)
+                fields = line.decode().rstrip('\r\n').split(',')
+                # skip the empty field left by a trailing comma
+                ids = [np.uint16(n) for n in fields[1:] if n.strip()]
+                yield np.uint32(fields[0]), ids, position
 
 ###############################################################################
 # MAIN PROGRAM
+# (guarded, parallel workers import this module)
 ###############################################################################
-infile = sys.argv[1]
-filename, file_extension = os.path.splitext(infile)
-outfile1 = filename + '_size.csv'
-outfile2 = filename + '_list.csv'
+if __name__ == '__main__':
+    # optional overrides: clustering.py <allSpikeTime.csv> [TAU RADIUS [JOBS]]
+    #                                    [--resume] [--metrics] [--phases]
+    RESUME = '--resume' in sys.argv
+    PHASES = '--phases' in sys.argv
+    METRICS = '--metrics' in sys.argv or PHASES
+    argv = [a for a in sys.argv if a not in ('--resume', '--metrics', '--phases')]
+    infile = argv[1].rstrip(os.sep)
+    if len(argv) > 3:
+        TAU = float(argv[2])
+        RADIUS = float(argv[3])
+    JOBS = int(argv[4]) if len(argv) > 4 else 1
+    filename, file_extension = os.path.splitext(infile)
+    outfile1 = filename + '_size.csv'
+    outfile2 = filename + '_list.csv'
+    checkpointFile = filename + '_checkpoint.npz'
+    metricsFile = filename + '_metrics.jsonl'
 
-# -----------------------------------------------------------------------------
-# Step 1: Create an empty list to hold avalanche objects
-# -----------------------------------------------------------------------------
-A = []
-readCSV = csv.reader(open(infile), delimiter=',')
-# -----------------------------------------------------------------------------
-# Step 2: Read <allSpikeTime.csv> and process it spike by spike
-# -----------------------------------------------------------------------------
-for line in readCSV:
-    current_ts = np.uint32(line[0])
-    col = 1
-    print(current_ts)   # debugging
-# -----------------------------------------------------------------------------
-# Step 3: Perform spatiotemporal clustering for each spike
-# -----------------------------------------------------------------------------
-    while col < (len(line)-1):
-        current_id = np.uint16(line[col])
-        # see if current spike can be added to existed avalanches
-        if findAval(current_ts, current_id, A) is not True:
-            new_a = Avalanche()
-            A.append(new_a)
-            new_a.add_node(current_ts, current_id)
-        col = col + 1
+    # -------------------------------------------------------------------------
+    # Step 1: Create the avalanche engine (neuron locations from the .h5 file when
+    # it has them, else the neuronLayout.GRID numbering); closed avalanches go
+    # to the sink
+    # -------------------------------------------------------------------------
+    layout = loadLayout(infile)
+    xloc, yloc = layout.x, layout.y
+    if JOBS > 1:
+        # partitions of the spike stream clustered in JOBS processes from a
+        # spike store (CSV/.h5 input is converted to <input>_spikes once;
+        # sizes only, see parallelClustering.py)
+        writeTableSizes(clusterParallel(infile, xloc, yloc, TAU, RADIUS, JOBS), outfile1)
+        sys.exit()
+    # --resume continues from the last checkpoint (same output as an uninterrupted run)
+    engineState, sinkState, position = None, None, 0
+    if RESUME and os.path.exists(checkpointFile):
+        engineState, sinkState, position = loadCheckpoint(checkpointFile)
+    elif RESUME:
+        print("no checkpoint %s, starting over" % checkpointFile)
+    sink = SizeCsvSink(outfile1, resume=sinkState)
+    # sink = ListCsvSink(outfile2, resume=sinkState)      (avalancheEngine.py, members=True below)
+    # sink = AvalancheStoreWriter(filename + '_avalanches', TAU, RADIUS,   (avalancheStore.py)
+    #                             infile if os.path.isdir(infile) else None,
+    #                             resume=sinkState)       (members=True)
+    engine = AvalancheEngine(xloc, yloc, TAU, RADIUS, sink=sink)
+    if engineState is not None:
+        engine.setState(engineState)
+    # --metrics: a JSON line of throughput and state every PROGRESS seconds,
+    # --phases adds search/merge/output timers (see engineMetrics.py)
+    metrics = EngineMetrics(engine, metricsFile, PROGRESS or 10, PHASES,
+                            resume=engineState) if METRICS else None
+    # -------------------------------------------------------------------------
+    # Step 2: Read <allSpikeTime.csv> (or the .h5 file) and process it spike by spike
+    # (every CHECKPOINT seconds the open state and input position are saved)
+    # -------------------------------------------------------------------------
+    lastProgress = time.time()
+    lastCheckpoint = time.time()
+    for current_ts, ids, position in readSpikesAt(infile, position):
+        if PROGRESS and time.time() - lastProgress >= PROGRESS:
+            print("time step %i" % current_ts)
+            lastProgress = time.time()
+    # -------------------------------------------------------------------------
+    # Step 3: Perform spatiotemporal clustering for the spikes of the time step
+    # (joins every avalanche within TAU and RADIUS, merging them if several;
+    # avalanches closed by then are written out)
+    # -------------------------------------------------------------------------
+        engine.addTimestep(current_ts, ids)
+        if metrics is not None:
+            metrics.update(current_ts)
+        if CHECKPOINT and time.time() - lastCheckpoint >= CHECKPOINT:
+            saveCheckpoint(checkpointFile, engine, position)
+            lastCheckpoint = time.time()
 
-# -----------------------------------------------------------------------------
-# Step 4: All spikes processed, remove all single spike avalanches
-# -----------------------------------------------------------------------------
-removeSingles()
-# -----------------------------------------------------------------------------
-# Step 5: Output results
-# -----------------------------------------------------------------------------
-outputAvalSize(outfile1)
-# outputAvalList(outfile2)
+    # -------------------------------------------------------------------------
+    # Step 4/5: Close the remaining avalanches and finish the output
+    # -------------------------------------------------------------------------
+    engine.finish()
+    sink.close()
+    if metrics is not None:
+        metrics.close()
+    if os.path.exists(checkpointFile):
+        os.remove(checkpointFile)
@@ -27,34 +27,22 @@ import csv
 import numpy as np
 from SpikeData import Spike
 from SpikeData import Avalanche
+from neuronLayout import NeuronLayout, gridLayout
 
 ###############################################################################
 # USER DEFINED VARIABLES
 ###############################################################################
-GRID = 100          # grid size (e.g. 100 is 100 x 100, 10000 neurons)
 TAU = 50            # temporal window (unit: time steps (0.1ms))
 RADIUS = 8          # spatial window (unit: neuron distances)
 meanISI = 1.5
 ###############################################################################
 
 # -----------------------------------------------------------------------------
-# getXY()
-# get X, Y location using its neuron ID
+# NEAR(n1, n2)
+# True when two neurons are less than RADIUS apart (precomputed table for the
+# neuronLayout.GRID numbering, see neuronLayout.py)
 # -----------------------------------------------------------------------------
-def getXY(n):
-    y = np.floor_divide((n-1), GRID) + 1
-    x = n - (GRID*y) + GRID
-    return x, y
-
-# -----------------------------------------------------------------------------
-# getDistance()
-# get distance between two neurons
-# -----------------------------------------------------------------------------
-def getDistance(n1, n2):
-    x1, y1 = getXY(n1)
-    x2, y2 = getXY(n2)
-    d = np.sqrt((x1 - x2)**2 + (y1 - y2)**2)
-    return abs(d)
+NEAR = NeuronLayout(*gridLayout()).near(RADIUS)
 
 # -----------------------------------------------------------------------------
 # mergeAval()
@@ -91,9 +79,8 @@ def spatial():
 def findMatch(target, a):
     node = a.tail
     while node is not None:
-        d = getDistance(target.id, node.id)
         tdiff = abs(target.ts - node.ts)
-        if 0 < d < RADIUS and tdiff < TAU:
+        if target.id != node.id and tdiff < TAU and NEAR(target.id, node.id):
             return True
         node = node.prev
     return False
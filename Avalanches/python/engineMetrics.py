@@ -0,0 +1,160 @@
+"""
+@file     engineMetrics.py
+@date     10/18/2026
+
+@brief    Throughput and state records of a running AvalancheEngine
+
+          EngineMetrics writes one JSON object per line every interval
+          seconds (and a last one at close()):
+            elapsed, t            - wall seconds since start, current time step
+            spikes, spikesPerSec  - spikes added so far, rate over the interval
+            window                - spikes less than TAU old (the active window)
+            held                  - spikes still in memory (window + not trimmed)
+            live                  - avalanches not closed yet
+            largestOpen           - size of the largest live avalanche
+            largestClosed         - size of the largest closed avalanche so far
+            merges, mergesPerSec  - unions of two avalanches, rate over the interval
+            rssMB                 - resident memory (/proc/self/statm, Linux)
+          A merge storm shows up as mergesPerSec rising while spikesPerSec
+          drops, a window too large for memory as window/held and rssMB.
+
+          With phases=True the record also has the seconds spent per phase
+          in the interval:
+            search  - grid index lookups and updates (spatialIndex.py)
+            output  - retiring closed avalanches and writing them (the sink)
+            merge   - the rest of addTimestep(): union-find and bookkeeping
+          Timing wraps those engine methods, so it costs a clock read per
+          call and is off by default.
+
+          When a run is resumed from a checkpoint, pass the engine state
+          (resume=engineState, as loadCheckpoint() returns it): records are
+          appended to the file of the interrupted run and the first rates
+          count from the restored spike and merge totals.
+
+Usage:
+    metrics = EngineMetrics(engine, 'run_metrics.jsonl', interval=10, phases=True)
+    for current_ts, ids in spikes:
+        engine.addTimestep(current_ts, ids)
+        metrics.update(current_ts)
+    metrics.close()
+"""
+import json
+import os
+import time
+import numpy as np
+
+INTERVAL = 10           # seconds between records
+SEARCH = ('neighbors', 'update', 'cellsMany', 'ownersIn', 'updateMany')
+
+
+# -----------------------------------------------------------------------------
+# rssMB() resident set size of this process, None where /proc is missing
+# -----------------------------------------------------------------------------
+def rssMB():
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / float(1 << 20)
+
+
+# -----------------------------------------------------------------------------
+# CLASS: EngineMetrics()
+# periodic JSON-lines records of an engine (and optional phase timers)
+# -----------------------------------------------------------------------------
+class EngineMetrics(object):
+    def __init__(self, engine, outfile, interval=INTERVAL, phases=False, resume=None):
+        self.engine = engine
+        self.interval = interval
+        self.start = time.time()
+        self.last = self.start
+        if resume is None:
+            self.f = open(outfile, 'w')
+            self.lastSpikes = self.spikes()
+            self.lastMerges = engine.merges
+        else:
+            # keep the records written before the checkpoint
+            self.f = open(outfile, 'a')
+            self.lastSpikes = int(resume['base']) + len(resume['ts'])
+            self.lastMerges = int(resume['merges'])
+        self.t = None
+        self.phases = None
+        if phases:
+            self.phases = {'search': 0.0, 'output': 0.0, 'busy': 0.0}
+            self.__timePhases()
+
+    def __timed(self, method, phase):
+        phases = self.phases
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                phases[phase] += time.perf_counter() - t0
+        return timed
+
+    def __timePhases(self):
+        # wrap the bound methods of this engine (and its index) only
+        engine = self.engine
+        if engine.index is not None:
+            for name in SEARCH:
+                setattr(engine.index, name, self.__timed(getattr(engine.index, name), 'search'))
+        engine.retire = self.__timed(engine.retire, 'output')
+        # busy includes the search and output calls made inside
+        for name in ('addTimestep', 'finish'):
+            setattr(engine, name, self.__timed(getattr(engine, name), 'busy'))
+
+    def spikes(self):
+        return self.engine.base + len(self.engine.ts)
+
+    def update(self, t):
+        """Write a record if interval seconds have passed (call once per time step)."""
+        self.t = t
+        if time.time() - self.last >= self.interval:
+            self.write()
+
+    def record(self):
+        engine = self.engine
+        now = time.time()
+        seconds = max(now - self.last, 1e-9)
+        spikes = self.spikes()
+
+        # live avalanches: roots with spikes that are not retired
+        parent = np.frombuffer(engine.parent, dtype=np.int64)[engine.oldest:]
+        size = np.frombuffer(engine.size, dtype=np.int64)[engine.oldest:]
+        roots = (parent == np.arange(engine.oldest, len(engine.parent))) & (size > 0)
+        x = {'elapsed': round(now - self.start, 3),
+             't': None if self.t is None else int(self.t),
+             'spikes': spikes,
+             'spikesPerSec': round((spikes - self.lastSpikes) / seconds, 1),
+             'window': len(engine.ts) - engine.expired,
+             'held': len(engine.ts),
+             'live': int(roots.sum()),
+             'largestOpen': int(size[roots].max()) if roots.any() else 0,
+             'largestClosed': int(engine.largest),
+             'merges': engine.merges,
+             'mergesPerSec': round((engine.merges - self.lastMerges) / seconds, 1),
+             'rssMB': rssMB()}
+        if self.phases is not None:
+            p = self.phases
+            x['search'] = round(p['search'], 4)
+            x['output'] = round(p['output'], 4)
+            x['merge'] = round(max(p['busy'] - p['search'] - p['output'], 0.0), 4)
+            for k in p:
+                p[k] = 0.0
+        self.last = now
+        self.lastSpikes = spikes
+        self.lastMerges = engine.merges
+        return x
+
+    def write(self):
+        self.f.write(json.dumps(self.record()) + '\n')
+        self.f.flush()
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.write()
+        self.f.close()
@@ -0,0 +1,152 @@
+"""
+@file     intervalJoin.py
+@date     10/18/2026
+
+@brief    Interval joins of avalanche tables against burst tables
+
+          Both tables are StartT/EndT intervals (time steps, inclusive). The
+          analyses used to scan every burst for every avalanche (O(B x A));
+          IntervalIndex sorts the bursts once and answers every avalanche
+          with np.searchsorted, so a join is O((A + B) log B) array work.
+
+          related() labels each avalanche for any number of windows w at
+          once, with the codes of the WithinBurst column of
+          12_remove_burst_related_avalanches.ipynb:
+            UNRELATED (0)
+            BEFORE    (1)  EndT in [burst StartT - w, burst StartT]
+            AFTER     (2)  StartT in [burst EndT, burst EndT + w]
+            WITHIN    (3)  the avalanche is the burst (same StartT and EndT)
+          An avalanche related to several bursts gets the label of the last
+          of them in table order (WITHIN before BEFORE before AFTER for the
+          same burst), as the notebook's loop of overwriting assignments
+          does. Ranges of bursts are found by binary search on the sorted
+          ends/starts and their last table row by a sparse-table range
+          maximum, so the windows are one broadcast (windows x avalanches)
+          pass.
+
+          nearest() gives, per avalanche, the end of the closest burst
+          before it, the start of the closest one after it and whether a
+          burst overlaps it (plotMidSizedAvalancheProximity.py).
+
+Usage:
+    index = IntervalIndex(bursts['StartT'], bursts['EndT'])
+    labels = index.related(avals['StartT'], avals['EndT'], [450, 1000, 1500])
+    nonBurst450 = labels[0] == UNRELATED
+"""
+import numpy as np
+
+UNRELATED = 0
+BEFORE = 1
+AFTER = 2
+WITHIN = 3
+
+
+# -----------------------------------------------------------------------------
+# CLASS: RangeMax()
+# sparse table over an array: maximum of any range [lo, hi) in two lookups
+# -----------------------------------------------------------------------------
+class RangeMax(object):
+    def __init__(self, values):
+        levels = [np.asarray(values, dtype=np.int64)]
+        width = 1
+        while 2 * width <= len(levels[0]):
+            prev = levels[-1]
+            levels.append(np.maximum(prev[:len(prev) - width], prev[width:]))
+            width *= 2
+        # level l holds the maximum of [i, i + 2**l), padded to a common length
+        self.table = np.full((len(levels), max(len(levels[0]), 1)), -1, dtype=np.int64)
+        for l, level in enumerate(levels):
+            self.table[l, :len(level)] = level
+
+    def __call__(self, lo, hi):
+        """Maximum of each range [lo, hi), -1 where the range is empty."""
+        lo = np.asarray(lo, dtype=np.int64)
+        hi = np.asarray(hi, dtype=np.int64)
+        n = hi - lo
+        empty = n <= 0
+        l = np.where(empty, 0, np.floor(np.log2(np.maximum(n, 1)))).astype(np.int64)
+        lo = np.where(empty, 0, lo)
+        right = np.where(empty, 0, hi - (1 << l))
+        out = np.maximum(self.table[l, lo], self.table[l, right])
+        return np.where(empty, -1, out)
+
+
+# -----------------------------------------------------------------------------
+# CLASS: IntervalIndex()
+# burst intervals sorted by start and by end, with their table rows
+# -----------------------------------------------------------------------------
+class IntervalIndex(object):
+    def __init__(self, startT, endT):
+        startT = np.asarray(startT, dtype=np.int64)
+        endT = np.asarray(endT, dtype=np.int64)
+        self.count = len(startT)
+        # by start (then end): starts, ends and the running maximum end
+        byStart = np.lexsort((endT, startT))
+        self.start = startT[byStart]
+        self.startEnd = endT[byStart]
+        self.maxEnd = np.maximum.accumulate(self.startEnd) if self.count else self.startEnd
+        self.startRows = RangeMax(byStart)
+        # (start, end) pairs as one increasing key: run of equal starts, then end
+        newRun = np.concatenate(([True], np.diff(self.start) != 0)) if self.count else \
+            np.zeros(0, dtype=bool)
+        self.runStart = self.start[newRun]
+        self.minEnd = int(self.startEnd.min()) if self.count else 0
+        self.span = int(self.startEnd.max()) - self.minEnd + 1 if self.count else 1
+        self.key = (np.cumsum(newRun) - 1) * self.span + (self.startEnd - self.minEnd)
+        # by end
+        byEnd = np.argsort(endT, kind='stable')
+        self.end = endT[byEnd]
+        self.endRows = RangeMax(byEnd)
+
+    def __len__(self):
+        return self.count
+
+    def lastRow(self, sortedValues, rows, lo, hi):
+        """Last table row among the intervals with lo <= value <= hi (-1 for none)."""
+        a = np.searchsorted(sortedValues, lo, side='left')
+        b = np.searchsorted(sortedValues, hi, side='right')
+        return rows(a, b)
+
+    def related(self, startT, endT, windows):
+        """UNRELATED/BEFORE/AFTER/WITHIN label of each interval, one row per window."""
+        startT = np.asarray(startT, dtype=np.int64)
+        endT = np.asarray(endT, dtype=np.int64)
+        w = np.asarray(windows, dtype=np.int64).reshape(-1, 1)
+        if self.count == 0:
+            return np.zeros((len(w), len(startT)), dtype=np.int8)
+
+        # last burst with the same interval, through the (start, end) keys
+        run = np.searchsorted(self.runStart, startT, side='left')
+        found = (run < len(self.runStart)) & (endT >= self.minEnd) & (endT <= self.maxEnd[-1])
+        found &= self.runStart[np.minimum(run, len(self.runStart) - 1)] == startT
+        key = run * self.span + (endT - self.minEnd)
+        exactLo = np.searchsorted(self.key, key, side='left')
+        exactHi = np.where(found, np.searchsorted(self.key, key, side='right'), exactLo)
+        within = self.startRows(exactLo, exactHi)
+        # bursts starting in [EndT, EndT + w] / ending in [StartT - w, StartT]
+        before = self.lastRow(self.start, self.startRows, endT, endT + w)
+        after = self.lastRow(self.end, self.endRows, startT - w, startT)
+
+        last = np.maximum(np.maximum(before, after), within)
+        labels = np.zeros(last.shape, dtype=np.int8)
+        labels[(last >= 0) & (after == last)] = AFTER
+        labels[(last >= 0) & (before == last)] = BEFORE
+        labels[(last >= 0) & (within == last)] = WITHIN
+        return labels
+
+    def nearest(self, startT, endT):
+        """
+        End of the last burst (in start order) starting at or before each
+        EndT, start of the first burst starting after it (-1 where there is
+        none) and whether a burst overlaps the interval (the other two are
+        -1 then).
+        """
+        startT = np.asarray(startT, dtype=np.int64)
+        endT = np.asarray(endT, dtype=np.int64)
+        k = np.searchsorted(self.start, endT, side='right')
+        has = k > 0
+        overlaps = has & (self.maxEnd[np.maximum(k - 1, 0)] >= startT) if self.count else has
+        preceding = np.where(has & ~overlaps, self.startEnd[np.maximum(k - 1, 0)] if self.count else -1, -1)
+        following = np.where((k < self.count) & ~overlaps,
+                             self.start[np.minimum(k, self.count - 1)] if self.count else -1, -1)
+        return preceding, following, overlaps
@@ -0,0 +1,164 @@
+"""
+@file     neuronLayout.py
+@date     10/18/2026
+
+@brief    Neuron positions and within-radius lookup tables
+
+          A NeuronLayout holds the grid position of every neuron as int16
+          x/y arrays, read from the xloc/yloc datasets of the Graphitti HDF5
+          output (readLayout()) or built for the implicit GRID x GRID
+          numbering of <allSpikeTime.csv> (gridLayout(): neuron n sits at
+          x = (n-1) % GRID + 1, y = (n-1) // GRID + 1).
+
+          near(radius) precomputes which neurons are less than radius apart
+          (squared distances on integers, no square roots), so a distance
+          check becomes a table lookup:
+            - a bitmap of N x N bits when it fits in BITMAP_LIMIT bytes
+              (12.5 MB for 10000 neurons)
+            - neighbor lists (CSR) otherwise, also available as neighbors()
+          Both are built from the grid stencil of spatialIndex.py, so the
+          cost is O(N * stencil), not O(N^2). The bitmap is also kept as a
+          bytes object so a scalar check costs no NumPy call.
+
+Usage:
+    layout = loadLayout(infile)             # xloc/yloc of an .h5 file, else GRID
+    near = layout.near(RADIUS)
+    if near(n1, n2): ...                    # one byte lookup
+    near.many(ns1, ns2)                     # element-wise, arrays
+"""
+import h5py
+import numpy as np
+from spatialIndex import SpatialIndex
+
+GRID = 100                  # grid size of the implicit neuron numbering (100 x 100 neurons)
+BITMAP_LIMIT = 1 << 26      # largest within-radius bitmap (bytes)
+
+
+# -----------------------------------------------------------------------------
+# gridLayout()
+# positions of neurons 1..grid*grid in the implicit numbering, indexed by
+# neuron number - 1
+# -----------------------------------------------------------------------------
+def gridLayout(grid=GRID):
+    i = np.arange(grid * grid)
+    return i % grid + 1, i // grid + 1
+
+
+# -----------------------------------------------------------------------------
+# readLayout()
+# xloc/yloc of the Graphitti HDF5 output, indexed by neuron index
+# -----------------------------------------------------------------------------
+def readLayout(h5file):
+    with h5py.File(h5file, 'r') as f:
+        return np.ravel(f['xloc'][()]), np.ravel(f['yloc'][()])
+
+
+def hasLayout(h5file):
+    with h5py.File(h5file, 'r') as f:
+        return 'xloc' in f and 'yloc' in f
+
+
+def loadLayout(infile=None, grid=GRID, idBase=1):
+    """Layout of an .h5 file with xloc/yloc, else of the GRID numbering."""
+    if infile is not None and infile.endswith('.h5') and hasLayout(infile):
+        return NeuronLayout(*readLayout(infile), idBase=idBase)
+    return NeuronLayout(*gridLayout(grid), idBase=idBase)
+
+
+# -----------------------------------------------------------------------------
+# CLASS: NeuronLayout()
+# int16 x/y of every neuron plus cached within-radius tables
+# -----------------------------------------------------------------------------
+class NeuronLayout(object):
+    def __init__(self, xloc, yloc, idBase=1):
+        x = np.asarray(xloc, dtype=np.float64)
+        y = np.asarray(yloc, dtype=np.float64)
+        if np.any(x != np.round(x)) or np.any(y != np.round(y)):
+            raise ValueError("neuron locations must lie on an integer grid")
+        info = np.iinfo(np.int16)
+        if len(x) and (min(x.min(), y.min()) < info.min or max(x.max(), y.max()) > info.max):
+            raise ValueError("neuron locations do not fit in int16")
+        self.x = x.astype(np.int16)
+        self.y = y.astype(np.int16)
+        self.idBase = idBase
+        self.tables = {}
+
+    def __len__(self):
+        return len(self.x)
+
+    def xy(self, n):
+        """(x, y) of neuron n."""
+        return int(self.x[n - self.idBase]), int(self.y[n - self.idBase])
+
+    def distance2(self, a, b):
+        """Squared distance between neurons a and b (numbers or arrays of them)."""
+        a = np.asarray(a) - self.idBase
+        b = np.asarray(b) - self.idBase
+        dx = self.x[a].astype(np.int32) - self.x[b]
+        dy = self.y[a].astype(np.int32) - self.y[b]
+        return dx * dx + dy * dy
+
+    def near(self, radius):
+        """Within-radius table for radius (built once per radius)."""
+        if radius not in self.tables:
+            self.tables[radius] = NearTable(self, radius)
+        return self.tables[radius]
+
+
+# -----------------------------------------------------------------------------
+# CLASS: NearTable()
+# which neurons are less than radius apart (a neuron is near itself)
+# -----------------------------------------------------------------------------
+class NearTable(object):
+    def __init__(self, layout, radius, bitmapLimit=BITMAP_LIMIT):
+        self.idBase = layout.idBase
+        self.radius = radius
+        n = len(layout)
+
+        # neighbors through the stencil: neuron at each offset of each neuron's cell
+        index = SpatialIndex(layout.x, layout.y, radius, layout.idBase)
+        cellNeuron = np.full(len(index.lastTs), -1, dtype=np.int64)
+        cellNeuron[index.cell] = np.arange(n)
+        nb = cellNeuron[index.cell[:, None] + index.stencil]
+        nb.sort(axis=1)
+        rows, cols = np.nonzero(nb >= 0)
+        other = nb[rows, cols]
+        # CSR of neuron numbers, each row sorted
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=n))))
+        self.indices = (other + self.idBase).astype(np.int32)
+
+        # packed rows of N bits (np.packbits order, most significant bit first);
+        # bits is the same as bytes, for scalar lookups without NumPy overhead
+        self.stride = (n + 7) // 8
+        self.bitmap = None
+        self.bits = None
+        if n * self.stride <= bitmapLimit:
+            self.bitmap = np.zeros((n, self.stride), dtype=np.uint8)
+            np.bitwise_or.at(self.bitmap, (rows, other >> 3),
+                             (np.uint8(0x80) >> (other & 7)).astype(np.uint8))
+            self.bits = self.bitmap.tobytes()
+
+    def __call__(self, a, b):
+        """True when neurons a and b are less than radius apart."""
+        a = int(a) - self.idBase
+        b = int(b) - self.idBase
+        if self.bits is not None:
+            return (self.bits[a * self.stride + (b >> 3)] >> (7 - (b & 7))) & 1 == 1
+        row = self.indices[self.indptr[a]:self.indptr[a + 1]]
+        k = int(np.searchsorted(row, b + self.idBase))
+        return k < len(row) and row[k] == b + self.idBase
+
+    def many(self, a, b):
+        """Element-wise __call__() of two arrays of neuron numbers."""
+        a = np.asarray(a) - self.idBase
+        b = np.asarray(b) - self.idBase
+        if self.bitmap is not None:
+            return (self.bitmap[a, b >> 3] >> (7 - (b & 7))) & 1 == 1
+        return np.array([self(int(i), int(j)) for i, j in zip(a.ravel() + self.idBase,
+                                                              b.ravel() + self.idBase)],
+                        dtype=bool).reshape(a.shape)
+
+    def neighbors(self, n):
+        """Neuron numbers less than radius from neuron n (n itself included), sorted."""
+        i = n - self.idBase
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
@@ -0,0 +1,235 @@
+"""
+@file     parallelClustering.py
+@date     10/18/2026
+
+@brief    Time-partitioned parallel spatiotemporal clustering
+
+          No avalanche bridges a silence of TAU or more time steps, so the
+          time-ordered spikes can be cut into partitions at such gaps and
+          each partition clustered on its own (AvalancheEngine, in a
+          ProcessPoolExecutor). Cuts are looked for near evenly spaced rows;
+          where there is no gap nearby the cut is made anyway at a time step
+          c and reconciled afterwards:
+
+            - every spike pair joined across c lies in the window of spikes
+              with c - TAU < t < c + TAU, so the window is clustered again
+              and its components tell which partition avalanches touch
+            - the workers report the avalanche of every spike in the
+              windows next to their partition
+            - a union-find over all partition avalanches joins the ones
+              linked through a window, and their sizes, first spikes, end
+              times and extents are combined with np.add.at / np.minimum.at
+
+          The result is the table of the serial clustering.py (avalanches of
+          at least two spikes ordered by their first spike), so
+          writeSizeCsv() output is the same.
+
+          Workers read their rows straight from a spike store (see
+          spikeStore.py), memory-mapped, so each process only pages in its
+          partition. <allSpikeTime.csv> and .h5 inputs are converted to a
+          store next to the input first (<input>_spikes, one streamed pass,
+          reused by later runs while it is newer than the input).
+
+Usage:
+    table = clusterParallel(infile, xloc, yloc, TAU, RADIUS, jobs=8)
+    writeTableSizes(table, outfile)
+"""
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from avalancheEngine import AvalancheEngine
+from spikeStore import SpikeStore, writeFromCsv, writeFromH5
+
+PARTITION_SIZE = 1 << 21    # spikes per partition (at most, unless a time step is larger)
+COLUMNS = ['first', 'size', 'StartT', 'EndT', 'minX', 'maxX', 'minY', 'maxY']
+
+
+# -----------------------------------------------------------------------------
+# spikeStorePath()
+# spike store of infile: infile itself, or <input>_spikes next to an
+# <allSpikeTime.csv> or .h5 input, converted once (streamed, see
+# spikeStore.py) and reused while it is newer than the input; its ts/neuron
+# are memory-mapped, so no process holds every spike
+# -----------------------------------------------------------------------------
+def spikeStorePath(infile):
+    if os.path.isdir(infile):
+        return infile
+    path = os.path.splitext(infile)[0] + '_spikes'
+    meta = os.path.join(path, 'meta.json')
+    if os.path.exists(meta) and os.path.getmtime(meta) >= os.path.getmtime(infile):
+        return path
+    # meta.json is written last, so an interrupted conversion is redone
+    if os.path.exists(meta):
+        os.remove(meta)
+    if infile.endswith('.h5'):
+        writeFromH5(infile, path)
+    else:
+        writeFromCsv(infile, path)
+    return path
+
+
+def arrayTimesteps(ts, nid):
+    """Yield (timestep, neuron_ids) rows of time-ordered spike arrays."""
+    ts = np.asarray(ts, dtype=np.int64)
+    bounds = np.flatnonzero(np.diff(ts)) + 1
+    return zip(ts[np.concatenate(([0], bounds))].tolist(), np.split(np.asarray(nid), bounds))
+
+
+# -----------------------------------------------------------------------------
+# findCuts()
+# partition boundaries (rows) near evenly spaced targets, preferring gaps of
+# TAU or more; returns the cuts (first 0, last len(ts)) and, per inner cut,
+# the (lo, hi) rows of its reconciliation window, or None for a clean cut
+# -----------------------------------------------------------------------------
+def findCuts(ts, tau, parts):
+    n = len(ts)
+    search = max(1, n // (4 * parts))
+    cuts = [0]
+    windows = []
+    used = 0        # rows before this belong to an earlier window
+    for k in range(1, parts):
+        target = max(k * n // parts, used + 1)
+        if target >= n:
+            break
+        lo = max(target - search, used + 1)
+        hi = min(target + search, n)
+        seg = np.asarray(ts[lo - 1:hi], dtype=np.int64)
+        gaps = np.flatnonzero(np.diff(seg) >= tau) + lo
+        if len(gaps):
+            cut = int(gaps[np.argmin(np.abs(gaps - target))])
+            window = None
+        else:
+            # cut at the start of a time step, reconcile the spikes around it
+            t = int(ts[target])
+            cut = int(np.searchsorted(ts, t, side='left'))
+            window = (int(np.searchsorted(ts, t - tau, side='right')),
+                      int(np.searchsorted(ts, t + tau, side='left')))
+            # windows must not overlap, or a spike would need two partitions' labels
+            if cut <= cuts[-1] or window[0] < used:
+                continue
+        cuts.append(cut)
+        windows.append(window)
+        used = window[1] if window else cut
+    cuts.append(n)
+    return cuts, windows
+
+
+# -----------------------------------------------------------------------------
+# clusterPartition()
+# cluster rows [start, stop) (run in a worker); returns the avalanche table
+# (with single spikes only where they touch a window) and the avalanche of
+# every spike in rows [start, head) and [tail, stop)
+# -----------------------------------------------------------------------------
+def clusterPartition(store, start, stop, head, tail, xloc, yloc, tau, radius):
+    engine = AvalancheEngine(xloc, yloc, tau, radius)
+    for current_ts, ids in SpikeStore(store).timesteps(start, stop):
+        engine.addTimestep(current_ts, ids.tolist())
+
+    table = engine.avalanches(minSize=1)
+    labels = engine.labels()
+    rank = np.full(len(labels), -1, dtype=np.int64)
+    rank[table['root']] = np.arange(len(table['root']))
+    edge = np.concatenate((np.arange(0, head - start), np.arange(tail - start, stop - start)))
+    edgeAval = rank[labels[edge]]
+
+    keep = table['size'] >= 2
+    keep[edgeAval] = True
+    renumber = np.cumsum(keep) - 1
+    out = {c: table[c][keep] for c in COLUMNS}
+    out['first'] = out['first'] + start
+    return out, edge + start, renumber[edgeAval]
+
+
+# -----------------------------------------------------------------------------
+# reconcile()
+# join partition avalanches linked through the windows and combine them
+# -----------------------------------------------------------------------------
+def reconcile(tables, edgeSpikes, edgeAvals, windows, spikes, xloc, yloc, tau, radius):
+    offsets = np.cumsum([0] + [len(t['size']) for t in tables])
+    table = {c: np.concatenate([t[c] for t in tables]) for c in COLUMNS}
+    edgeSpikes = np.concatenate(edgeSpikes)
+    edgeAvals = np.concatenate([a + offsets[k] for k, a in enumerate(edgeAvals)])
+
+    parent = np.arange(len(table['size']))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    ts, nid = spikes
+    for window in windows:
+        if window is None:
+            continue
+        lo, hi = window
+        engine = AvalancheEngine(xloc, yloc, tau, radius)
+        for current_ts, ids in arrayTimesteps(ts[lo:hi], nid[lo:hi]):
+            engine.addTimestep(current_ts, ids.tolist())
+        aval = edgeAvals[np.searchsorted(edgeSpikes, np.arange(lo, hi))]
+        pairs = np.unique(np.column_stack((aval, aval[engine.labels()])), axis=0)
+        for a, b in pairs[pairs[:, 0] != pairs[:, 1]].tolist():
+            ra = find(a)
+            rb = find(b)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+
+    # every root is the smallest index of its set, so pointer jumping settles
+    roots = parent
+    while True:
+        up = roots[roots]
+        if np.array_equal(up, roots):
+            break
+        roots = up
+    size = np.zeros(len(parent), dtype=np.int64)
+    np.add.at(size, roots, table['size'])
+    combined = {'size': size}
+    for c in ('first', 'StartT', 'minX', 'minY'):
+        combined[c] = table[c].copy()
+        np.minimum.at(combined[c], roots, table[c])
+    for c in ('EndT', 'maxX', 'maxY'):
+        combined[c] = table[c].copy()
+        np.maximum.at(combined[c], roots, table[c])
+
+    keep = (roots == np.arange(len(roots))) & (size >= 2)
+    order = np.argsort(combined['first'][keep], kind='stable')
+    return {c: combined[c][keep][order] for c in COLUMNS}
+
+
+# -----------------------------------------------------------------------------
+# clusterParallel()
+# avalanche table of infile (see avalancheEngine.avalanches()) using jobs
+# worker processes
+# -----------------------------------------------------------------------------
+def clusterParallel(infile, xloc, yloc, tau, radius, jobs=None):
+    jobs = jobs or os.cpu_count()
+    path = spikeStorePath(infile)
+    store = SpikeStore(path)
+    spikes = store.ts, store.neuron
+    ts = store.ts
+    parts = max(4 * jobs, -(-len(ts) // PARTITION_SIZE))
+    cuts, windows = findCuts(ts, tau, parts)
+
+    tasks = []
+    for k in range(len(cuts) - 1):
+        start, stop = cuts[k], cuts[k + 1]
+        head = min(windows[k - 1][1], stop) if k > 0 and windows[k - 1] else start
+        tail = max(windows[k][0], start) if k < len(windows) and windows[k] else stop
+        tasks.append((path, start, stop, head, tail))
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(clusterPartition, *task, xloc, yloc, tau, radius) for task in tasks]
+        results = [f.result() for f in futures]
+    tables, edgeSpikes, edgeAvals = zip(*results) if results else ([], [], [])
+    if not tables:
+        return {c: np.empty(0, dtype=np.int64) for c in COLUMNS}
+    return reconcile(tables, edgeSpikes, edgeAvals, windows, spikes, xloc, yloc, tau, radius)
+
+
+# -----------------------------------------------------------------------------
+# writeTableSizes() write sizes of the table's avalanches (<_size.csv>)
+# -----------------------------------------------------------------------------
+def writeTableSizes(table, outfile):
+    with open(outfile, 'w') as f:
+        for size in table['size'].tolist():
+            f.write("%i\n" % size)
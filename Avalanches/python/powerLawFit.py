@@ -0,0 +1,363 @@
+"""
+@file     powerLawFit.py
+@date     10/18/2026
+
+@brief    Avalanche size histograms and discrete power-law fits
+
+          sizeHistogram() reads the TotalSpikes column of an avalanche table
+          (spatiotemporal.cpp / avalancheSweep.py format), a <_size.csv>
+          file or an avalanche store (avalancheStore.py) in one bulk read
+          and counts the sizes with np.bincount; the exact histogram
+          (distinct sizes and their counts) is all the fits need, and
+          loadHistogram() keeps it in the analysis cache (analysisCache.py).
+
+          fitPowerLaw() fits P(s) ~ s^-alpha for s >= xmin (and s <= xmax,
+          e.g. 1e4 to leave the bursts out) by maximum likelihood, with the
+          normalization of the discrete power law (Hurwitz zeta); alpha is
+          found for every candidate xmin at once (vectorized golden section
+          search) and xmin is the candidate whose fit is closest to the data
+          in Kolmogorov-Smirnov distance (Clauset, Shalizi & Newman 2009).
+          The scan is O(distinct sizes^2) zeta evaluations: candidates need
+          MIN_TAIL avalanches at or above them and can be capped by xminMax.
+
+          goodnessOfFit() is the semiparametric bootstrap of the same paper:
+          synthetic data sets (the empirical sizes below xmin, the fitted
+          power law above it) are fitted the same way and p is the fraction
+          with a KS distance at least the observed one. fitFiles() runs the
+          fits and all bootstrap rounds of many files (a whole TAU sweep) in
+          one ProcessPoolExecutor.
+
+Usage:
+    hist = loadHistogram("SpaTemporal_lastQuarter_tau-50.csv")
+    fit = fitPowerLaw(hist['size'], hist['count'], xmax=1e4)
+
+    python3 powerLawFit.py SpaTemporal_lastQuarter_tau-*.csv --xmax 10000
+                           [--bootstrap 1000] [--jobs 16] [--out fits.csv]
+"""
+import argparse
+import csv
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.special import zeta
+from analysisCache import AnalysisCache
+from avalancheStore import AVAL_DTYPE
+
+ALPHA_RANGE = (1.0001, 6.0)     # alpha searched in this range
+GOLDEN_STEPS = 40               # golden section steps (range / 1.618^40 ~ 2e-8)
+ASYMPTOTIC = 100                # Hurwitz zeta by Euler-Maclaurin from this s on
+BINCOUNT_LIMIT = 1 << 24        # sizes counted with np.bincount below this
+MIN_TAIL = 50                   # avalanches at or above a candidate xmin
+SAMPLE_TABLE = 1 << 20          # sizes sampled exactly above xmin (without xmax)
+ROUNDS_PER_TASK = 25            # bootstrap rounds per pool task
+FIT_COLUMNS = ['file', 'n', 'ntail', 'xmin', 'xmax', 'alpha', 'sigma', 'ks', 'p']
+
+
+# -----------------------------------------------------------------------------
+# readSizes()
+# avalanche sizes of a table with a header (TotalSpikes column), a <_size.csv>
+# file (one size per line) or the avalanches.bin file of an avalanche store
+# -----------------------------------------------------------------------------
+def readSizes(path):
+    if path.endswith('.bin'):
+        return np.fromfile(path, dtype=AVAL_DTYPE)['TotalSpikes'].astype(np.int64)
+    with open(path) as f:
+        header = f.readline().strip().split(',')
+        more = f.readline()
+    if not header[0] or header[0].isdigit():
+        skip, column = 0, 0
+    else:
+        skip = 1
+        column = header.index('TotalSpikes') if 'TotalSpikes' in header else len(header) - 1
+    if not header[0] or (skip and not more):
+        return np.empty(0, dtype=np.int64)
+    return np.loadtxt(path, delimiter=',', skiprows=skip, usecols=column, dtype=np.int64, ndmin=1)
+
+
+# -----------------------------------------------------------------------------
+# sizeHistogram() distinct sizes (increasing) and their counts
+# -----------------------------------------------------------------------------
+def sizeHistogram(path):
+    sizes = readSizes(path)
+    # bincount up to BINCOUNT_LIMIT, the few larger sizes (bursts) counted apart
+    large = sizes >= BINCOUNT_LIMIT
+    counts = np.bincount(sizes[~large])
+    size = np.flatnonzero(counts)
+    largeSize, largeCount = np.unique(sizes[large], return_counts=True)
+    return {'size': np.concatenate((size, largeSize)),
+            'count': np.concatenate((counts[size], largeCount))}
+
+
+def loadHistogram(path, cache=None):
+    """sizeHistogram() of an avalanche table, <_size.csv> file or store, cached."""
+    if os.path.isdir(path):
+        path = os.path.join(path, 'avalanches.bin')
+    cache = cache or AnalysisCache()
+    return cache.call(sizeHistogram, path)
+
+
+# -----------------------------------------------------------------------------
+# hurwitzZeta() zeta(alpha, s) = sum of (s + k)^-alpha over k >= 0
+# scipy below ASYMPTOTIC; above it the Euler-Maclaurin expansion
+#   s^(1-alpha)/(alpha-1) + s^-alpha/2 + B2 and B4 terms
+# is exact to rounding and several times cheaper (the KS scans are mostly
+# zeta evaluations at large sizes)
+# -----------------------------------------------------------------------------
+def hurwitzZeta(alpha, s):
+    alpha, s = np.broadcast_arrays(np.asarray(alpha, dtype=np.float64),
+                                   np.asarray(s, dtype=np.float64))
+    out = np.empty(s.shape)
+    small = s < ASYMPTOTIC
+    out[small] = zeta(alpha[small], s[small])
+    a, x = alpha[~small], s[~small]
+    inv2 = 1.0 / (x * x)
+    b4 = a * (a + 1) * (a + 2) / 720 - inv2 * a * (a + 1) * (a + 2) * (a + 3) * (a + 4) / 30240
+    out[~small] = x ** -a * (x / (a - 1) + 0.5 + (a / 12 - inv2 * b4) / x)
+    return out[()]
+
+
+# -----------------------------------------------------------------------------
+# Discrete power law on [xmin, xmax]: P(s) = s^-alpha / Z
+# Z = zeta(alpha, xmin) - zeta(alpha, xmax + 1) (Hurwitz zeta)
+# -----------------------------------------------------------------------------
+def normalization(alpha, xmin, xmax=None):
+    z = hurwitzZeta(alpha, xmin)
+    if xmax is not None:
+        z = z - hurwitzZeta(alpha, np.floor(xmax) + 1)
+    return z
+
+
+def powerLawPmf(s, alpha, xmin, xmax=None):
+    """Probability of each size s under the fitted power law (0 outside [xmin, xmax])."""
+    s = np.asarray(s, dtype=np.float64)
+    inside = (s >= xmin) & (s <= (np.inf if xmax is None else xmax))
+    return np.where(inside, s ** -alpha / normalization(alpha, xmin, xmax), 0.0)
+
+
+def negLogLikelihood(alpha, n, logSum, xmin, xmax=None):
+    return n * np.log(normalization(alpha, xmin, xmax)) + alpha * logSum
+
+
+# -----------------------------------------------------------------------------
+# fitAlpha()
+# MLE alpha for arrays of (xmin, tail count n, sum of log sizes in the tail);
+# the log-likelihood is concave in alpha, so a golden section search on all
+# of them together converges to every maximum
+# -----------------------------------------------------------------------------
+def fitAlpha(xmin, n, logSum, xmax=None):
+    xmin = np.asarray(xmin, dtype=np.float64)
+    lo = np.full(len(xmin), ALPHA_RANGE[0])
+    hi = np.full(len(xmin), ALPHA_RANGE[1])
+    g = (np.sqrt(5) - 1) / 2
+    a = hi - g * (hi - lo)
+    b = lo + g * (hi - lo)
+    fa = negLogLikelihood(a, n, logSum, xmin, xmax)
+    fb = negLogLikelihood(b, n, logSum, xmin, xmax)
+    for step in range(GOLDEN_STEPS):
+        # keep [lo, b] where f(a) < f(b), else [a, hi]; the inner point that
+        # survives is reused, so each step is one evaluation
+        left = fa < fb
+        lo, hi = np.where(left, lo, a), np.where(left, b, hi)
+        inner, fInner = np.where(left, a, b), np.where(left, fa, fb)
+        new = np.where(left, hi - g * (hi - lo), lo + g * (hi - lo))
+        fNew = negLogLikelihood(new, n, logSum, xmin, xmax)
+        a, fa = np.where(left, new, inner), np.where(left, fNew, fInner)
+        b, fb = np.where(left, inner, new), np.where(left, fInner, fNew)
+    return (lo + hi) / 2
+
+
+def ksDistance(size, count, alpha, xmin, xmax=None):
+    """Largest CDF difference between a tail histogram and the power law (exact on
+    the integers: both sides of every step of the empirical CDF are compared)."""
+    n = count.sum()
+    emp = np.cumsum(count) / n
+    z = normalization(alpha, xmin, xmax)
+    zmin = hurwitzZeta(alpha, xmin)
+    after = (zmin - hurwitzZeta(alpha, size + 1)) / z   # P(S <= s)
+    before = (zmin - hurwitzZeta(alpha, size)) / z      # P(S <= s - 1)
+    return max(np.abs(emp - after).max(), np.abs(emp - count / n - before).max())
+
+
+# -----------------------------------------------------------------------------
+# fitPowerLaw()
+# MLE fit of the sizes (histogram) for the xmin with the smallest KS distance
+# (or the given xmin); sizes above xmax are left out
+# -----------------------------------------------------------------------------
+def fitPowerLaw(size, count, xmin=None, xmax=None, xminMax=None, minTail=MIN_TAIL):
+    size = np.asarray(size, dtype=np.int64)
+    count = np.asarray(count, dtype=np.int64)
+    keep = (size >= 1) & (count > 0)
+    if xmax is not None:
+        keep &= size <= xmax
+    size, count = size[keep], count[keep]
+    total = int(count.sum())
+
+    # candidates: every distinct size with enough of the data at or above it
+    tail = np.cumsum(count[::-1])[::-1]
+    logTail = np.cumsum((count * np.log(size))[::-1])[::-1]
+    if xmin is not None:
+        cand = np.searchsorted(size, [xmin], side='left')
+        cand = cand[cand < len(size)]
+        candXmin = np.full(len(cand), xmin, dtype=np.int64)
+    else:
+        ok = tail >= minTail
+        if xminMax is not None:
+            ok &= size <= xminMax
+        cand = np.flatnonzero(ok)
+        candXmin = size[cand]
+    if len(cand) == 0:
+        raise ValueError("no xmin with %i or more avalanches at or above it" % minTail)
+
+    alphas = fitAlpha(candXmin, tail[cand], logTail[cand], xmax)
+    ks = np.array([ksDistance(size[k:], count[k:], a, x, xmax)
+                   for k, a, x in zip(cand, alphas, candXmin)])
+    best = int(np.argmin(ks))
+    k = cand[best]
+    alpha = float(alphas[best])
+    xmin = int(candXmin[best])
+    # standard error from the curvature of the log-likelihood
+    h = 1e-4
+    curvature = (negLogLikelihood(alpha + h, tail[k], logTail[k], xmin, xmax) -
+                 2 * negLogLikelihood(alpha, tail[k], logTail[k], xmin, xmax) +
+                 negLogLikelihood(alpha - h, tail[k], logTail[k], xmin, xmax)) / (h * h)
+    return {'n': total, 'ntail': int(tail[k]), 'xmin': xmin, 'xmax': xmax, 'alpha': alpha,
+            'sigma': float(1 / np.sqrt(curvature)) if curvature > 0 else float('nan'),
+            'ks': float(ks[best])}
+
+
+# -----------------------------------------------------------------------------
+# CLASS: PowerLawSampler()
+# histograms of synthetic data sets for a fit: the empirical sizes below xmin,
+# the fitted power law at and above it (exact up to SAMPLE_TABLE sizes above
+# xmin, the continuous approximation beyond)
+# -----------------------------------------------------------------------------
+class PowerLawSampler(object):
+    def __init__(self, size, count, fit):
+        size = np.asarray(size, dtype=np.int64)
+        count = np.asarray(count, dtype=np.int64)
+        if fit['xmax'] is not None:
+            keep = size <= fit['xmax']
+            size, count = size[keep], count[keep]
+        self.fit = fit
+        self.n = int(count.sum())
+        body = size < fit['xmin']
+        self.bodySize = size[body]
+        self.bodyP = count[body] / max(count[body].sum(), 1)
+        self.pTail = fit['ntail'] / self.n
+        alpha, xmin, xmax = fit['alpha'], fit['xmin'], fit['xmax']
+        last = xmin + SAMPLE_TABLE if xmax is None else min(int(xmax), xmin + SAMPLE_TABLE)
+        self.tailSize = np.arange(xmin, last + 1)
+        self.tailP = self.tailSize ** -float(alpha) / normalization(alpha, xmin, xmax)
+        # the rest of the probability is above the table
+        self.beyond = max(1.0 - self.tailP.sum(), 0.0)
+        self.tailP /= self.tailP.sum() + self.beyond
+
+    def __call__(self, rng):
+        ntail = rng.binomial(self.n, self.pTail)
+        bodyCount = rng.multinomial(self.n - ntail, self.bodyP) if len(self.bodySize) else \
+            np.zeros(0, dtype=np.int64)
+        tailCount = rng.multinomial(ntail, np.append(self.tailP, self.beyond))
+        size = np.concatenate((self.bodySize, self.tailSize))
+        count = np.concatenate((bodyCount, tailCount[:-1]))
+        if tailCount[-1]:
+            # P(S >= s) ~ s^(1 - alpha) above the table
+            x0 = self.tailSize[-1] + 0.5
+            u = 1.0 - rng.random(tailCount[-1])
+            far = np.floor(x0 * u ** (-1.0 / (self.fit['alpha'] - 1.0)) + 0.5).astype(np.int64)
+            far = np.clip(far, self.tailSize[-1] + 1, self.fit['xmax'] or None)
+            size = np.concatenate((size, far))
+            count = np.concatenate((count, np.ones(len(far), dtype=np.int64)))
+        drawn = count > 0
+        size, inverse = np.unique(size[drawn], return_inverse=True)
+        count = count[drawn]
+        return size, np.bincount(inverse, weights=count).astype(np.int64)
+
+
+# -----------------------------------------------------------------------------
+# bootstrapRounds()
+# KS distances of rounds synthetic data sets, each fitted like the data
+# (worker process task)
+# -----------------------------------------------------------------------------
+def bootstrapRounds(size, count, fit, rounds, seed, fixedXmin=False, xminMax=None,
+                    minTail=MIN_TAIL):
+    rng = np.random.default_rng(seed)
+    sample = PowerLawSampler(size, count, fit)
+    ks = np.empty(rounds)
+    for r in range(rounds):
+        s, c = sample(rng)
+        try:
+            ks[r] = fitPowerLaw(s, c, fit['xmin'] if fixedXmin else None, fit['xmax'],
+                                xminMax, minTail)['ks']
+        except ValueError:
+            ks[r] = np.inf
+    return ks
+
+
+def bootstrapTasks(size, count, fit, rounds, seed, **fitArgs):
+    # (function, args) per task; independent streams from one seed
+    seeds = np.random.SeedSequence(seed).spawn(-(-rounds // ROUNDS_PER_TASK))
+    tasks = []
+    for k, s in enumerate(seeds):
+        n = min(ROUNDS_PER_TASK, rounds - k * ROUNDS_PER_TASK)
+        tasks.append((bootstrapRounds, (size, count, fit, n, s), fitArgs))
+    return tasks
+
+
+def goodnessOfFit(size, count, fit, rounds=1000, jobs=None, seed=0, **fitArgs):
+    """Bootstrap p-value of a fit (fraction of synthetic KS distances >= fit['ks'])."""
+    tasks = bootstrapTasks(size, count, fit, rounds, seed, **fitArgs)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        ks = np.concatenate([f.result() for f in
+                             [pool.submit(func, *args, **kw) for func, args, kw in tasks]])
+    return float(np.mean(ks >= fit['ks']))
+
+
+# -----------------------------------------------------------------------------
+# fitFiles()
+# fit (and optionally bootstrap) the sizes of many avalanche files with one
+# process pool: first every fit, then the bootstrap rounds of all files
+# -----------------------------------------------------------------------------
+def fitFiles(paths, xmin=None, xmax=None, xminMax=None, rounds=0, jobs=None, seed=0,
+             minTail=MIN_TAIL):
+    hists = [loadHistogram(p) for p in paths]
+    hists = [(np.asarray(h['size']), np.asarray(h['count'])) for h in hists]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        fits = [pool.submit(fitPowerLaw, s, c, xmin, xmax, xminMax, minTail) for s, c in hists]
+        fits = [f.result() for f in fits]
+        futures = []
+        for k, ((s, c), fit) in enumerate(zip(hists, fits)):
+            tasks = bootstrapTasks(s, c, fit, rounds, [seed, k], fixedXmin=xmin is not None,
+                                   xminMax=xminMax, minTail=minTail) if rounds else []
+            futures.append([pool.submit(func, *args, **kw) for func, args, kw in tasks])
+        for path, fit, tasks in zip(paths, fits, futures):
+            fit['file'] = path
+            fit['p'] = float(np.mean(np.concatenate([f.result() for f in tasks]) >= fit['ks'])) \
+                if tasks else None
+    return fits
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Discrete power-law fits of avalanche sizes')
+    parser.add_argument('files', nargs='+', help='avalanche tables, _size.csv files or avalanche stores')
+    parser.add_argument('--xmin', type=int, help='fixed xmin (default: smallest KS distance)')
+    parser.add_argument('--xmax', type=float, help='largest size fitted (e.g. 10000 without bursts)')
+    parser.add_argument('--xmin-max', type=float, help='largest xmin candidate')
+    parser.add_argument('--min-tail', type=int, default=MIN_TAIL, help='avalanches at or above xmin')
+    parser.add_argument('--bootstrap', type=int, default=0, help='goodness-of-fit rounds per file')
+    parser.add_argument('--jobs', type=int, help='worker processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='CSV file of the fits')
+    args = parser.parse_args()
+
+    fits = fitFiles(args.files, args.xmin, args.xmax, args.xmin_max, args.bootstrap, args.jobs,
+                    args.seed, args.min_tail)
+    for fit in fits:
+        print("%s: alpha = %.3f +- %.3f, xmin = %i, %i of %i avalanches, KS = %.4f%s" %
+              (fit['file'], fit['alpha'], fit['sigma'], fit['xmin'], fit['ntail'], fit['n'],
+               fit['ks'], "" if fit['p'] is None else ", p = %.3f" % fit['p']))
+    if args.out:
+        with open(args.out, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FIT_COLUMNS)
+            writer.writeheader()
+            for fit in fits:
+                writer.writerow({c: fit[c] for c in FIT_COLUMNS})
@@ -0,0 +1,109 @@
+"""
+@file     spatialIndex.py
+@date     10/18/2026
+
+@brief    Grid-hash spatial index for spatiotemporal clustering
+
+          Every neuron sits on an integer grid cell. The grid is padded by
+          ceil(RADIUS) cells on each side, so the cells within RADIUS of any
+          neuron are its own cell plus a fixed list of linear offsets (the
+          stencil) and no bounds checks are needed. The stencil is sorted by
+          distance, so the stencil of a smaller radius is a prefix of it.
+
+          Each cell remembers the time step of its last spike and the
+          avalanche that spike belongs to (its owner). A spike at time t
+          touches every earlier spike within TAU and RADIUS exactly when one
+          of its stencil cells has t - lastTs < TAU. Only the last spike of a
+          cell matters: an earlier spike at the same cell that is still within
+          TAU was itself reached by the later one, so it has the same owner.
+          A lookup is therefore a few array reads of the stencil cells instead
+          of a distance computation per candidate spike. cellsMany() and
+          ownersIn() do the lookup for all spikes of a time step at once, as
+          one gather of a (spikes x stencil) block of cells.
+
+          Neuron positions come from neuronLayout.py.
+"""
+import math
+import numpy as np
+
+NEVER = -(1 << 62)  # lastTs of a cell that has not spiked
+
+
+# -----------------------------------------------------------------------------
+# CLASS: SpatialIndex()
+# padded cell grid with a per-cell last spike time and owner
+# -----------------------------------------------------------------------------
+class SpatialIndex(object):
+    def __init__(self, xloc, yloc, radius, idBase=1, ownerDtype=object):
+        x = np.asarray(xloc, dtype=np.float64)
+        y = np.asarray(yloc, dtype=np.float64)
+        if np.any(x != np.round(x)) or np.any(y != np.round(y)):
+            raise ValueError("neuron locations must lie on an integer grid")
+        x = x.astype(np.int64)
+        y = y.astype(np.int64)
+
+        self.radius = radius
+        self.idBase = idBase
+        self.pad = int(math.ceil(radius))
+        self.width = int(x.max() - x.min()) + 1 + 2 * self.pad if len(x) else 1
+        height = int(y.max() - y.min()) + 1 + 2 * self.pad if len(y) else 1
+        self.cell = (y - y.min() + self.pad) * self.width + (x - x.min() + self.pad)
+        if len(np.unique(self.cell)) != len(self.cell):
+            raise ValueError("two neurons share a grid location")
+
+        # offsets within radius (d < radius, as in getDistance() < RADIUS), nearest first
+        r = np.arange(-self.pad, self.pad + 1)
+        dx, dy = np.meshgrid(r, r)
+        d2 = (dx * dx + dy * dy).ravel()
+        order = np.argsort(d2, kind='stable')
+        inside = d2[order] < radius * radius
+        self.stencilD2 = d2[order][inside]
+        self.stencil = (dy.ravel() * self.width + dx.ravel())[order][inside]
+
+        self.lastTs = np.full(self.width * height, NEVER, dtype=np.int64)
+        self.owner = np.zeros(self.width * height, dtype=ownerDtype)
+        if ownerDtype is object:
+            self.owner[:] = None
+
+    def stencilSize(self, radius):
+        """Number of leading stencil offsets within a (smaller) radius."""
+        return int(np.searchsorted(self.stencilD2, radius * radius, side='left'))
+
+    def cells(self, n, radius=None):
+        """Cells within radius of neuron n (the whole stencil by default)."""
+        stencil = self.stencil if radius is None else self.stencil[:self.stencilSize(radius)]
+        return self.cell[n - self.idBase] + stencil
+
+    def neighbors(self, n, t, tau, radius=None):
+        """Owners of the spikes within tau time steps and radius of neuron n at t."""
+        cells = self.cells(n, radius)
+        return self.owner[cells[(t - self.lastTs[cells]) < tau]]
+
+    def cellsMany(self, ns, radius=None):
+        """Cells within radius of each neuron of ns, one row per neuron."""
+        stencil = self.stencil if radius is None else self.stencil[:self.stencilSize(radius)]
+        return self.cell[np.asarray(ns) - self.idBase][:, None] + stencil
+
+    def ownersIn(self, cells, t, tau):
+        """(row, owner) of the spikes within tau time steps of t in a block of cells."""
+        rows, cols = np.nonzero((t - self.lastTs[cells]) < tau)
+        return rows, self.owner[cells[rows, cols]]
+
+    def updateMany(self, ns, t, owners):
+        """Record spikes of the neurons ns at time step t belonging to owners."""
+        c = self.cell[np.asarray(ns) - self.idBase]
+        self.lastTs[c] = t
+        self.owner[c] = owners
+
+    def update(self, n, t, owner):
+        """Record a spike of neuron n at time step t belonging to owner."""
+        c = self.cell[n - self.idBase]
+        self.lastTs[c] = t
+        self.owner[c] = owner
+
+    def relabel(self, old, new, t, tau):
+        """Hand the cells of owner old that are still within tau of t to new."""
+        live = np.flatnonzero((t - self.lastTs) < tau)
+        mine = live[self.owner[live] == old]
+        self.owner[mine] = new
+        return mine
@@ -0,0 +1,204 @@
+"""
+@file     spikeStore.py
+@date     10/18/2026
+
+@brief    Columnar, memory-mapped spike store replacing <allSpikeTime.csv>
+
+          A spike store is a directory holding
+            ts.bin      - uint32 time step of every spike, in time order
+            neuron.bin  - uint16 neuron number of every spike (1-based)
+            index.bin   - int64 row of the first spike in each time block,
+                          plus a final entry equal to the number of spikes
+            meta.json   - spike count, number of blocks and block width
+
+          Block b covers time steps [b * blockWidth, (b+1) * blockWidth), so
+          the rows of any window [t0, t1) are found with two index lookups
+          and a binary search inside the end blocks. SpikeStore.window()
+          returns slices of the memory maps, so nothing is copied or parsed
+          until the caller touches the data.
+
+Usage:
+    python3 spikeStore.py <allSpikeTime.csv | h5file> <store directory>
+"""
+import json
+import os
+import sys
+import numpy as np
+
+BLOCK_WIDTH = 10000     # time steps per index block (1 s)
+BUFFER_SIZE = 1 << 20   # spikes buffered by the writer before each write
+
+
+# -----------------------------------------------------------------------------
+# CLASS: SpikeStoreWriter()
+# appends time steps in increasing order and builds the block index on the fly
+# -----------------------------------------------------------------------------
+class SpikeStoreWriter(object):
+    def __init__(self, path, blockWidth=BLOCK_WIDTH):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.blockWidth = blockWidth
+        self.tsFile = open(os.path.join(path, 'ts.bin'), 'wb')
+        self.neuronFile = open(os.path.join(path, 'neuron.bin'), 'wb')
+        self.index = []         # row of the first spike in each block
+        self.count = 0          # spikes written so far
+        self.lastTs = -1
+        self.ts = []
+        self.neuron = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, current_ts, ids):
+        """Add every spike of one time step (time steps must increase)."""
+        current_ts = int(current_ts)
+        if current_ts <= self.lastTs:
+            raise ValueError("time steps must be written in increasing order")
+        ids = np.asarray(ids)
+        if len(ids) > 0 and (ids.min() < 0 or ids.max() > np.iinfo(np.uint16).max):
+            raise ValueError("neuron numbers must fit in uint16")
+
+        # every block up to this one starts at the current row
+        block = current_ts // self.blockWidth
+        while len(self.index) <= block:
+            self.index.append(self.count + len(self.ts))
+        self.ts.extend([current_ts] * len(ids))
+        self.neuron.extend(ids.tolist())
+        self.lastTs = current_ts
+        if len(self.ts) >= BUFFER_SIZE:
+            self.flush()
+
+    def appendArrays(self, ts, neuron):
+        """Add spikes given as (time step, neuron) arrays in time order, whole time
+        steps only, starting after the last time step written."""
+        ts = np.asarray(ts, dtype=np.int64)
+        neuron = np.asarray(neuron)
+        if len(ts) == 0:
+            return
+        if ts[0] <= self.lastTs or np.any(np.diff(ts) < 0):
+            raise ValueError("time steps must be written in increasing order")
+        if neuron.min() < 0 or neuron.max() > np.iinfo(np.uint16).max:
+            raise ValueError("neuron numbers must fit in uint16")
+        self.flush()
+        # every block up to the last one starts at its first spike at or after it
+        blocks = ts // self.blockWidth
+        newBlocks = np.arange(len(self.index), blocks[-1] + 1)
+        self.index.extend((self.count + np.searchsorted(blocks, newBlocks, side='left')).tolist())
+        ts.astype(np.uint32).tofile(self.tsFile)
+        neuron.astype(np.uint16).tofile(self.neuronFile)
+        self.count = self.count + len(ts)
+        self.lastTs = int(ts[-1])
+
+    def flush(self):
+        np.asarray(self.ts, dtype=np.uint32).tofile(self.tsFile)
+        np.asarray(self.neuron, dtype=np.uint16).tofile(self.neuronFile)
+        self.count = self.count + len(self.ts)
+        self.ts = []
+        self.neuron = []
+
+    def close(self):
+        if self.tsFile.closed:
+            return
+        self.flush()
+        self.tsFile.close()
+        self.neuronFile.close()
+        index = np.asarray(self.index + [self.count], dtype=np.int64)
+        index.tofile(os.path.join(self.path, 'index.bin'))
+        meta = {'count': self.count, 'blocks': len(self.index),
+                'blockWidth': self.blockWidth}
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+
+# -----------------------------------------------------------------------------
+# CLASS: SpikeStore()
+# read-only, memory-mapped view of a spike store directory
+# -----------------------------------------------------------------------------
+class SpikeStore(object):
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.path = path
+        self.count = meta['count']
+        self.blockWidth = meta['blockWidth']
+        self.ts = self.__map('ts.bin', np.uint32, self.count)
+        self.neuron = self.__map('neuron.bin', np.uint16, self.count)
+        self.index = np.fromfile(os.path.join(path, 'index.bin'), dtype=np.int64)
+
+    def __map(self, name, dtype, count):
+        # np.memmap refuses empty files
+        if count == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.path, name), dtype=dtype, mode='r', shape=(count,))
+
+    def __len__(self):
+        return self.count
+
+    def __row(self, t):
+        # first row with ts >= t
+        block = t // self.blockWidth
+        if t <= 0:
+            return 0
+        if block >= len(self.index) - 1:
+            return self.count
+        lo = self.index[block]
+        hi = self.index[block + 1]
+        return int(lo + np.searchsorted(self.ts[lo:hi], t, side='left'))
+
+    def rows(self, t0, t1):
+        """Return the row range [lo, hi) of the spikes with t0 <= ts < t1."""
+        lo = self.__row(int(t0))
+        hi = self.__row(int(t1))
+        return lo, max(lo, hi)
+
+    def window(self, t0, t1):
+        """Return zero-copy (ts, neuron) views of the spikes with t0 <= ts < t1."""
+        lo, hi = self.rows(t0, t1)
+        return self.ts[lo:hi], self.neuron[lo:hi]
+
+    def timesteps(self, start=0, stop=None, chunkSize=BUFFER_SIZE):
+        """Yield (timestep, neuron_ids) like the rows of <allSpikeTime.csv>."""
+        stop = self.count if stop is None else stop
+        lo = start
+        while lo < stop:
+            hi = min(lo + chunkSize, stop)
+            # do not split a time step across chunks
+            if hi < stop:
+                hi = lo + int(np.searchsorted(self.ts[lo:stop], self.ts[hi - 1], side='right'))
+            ts = np.asarray(self.ts[lo:hi])
+            bounds = np.flatnonzero(np.diff(ts)) + 1
+            starts = np.concatenate(([0], bounds))
+            ends = np.concatenate((bounds, [len(ts)]))
+            for s, e in zip(starts, ends):
+                yield ts[s], self.neuron[lo + s:lo + e]
+            lo = hi
+
+
+# -----------------------------------------------------------------------------
+# writeFromCsv() convert an <allSpikeTime.csv> file into a spike store
+# -----------------------------------------------------------------------------
+def writeFromCsv(infile, path, blockWidth=BLOCK_WIDTH):
+    with SpikeStoreWriter(path, blockWidth) as writer, open(infile) as f:
+        for line in f:
+            fields = line.strip().split(',')
+            writer.append(int(fields[0]), [int(n) for n in fields[1:] if n.strip()])
+
+
+# -----------------------------------------------------------------------------
+# writeFromH5() convert Graphitti HDF5 output into a spike store
+# -----------------------------------------------------------------------------
+def writeFromH5(h5file, path, blockWidth=BLOCK_WIDTH):
+    from spikeStream import spikeStream
+    with SpikeStoreWriter(path, blockWidth) as writer:
+        for current_ts, ids in spikeStream(h5file):
+            writer.append(current_ts, ids)
+
+
+if __name__ == '__main__':
+    if sys.argv[1].endswith('.h5'):
+        writeFromH5(sys.argv[1], sys.argv[2])
+    else:
+        writeFromCsv(sys.argv[1], sys.argv[2])
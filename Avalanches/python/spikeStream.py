@@ -0,0 +1,153 @@
+"""
+@file     spikeStream.py
+@date     10/18/2026
+
+@brief    Time-ordered spike stream read straight from Graphitti HDF5 output
+
+          The per-neuron spike trains (either the Neuron_* datasets or the
+          ragged spike_times/offsets layout written by getSpikesProbedNeurons.py)
+          are merged with a heap-based k-way merge. Each neuron is read in
+          chunks of at most CHUNK_SIZE spikes, so memory is bounded by
+          numNeurons * CHUNK_SIZE no matter how long the simulation ran.
+
+          spikeStream() yields one (timestep, neuron_ids) pair per time step
+          that has activity, which is the same information as one row of
+          <allSpikeTime.csv>. Neuron numbers are 1-based like the CSV (set
+          idBase=0 for the HDF5 indices).
+
+Usage:
+    python3 spikeStream.py <h5file> <allSpikeTime.csv>
+"""
+import heapq
+import sys
+import h5py
+import numpy as np
+
+CHUNK_SIZE = 4096       # spikes buffered per neuron
+
+
+# -----------------------------------------------------------------------------
+# CLASS: NeuronCursor()
+# reads one neuron's spike times from an HDF5 dataset chunk by chunk
+# -----------------------------------------------------------------------------
+class NeuronCursor(object):
+    def __init__(self, dataset, start, end, chunkSize, segments=()):
+        self.dataset = dataset
+        self.pos = start        # next unread position in the dataset
+        self.end = end
+        self.segments = list(segments)  # later (start, end) ranges, in time order
+        self.chunkSize = chunkSize
+        self.buffer = None
+        self.i = 0
+
+    def next(self):
+        """Return the next spike time, or None when the neuron has no more spikes."""
+        if self.buffer is None or self.i == len(self.buffer):
+            while self.pos >= self.end and self.segments:
+                self.pos, self.end = self.segments.pop(0)
+            if self.pos >= self.end:
+                return None
+            stop = min(self.pos + self.chunkSize, self.end)
+            self.buffer = self.dataset[self.pos:stop].tolist()
+            self.pos = stop
+            self.i = 0
+        t = self.buffer[self.i]
+        self.i = self.i + 1
+        return t
+
+    def seek(self, t):
+        """Skip to the first spike at or after time step t (before the first next())."""
+        # whole segments that end before t, then a binary search in the dataset
+        while self.pos < self.end or self.segments:
+            if self.pos >= self.end:
+                self.pos, self.end = self.segments.pop(0)
+            elif self.dataset[self.end - 1] < t:
+                self.pos = self.end
+            else:
+                break
+        lo, hi = self.pos, self.end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.dataset[mid] < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        self.pos = lo
+
+
+def neuronCursors(f, chunkSize=CHUNK_SIZE):
+    """Return {neuron index: NeuronCursor} for every neuron that spiked."""
+    cursors = {}
+    if "spike_times" in f and "offsets" in f:
+        # incremental runs append segments, one row of offsets each
+        sT = f["spike_times"]
+        offsets = np.atleast_2d(f["offsets"][()])
+        for n in range(offsets.shape[1] - 1):
+            ranges = [(int(o[n]), int(o[n + 1])) for o in offsets if o[n + 1] > o[n]]
+            if ranges:
+                cursors[n] = NeuronCursor(sT, ranges[0][0], ranges[0][1], chunkSize, ranges[1:])
+    else:
+        for key in f.keys():
+            if key.startswith("Neuron_") and len(f[key]) > 0:
+                cursors[int(key[len("Neuron_"):])] = NeuronCursor(f[key], 0, len(f[key]), chunkSize)
+    return cursors
+
+
+def mergeCursors(cursors, idBase=1):
+    """k-way merge of neuron cursors into (timestep, neuron_ids) batches."""
+    heap = []
+    for n, cursor in cursors.items():
+        t = cursor.next()
+        if t is not None:
+            heap.append((t, n))
+    heapq.heapify(heap)
+
+    ids = []
+    while heap:
+        current_ts = heap[0][0]
+        # pop every neuron that fires at current_ts (they come out in id order)
+        while heap and heap[0][0] == current_ts:
+            n = heap[0][1]
+            ids.append(n + idBase)
+            t = cursors[n].next()
+            if t is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (t, n))
+        yield current_ts, np.array(ids, dtype=np.uint32)
+        ids = []
+
+
+def spikeStream(h5file, chunkSize=CHUNK_SIZE, idBase=1, start=0):
+    """
+    Yield (timestep, neuron_ids) for every time step with spikes, in time order.
+
+    Args:
+        h5file (str): Graphitti HDF5 output file
+        chunkSize (int): spikes read per neuron at a time
+        idBase (int): number of the first neuron (1 matches allSpikeTime.csv)
+        start (int): first time step to yield; each neuron's spike train is
+            binary searched for it, so resuming does not replay the stream
+    """
+    with h5py.File(h5file, 'r') as f:
+        cursors = neuronCursors(f, chunkSize)
+        if start > 0:
+            for cursor in cursors.values():
+                cursor.seek(start)
+        for batch in mergeCursors(cursors, idBase):
+            yield batch
+
+
+# -----------------------------------------------------------------------------
+# writeSpikeTimeCsv() write the stream in the <allSpikeTime.csv> format
+# -----------------------------------------------------------------------------
+def writeSpikeTimeCsv(h5file, outfile):
+    with open(outfile, 'w') as f:
+        for current_ts, ids in spikeStream(h5file):
+            f.write("%i," % current_ts)
+            f.write(",".join(map(str, ids.tolist())))
+            f.write("\n")
+
+
+if __name__ == '__main__':
+    writeSpikeTimeCsv(sys.argv[1], sys.argv[2])
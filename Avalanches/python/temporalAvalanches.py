@@ -0,0 +1,249 @@
+"""
+@file     temporalAvalanches.py
+@date     10/18/2026
+
+@brief    Temporal-only avalanche and burst detection (getAvalanches.m in NumPy)
+
+          The spikes are reduced to one row per active time step (time step,
+          spike count), the rows of <allSpikeTimeCount.csv>. An avalanche is
+          a run of rows whose inter-spike intervals (ISI) are all below
+          meanISI, holding more than one spike (so a single time step with
+          several spikes counts, a lone spike does not). meanISI defaults to
+          the total number of time steps divided by the number of spikes.
+
+          Everything is a handful of array passes: np.diff for the ISIs,
+          np.flatnonzero for the boundaries and np.add.reduceat for the spike
+          totals, so no Python code runs per spike or per avalanche. CSV
+          input is parsed the same way, BLOCK_SIZE bytes of whole lines at a
+          time (see blockCounts()).
+
+          Output tables (same columns as getAvalanches.m):
+            <allAvalanche.csv>  ID,StartRow,EndRow,StartT,EndT,Width,TotalSpikes
+            <allAvalBurst.csv>  ID,StartRow,EndRow,StartT,EndT,Width,TotalSpikes,IBI
+          Rows are numbered from 1 like the MATLAB version. A burst is an
+          avalanche of more than BURST_SIZE spikes; its IBI is the time from
+          the end of the previous burst (from the first spike for the first).
+
+Usage:
+    python3 temporalAvalanches.py <spike store | h5file | allSpikeTime.csv> [outdir]
+                                  [--counts] [--mean-isi X] [--timesteps N]
+"""
+import argparse
+import itertools
+import os
+import numpy as np
+from spikeStore import SpikeStore
+from spikeStream import spikeStream
+
+BURST_SIZE = 1e4            # avalanches with more spikes are bursts
+CHUNK_SIZE = 1 << 24        # spike times reduced at a time
+BLOCK_SIZE = 1 << 24        # bytes of a CSV file parsed at a time
+AVAL_COLUMNS = ['ID', 'StartRow', 'EndRow', 'StartT', 'EndT', 'Width', 'TotalSpikes']
+
+
+# -----------------------------------------------------------------------------
+# timeCounts()
+# (time steps, spike counts) of a sorted array with one time per spike; works
+# chunk by chunk, so spikeTimes can be a memory map larger than memory
+# -----------------------------------------------------------------------------
+def timeCounts(spikeTimes, chunkSize=CHUNK_SIZE):
+    times = []
+    counts = []
+    for start in range(0, len(spikeTimes), chunkSize):
+        chunk = np.asarray(spikeTimes[start:start + chunkSize], dtype=np.int64)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(chunk)) + 1))
+        times.append(chunk[starts])
+        counts.append(np.diff(np.append(starts, len(chunk))))
+    if not times:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    times = np.concatenate(times)
+    counts = np.concatenate(counts)
+    # a time step cut by a chunk boundary shows up twice
+    keep = np.concatenate(([True], np.diff(times) != 0))
+    if not keep.all():
+        counts = np.add.reduceat(counts, np.flatnonzero(keep))
+        times = times[keep]
+    return times, counts
+
+
+# -----------------------------------------------------------------------------
+# historyCounts()
+# rows of a binned spikesHistory series (bins with spikes), times in time steps
+# -----------------------------------------------------------------------------
+def historyCounts(spikesHistory, binWidth=1):
+    spikesHistory = np.asarray(spikesHistory)
+    bins = np.flatnonzero(spikesHistory)
+    return bins * binWidth, spikesHistory[bins].astype(np.int64)
+
+
+def getMeanISI(totalTimesteps, totalCount):
+    return totalTimesteps / totalCount
+
+
+# -----------------------------------------------------------------------------
+# findAvalanches()
+# avalanche table of (times, counts) rows as a dict of column arrays
+# -----------------------------------------------------------------------------
+def findAvalanches(times, counts, meanISI):
+    times = np.asarray(times, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    if len(times) == 0:
+        return {c: np.empty(0, dtype=np.int64) for c in AVAL_COLUMNS}
+
+    # a run starts at the first row and after every ISI >= meanISI
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(times) >= meanISI) + 1))
+    ends = np.append(starts[1:], len(times)) - 1
+    total = np.add.reduceat(counts, starts)
+
+    aval = total > 1
+    starts = starts[aval]
+    ends = ends[aval]
+    return {'ID': np.arange(1, len(starts) + 1),
+            'StartRow': starts + 1,
+            'EndRow': ends + 1,
+            'StartT': times[starts],
+            'EndT': times[ends],
+            'Width': times[ends] - times[starts] + 1,
+            'TotalSpikes': total[aval]}
+
+
+# -----------------------------------------------------------------------------
+# findBursts()
+# avalanches of more than burstSize spikes, with the inter-burst interval
+# -----------------------------------------------------------------------------
+def findBursts(avals, firstT, burstSize=BURST_SIZE):
+    burst = avals['TotalSpikes'] > burstSize
+    bursts = {c: avals[c][burst] for c in AVAL_COLUMNS}
+    bursts['ID'] = np.arange(1, len(bursts['ID']) + 1)
+    # getAvalanches.m measures from the first spike, then from the last burst's end
+    previousEnd = np.concatenate(([firstT], bursts['EndT'][:-1]))
+    bursts['IBI'] = bursts['StartT'] - previousEnd
+    return bursts
+
+
+def temporalAvalanches(times, counts, meanISI=None, totalTimesteps=None, burstSize=BURST_SIZE):
+    """
+    Avalanche and burst tables of the (time step, spike count) rows.
+
+    Args:
+        times, counts: active time steps (sorted) and their spike counts
+        meanISI (float): ISI threshold, by default totalTimesteps / total spikes
+        totalTimesteps (int): simulation length, by default the last time step + 1
+        burstSize (float): avalanches with more spikes are bursts
+    """
+    times = np.asarray(times, dtype=np.int64)
+    counts = np.asarray(counts, dtype=np.int64)
+    if meanISI is None:
+        if totalTimesteps is None:
+            totalTimesteps = int(times[-1]) + 1 if len(times) else 0
+        meanISI = getMeanISI(totalTimesteps, max(1, int(counts.sum())))
+    avals = findAvalanches(times, counts, meanISI)
+    bursts = findBursts(avals, int(times[0]) if len(times) else 0, burstSize)
+    return avals, bursts, meanISI
+
+
+def writeTable(table, columns, outfile):
+    data = np.column_stack([table[c] for c in columns]) if len(table[columns[0]]) else \
+        np.empty((0, len(columns)), dtype=np.int64)
+    np.savetxt(outfile, data, fmt='%d', delimiter=',', header=','.join(columns), comments='')
+
+
+# -----------------------------------------------------------------------------
+# parseInts()
+# integers in the byte ranges [lo, hi) of buf, one digit column at a time
+# (other bytes, such as spaces or '\r', are skipped)
+# -----------------------------------------------------------------------------
+def parseInts(buf, lo, hi):
+    values = np.zeros(len(lo), dtype=np.int64)
+    width = int((hi - lo).max()) if len(lo) else 0
+    for k in range(width):
+        pos = np.minimum(lo + k, len(buf) - 1)
+        digit = buf[pos].astype(np.int64) - ord('0')
+        isDigit = (lo + k < hi) & (digit >= 0) & (digit <= 9)
+        values = np.where(isDigit, values * 10 + digit, values)
+    return values
+
+
+# -----------------------------------------------------------------------------
+# blockCounts()
+# (times, counts) of the whole lines in a block of CSV bytes: the first field
+# is the time step, then the count (countsCsv) or the neuron ids, of which
+# the non-empty fields are counted (a trailing comma leaves an empty one)
+# -----------------------------------------------------------------------------
+def blockCounts(block, countsCsv=False):
+    buf = np.frombuffer(block, dtype=np.uint8)
+    ends = np.flatnonzero(buf == ord('\n'))
+    starts = np.concatenate(([0], ends + 1))[:len(ends)]
+    # every line's first and second comma, or its end
+    commas = np.append(np.flatnonzero(buf == ord(',')), [len(buf), len(buf)])
+    k = np.searchsorted(commas, starts)
+    first = np.minimum(commas[k], ends)
+    times = parseInts(buf, starts, first)
+    if countsCsv:
+        counts = parseInts(buf, first + 1, np.minimum(commas[k + 1], ends))
+    else:
+        after = np.append(buf[1:], ord('\n'))
+        field = (buf == ord(',')) & (after != ord(',')) & (after != ord('\n')) & (after != ord('\r'))
+        total = np.concatenate(([0], np.cumsum(field)))
+        counts = total[ends] - total[starts]
+    # skip blank lines
+    text = np.isin(buf, np.frombuffer(b'0123456789', dtype=np.uint8))
+    digits = np.concatenate(([0], np.cumsum(text)))
+    keep = digits[first] > digits[starts]
+    return times[keep], counts[keep]
+
+
+# -----------------------------------------------------------------------------
+# readCounts()
+# (times, counts) rows of a spike store, an .h5 file or a CSV file
+# -----------------------------------------------------------------------------
+def readCounts(infile, countsCsv=False, blockSize=BLOCK_SIZE):
+    if os.path.isdir(infile):
+        return timeCounts(SpikeStore(infile).ts)
+    if infile.endswith('.h5'):
+        rows = itertools.chain.from_iterable((current_ts, len(ids)) for current_ts, ids in spikeStream(infile))
+        rows = np.fromiter(rows, dtype=np.int64).reshape(-1, 2)
+        return rows[:, 0].copy(), rows[:, 1].copy()
+    # <allSpikeTimeCount.csv> has the count, <allSpikeTime.csv> the ids;
+    # parsed blockSize bytes (whole lines) at a time
+    times = []
+    counts = []
+    rest = b''
+    with open(infile, 'rb') as f:
+        for block in iter(lambda: f.read(blockSize), b''):
+            block = rest + block
+            cut = block.rfind(b'\n') + 1
+            rest = block[cut:]
+            t, c = blockCounts(block[:cut], countsCsv)
+            times.append(t)
+            counts.append(c)
+    if rest:
+        t, c = blockCounts(rest + b'\n', countsCsv)
+        times.append(t)
+        counts.append(c)
+    if not times:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(times), np.concatenate(counts)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Temporal avalanches and bursts of a spike train')
+    parser.add_argument('infile', help='spike store directory, Graphitti .h5 file or CSV file')
+    parser.add_argument('outdir', nargs='?', help='where the tables go (default: next to the input)')
+    parser.add_argument('--counts', action='store_true',
+                        help='the CSV file holds time,count rows (allSpikeTimeCount.csv)')
+    parser.add_argument('--mean-isi', type=float, help='ISI threshold (default: timesteps / spikes)')
+    parser.add_argument('--timesteps', type=int, help='simulation length in time steps')
+    args = parser.parse_args()
+
+    infile = args.infile.rstrip(os.sep)
+    outdir = args.outdir or os.path.dirname(os.path.abspath(infile))
+    times, counts = readCounts(infile, args.counts)
+    avals, bursts, meanISI = temporalAvalanches(times, counts, args.mean_isi, args.timesteps)
+
+    print('Total spikes: %d' % counts.sum())
+    print('meanISI: %.4f' % meanISI)
+    print('Total number of avalanches: %d' % len(avals['ID']))
+    print('Total number of bursts: %d' % len(bursts['ID']))
+    writeTable(avals, AVAL_COLUMNS, os.path.join(outdir, 'allAvalanche.csv'))
+    writeTable(bursts, AVAL_COLUMNS + ['IBI'], os.path.join(outdir, 'allAvalBurst.csv'))
@@ -1,10 +1,23 @@
 '''
-GETNEURONTYPES 
+GETNEURONTYPES
 
 Parse the graphml file to get a mapping of neurons and their types, where
 1 means the neuron is of that type. Each entry is formatted as
 [endogenously active, excitatory, inhibitory]
 
+The file is read with iterparse and every node/edge element is cleared as
+soon as it has been handled, so memory does not grow with the size of the
+XML tree. Node attributes are looked up through the GraphML <key>
+declarations (attr.name "x", "y", "active" and "type") instead of by their
+position, and the number of neurons is taken from the file. Edges are
+collected into a CSR adjacency (indptr, indices, weights; row = source
+neuron), the same layout as scipy.sparse.csr_matrix. Node ids are used as
+row numbers when they are all integers (Graphitti numbers its nodes
+0..n-1); if any id is not, every node is numbered in file order instead.
+load_graph() caches the parsed arrays in <file_name>.npz (or in cache_dir),
+so the XML is only parsed again when it changes; a cache that cannot be
+written is skipped.
+
 Input:
 file_name - graphml file to parse
 
@@ -12,32 +25,158 @@ Output:
 neuron_types.csv - mapping of neurons and their types
 
 Author: Vanessa Arndorfer (vanessa.arndorfer@gmail.com)
-Last updated: 06/04/2025
+Last updated: 10/18/2026
 '''
 
+import array
+import os
+import sys
 import numpy as np
 import pandas as pd
-import xml.etree.ElementTree as ET 
+import xml.etree.ElementTree as ET
+
+
+GRAPHML_NS = '{http://graphml.graphdrawing.org/xmlns}'
+CACHE_VERSION = 2
+
+
+def _tag(elem):
+    # element name without the GraphML namespace
+    return elem.tag[len(GRAPHML_NS):] if elem.tag.startswith(GRAPHML_NS) else elem.tag
+
+
+def _node_index(node_id, ids):
+    # ids are numbered in file order here, see _node_rows()
+    return ids.setdefault(node_id, len(ids))
+
+
+def _node_rows(ids):
+    # row of each id in file order: the id itself when every id is an
+    # integer (Graphitti numbers its nodes 0..n-1), else the file order, so
+    # numeric and other ids never share a row
+    try:
+        return np.array([int(node_id) for node_id in ids], dtype=np.int64)
+    except ValueError:
+        return np.arange(len(ids), dtype=np.int64)
+
+
+def parse_graph(file_name):
+    keys = {}           # key id -> (for, attr.name, default text)
+    ids = {}
+    node_index = array.array('q')
+    x = array.array('d')
+    y = array.array('d')
+    active = array.array('b')
+    exc = array.array('b')
+    inh = array.array('b')
+    sources = array.array('q')
+    targets = array.array('q')
+    weights = array.array('d')
+
+    graph = None
+    for event, elem in ET.iterparse(file_name, events=('start', 'end')):
+        tag = _tag(elem)
+        if event == 'start':
+            if tag == 'graph':
+                graph = elem
+            continue
+
+        if tag == 'key':
+            default = elem.find(GRAPHML_NS + 'default')
+            keys[elem.attrib['id']] = (elem.attrib.get('for', 'all'),
+                                       elem.attrib.get('attr.name', elem.attrib['id']),
+                                       default.text if default is not None else None)
+        elif tag in ('node', 'edge'):
+            values = {name: default for domain, name, default in keys.values()
+                      if domain in (tag, 'all')}
+            for data in elem:
+                if _tag(data) == 'data':
+                    name = keys.get(data.attrib['key'], (tag, data.attrib['key'], None))[1]
+                    values[name] = data.text
+
+            if tag == 'node':
+                node_index.append(_node_index(elem.attrib['id'], ids))
+                x.append(float(values.get('x') or 0))
+                y.append(float(values.get('y') or 0))
+                active.append(int(float(values.get('active') or 0)) == 1)
+                neuron_type = (values.get('type') or '').strip()
+                exc.append(neuron_type == 'EXC')
+                inh.append(neuron_type == 'INH')
+            else:
+                sources.append(_node_index(elem.attrib['source'], ids))
+                targets.append(_node_index(elem.attrib['target'], ids))
+                weights.append(float(values.get('weight') or 1))
+
+            # drop the handled element and its place in the parent
+            elem.clear()
+            if graph is not None:
+                graph.clear()
+
+    rows = _node_rows(ids)
+    n = int(rows.max()) + 1 if len(rows) else 0
+    order = rows[np.frombuffer(node_index, dtype=np.int64)]
+    neuron_types = np.zeros((n, 3), dtype=np.int32)
+    neuron_types[order, 0] = np.frombuffer(active, dtype=np.int8)
+    neuron_types[order, 1] = np.frombuffer(exc, dtype=np.int8)
+    neuron_types[order, 2] = np.frombuffer(inh, dtype=np.int8)
+    locations = np.zeros((n, 2))
+    locations[order, 0] = np.frombuffer(x)
+    locations[order, 1] = np.frombuffer(y)
+
+    # CSR adjacency, row = source neuron
+    src = rows[np.frombuffer(sources, dtype=np.int64)]
+    perm = np.argsort(src, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(np.bincount(src, minlength=n))
+    indices = rows[np.frombuffer(targets, dtype=np.int64)][perm].astype(np.int32)
+    data = np.frombuffer(weights)[perm]
+
+    return {'neuron_types': neuron_types, 'locations': locations,
+            'indptr': indptr, 'indices': indices, 'weights': data}
+
+
+def load_graph(file_name, cache=True, cache_dir=None):
+    # parse the graphml file, reusing <file_name>.npz (or the .npz of that name
+    # in cache_dir) while the file is unchanged
+    cache_file = file_name + '.npz'
+    if cache_dir is not None:
+        cache_file = os.path.join(cache_dir, os.path.basename(cache_file))
+    st = os.stat(file_name)
+    stamp = np.array([CACHE_VERSION, st.st_size, st.st_mtime_ns], dtype=np.int64)
+    if cache and os.path.exists(cache_file):
+        with np.load(cache_file) as cached:
+            if np.array_equal(cached['stamp'], stamp):
+                return {k: cached[k] for k in cached.files if k != 'stamp'}
 
+    graph = parse_graph(file_name)
+    if cache:
+        # graph directories are often read-only or shared
+        try:
+            np.savez(cache_file, stamp=stamp, **graph)
+        except OSError as e:
+            print("not caching %s: %s" % (file_name, e), file=sys.stderr)
+    return graph
 
-def get_neuron_types(file_name):  
-    tree = ET.parse(graph_file)
-    root = tree.getroot()
 
-    neuron_types = np.zeros((10000,3), dtype=np.int32)
-    graph = root.find('./{http://graphml.graphdrawing.org/xmlns}graph')
+def adjacency_matrix(graph):
+    # scipy.sparse view of the adjacency (scipy is only needed for this)
+    from scipy.sparse import csr_matrix
+    n = len(graph['indptr']) - 1
+    return csr_matrix((graph['weights'], graph['indices'], graph['indptr']), shape=(n, n))
 
-    for node in graph:
-        i = int(node.attrib["id"])
-        active = int(node[2].text) == 1
-        exc = node[3].text == 'EXC'
-        inh = node[3].text == 'INH'
-        neuron_types[i] = [int(active), int(exc), int(inh)]
 
-    df = pd.DataFrame(data=neuron_types, columns=["active", "exc", "inh"])
-    df.to_csv('/DATA/arndorvf/Graphitti/build/Output/Results/fE_0.90_10000_neuron_types.csv')
+def get_neuron_types(file_name, out_file):
+    graph = load_graph(file_name)
+    df = pd.DataFrame(data=graph['neuron_types'], columns=["active", "exc", "inh"])
+    df.to_csv(out_file)
 
 
-if __name__ == "__main__": 
-    graph_file = "/DATA/arndorvf/Graphitti/configfiles/graphs/fE_0.90_10000.graphml"
-    get_neuron_types(graph_file)
\ No newline at end of file
+if __name__ == "__main__":
+    # example execution: python ./getNeuronTypes.py fE_0.90_10000.graphml fE_0.90_10000_neuron_types.csv
+    if len(sys.argv) > 1:
+        graph_file = sys.argv[1]
+        out_file = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(graph_file)[0] + '_neuron_types.csv'
+    else:
+        graph_file = "/DATA/arndorvf/Graphitti/configfiles/graphs/fE_0.90_10000.graphml"
+        out_file = '/DATA/arndorvf/Graphitti/build/Output/Results/fE_0.90_10000_neuron_types.csv'
+    get_neuron_types(graph_file, out_file)
@@ -1,71 +1,152 @@
 '''
-GETSPIKESHISTORY Generate a single array with the binned spike counts
-
-This function reads the Graphitti simulation h5 output.
+GETSPIKESHISTORY Generate arrays with the binned spike counts
+
+This function reads the Graphitti simulation h5 output. Every Neuron_*
+dataset is read once and its spike times are added straight into a
+preallocated integer histogram for each requested bin width, so several
+resolutions (e.g. 1 ms, 10 ms and 100 ms) come out of a single pass over
+the data. With --workers the neurons are read by a process pool (see
+spikeExtraction.py) and the partial histograms are summed. The number of
+bins is taken from the simulationEndTime dataset when the file has one,
+and otherwise from the latest spike time, so the epoch count and epoch
+duration no longer have to be set by hand.
+
+Existing spikesHistory datasets are replaced. With --incremental, the
+spikesHistoryProcessed dataset records how many spikes of each neuron have
+been binned, and its paramsHash attribute the bin widths used. A rerun then
+reads only the spikes appended since (e.g. after the simulation was
+extended by more epochs) and adds them to the resized histograms in place.
 
 Input:
-datasetName - Graphitti dataset the entire path can be used; for example
-              '/CSSDIV/research/biocomputing/data/2025/tR_1.0--fE_0.90_10000'
+datasetName  - Graphitti dataset the entire path can be used; for example
+               '/CSSDIV/research/biocomputing/data/2025/tR_1.0--fE_0.90_10000'
+--bin-widths - bin widths in time steps (0.1 ms), default 100 (10 ms)
+--workers    - number of processes reading neuron datasets, default 1
+--incremental - only process spikes added since the previous run
 
 Output:
-  - The spikesHistory dataset is added to the input h5 file
+  - The spikesHistory dataset (10 ms bins) is added to the input h5 file
+  - Other bin widths are added as spikesHistory_<width>, e.g.
+    spikesHistory_10 for 1 ms bins. Every dataset has a binWidth attribute.
+  - spikesHistoryProcessed, the per-neuron high-water mark
 
 Author: Vanessa Arndorfer (vanessa.arndorfer@gmail.com)
-Last updated: 05/03/2025
+Last updated: 10/18/2026
 '''
 
+import argparse
 import h5py
 import numpy as np
-import sys
 import time
-
-
-def getSpikesHistory(h5dir): 
-    # Set configuration parameters from the simulation
-    numEpochs = 1
-    epochDuration = 100 # seconds
-    nNeurons = 10000
-
-    # prepare the output
-    nBins = numEpochs * epochDuration * 100 # 10ms timestep bins
-    arr = np.zeros(nBins)
-    raw_spikes = np.array([])
-        
-    # concatenate all neuron spike times into one array
+from spikeExtraction import SpikeHistogram, StageTimer, extractNeurons, getNumNeurons, getParamsHash
+
+
+DELTA_T = 0.0001            # simulation time step (seconds)
+DEFAULT_BIN_WIDTH = 100     # 10ms bins, the width the MATLAB scripts expect
+PROCESSED = "spikesHistoryProcessed"
+
+
+def getDatasetName(binWidth):
+    if binWidth == DEFAULT_BIN_WIDTH:
+        return "spikesHistory"
+    return "spikesHistory_" + str(binWidth)
+
+
+def getNumTimesteps(f):
+    # total simulated time steps, or 0 if the file does not record it
+    if "simulationEndTime" in f:
+        return int(round(float(np.ravel(f["simulationEndTime"][()])[0]) / DELTA_T))
+    return 0
+
+
+def loadMarks(f, paramsHash, totalNeurons):
+    # processed spike count per neuron, or None if everything has to be redone
+    if PROCESSED not in f or f[PROCESSED].attrs.get("paramsHash") != paramsHash:
+        return None
+    marks = f[PROCESSED][()]
+    if len(marks) != totalNeurons:
+        return None
+    return marks
+
+
+def writeHistogram(f, name, counts, update):
+    # add counts to an existing resizable dataset, or (re)create it
+    if update:
+        sH = f[name]
+        first = int(np.flatnonzero(counts)[0]) if counts.any() else len(counts)
+        if len(counts) > sH.shape[0]:
+            sH.resize((len(counts),))
+        # new spikes come after the old ones, so only the tail changes
+        if first < len(counts):
+            sH[first:len(counts)] = sH[first:len(counts)] + counts[first:]
+        return sH
+    if name in f:
+        del f[name]
+    return f.create_dataset(name, data=counts, maxshape=(None,), chunks=True)
+
+
+def getSpikesHistory(h5dir, binWidths=(DEFAULT_BIN_WIDTH,), workers=1, incremental=False):
+    timer = StageTimer()
+    binWidths = sorted(set(binWidths))
+    paramsHash = getParamsHash({'binWidths': binWidths})
+    with h5py.File(h5dir + '.h5', 'r') as f:
+        nTimesteps = getNumTimesteps(f)
+        totalNeurons = getNumNeurons(f)
+        marks = loadMarks(f, paramsHash, totalNeurons) if incremental else None
+        if incremental and marks is None:
+            print('No matching earlier run, processing every spike')
+
+    print('Binning spikes of every neuron')
+    results = extractNeurons(h5dir + '.h5', workers, binWidths, nTimesteps, timer=timer, marks=marks)
+
+    timer.begin('reduce')
+    hist = SpikeHistogram(binWidths, nTimesteps)
+    for r in results:
+        hist.merge(r['hist'])
+    lastSpike = max([r['lastSpike'] for r in results] + [-1])
+    processed = np.zeros(totalNeurons, dtype=np.int64) if marks is None else marks.astype(np.int64)
+    processed += np.concatenate([r['counts'] for r in results] + [np.zeros(0, dtype=np.int64)])
+
+    timer.begin('write')
     with h5py.File(h5dir + '.h5', 'r+') as f:
-        print('Get raw spike usage in one array')
-        for n in f.keys():
-            if n.startswith("Neuron_") and n in f:
-                n_arr = np.array(f[n])
-                n_div = (n_arr / 100) # bins each spiketime by rounding the integer down
-
-                raw_spikes = np.append(raw_spikes, n_div)
-
-        # save the raw_spikes array in case of failure
-        # np.save(h5dir + '/raw_spikes.npy', raw_spikes)
-        # raw_spikes = np.load('raw_spikes.npy') # Load raw spikes array
-
-        # Get count of spikes per timestep
-        print('Get spike history count')
-        unique, counts = np.unique(raw_spikes, return_counts=True)
-        print('Number of unique values: ' + str(len(unique)))
-
-        sH = f.create_dataset("spikesHistory", data=arr)
-
-        # add counts to the spike history dataset
-        print('Adding unique counts to spikesHistory')
-        for i in range(len(unique)):
-            u = int(unique[i])
-            sH[u] = counts[i]
-
-
-if __name__ == "__main__": 
-    # example execution: python ./getSpikesHistory.py /CSSDIV/research/biocomputing/data/2025/tR_1.0--fE_0.90_10000
-    h5dir = sys.argv[1]
+        # the histograms never shrink, so an update keeps the old length at least
+        if marks is not None:
+            lastSpike = max(lastSpike, f[getDatasetName(binWidths[0])].attrs.get("lastTimestep", -1))
+        # without simulationEndTime the histogram ends at the last spike
+        if nTimesteps < lastSpike + 1:
+            nTimesteps = lastSpike + 1
+        print('Number of time steps: ' + str(nTimesteps))
+
+        for w, counts in zip(hist.binWidths, hist.result(nTimesteps)):
+            print('Writing ' + getDatasetName(w) + ' (' + str(len(counts)) + ' bins)')
+            sH = writeHistogram(f, getDatasetName(w), counts, marks is not None)
+            sH.attrs["binWidth"] = w
+            sH.attrs["paramsHash"] = paramsHash
+            sH.attrs["lastTimestep"] = lastSpike
+
+        # high-water mark for the next incremental run
+        if PROCESSED in f:
+            del f[PROCESSED]
+        f.create_dataset(PROCESSED, data=processed)
+        f[PROCESSED].attrs["paramsHash"] = paramsHash
+    timer.end()
+
+
+if __name__ == "__main__":
+    # example execution: python ./getSpikesHistory.py /CSSDIV/research/biocomputing/data/2025/tR_1.0--fE_0.90_10000 --bin-widths 10 100 1000
+    parser = argparse.ArgumentParser(description='Add binned spike count datasets to a Graphitti h5 file')
+    parser.add_argument('h5dir', help='Graphitti dataset path without the .h5 extension')
+    parser.add_argument('--bin-widths', type=int, nargs='+', default=[DEFAULT_BIN_WIDTH],
+                        help='bin widths in time steps (default: 100, i.e. 10 ms)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes reading neuron datasets (default: 1)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only add spikes appended since the last run')
+    args = parser.parse_args()
 
     start = time.time()
-    getSpikesHistory(h5dir) 
+    getSpikesHistory(args.h5dir, args.bin_widths, args.workers, args.incremental)
     end = time.time()
 
     elapsed_time = end - start
-    print('Elapsed time: ' + str(elapsed_time) + ' seconds')
\ No newline at end of file
+    print('Elapsed time: ' + str(elapsed_time) + ' seconds')
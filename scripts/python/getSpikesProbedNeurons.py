@@ -1,60 +1,230 @@
 '''
-GETSPIKESPROBEDNEURONS Generate a matrix of numNeurons * maxSpikesPerNeuron
+GETSPIKESPROBEDNEURONS Write every neuron's spike times in a ragged layout
 
-This function reads the Graphitti simulation h5 output. Each column index 
-corresponds to that neuron number. The zero-padded column contains all 
-times when the neuron spiked. 
+This function reads the Graphitti simulation h5 output. The spike times of
+all neurons are stored back to back in a single uint32 spike_times array,
+and offsets holds where each neuron starts, so the spikes of neuron n are
+spike_times[offsets[n]:offsets[n+1]] (offsets has numNeurons + 1 entries).
+Both datasets are chunked and compressed, and neurons are copied one at a
+time, so memory use is bounded by the busiest neuron rather than by
+maxSpikes * numNeurons.
+
+The old zero-padded spikesProbedNeurons matrix (maxSpikesPerNeuron *
+numNeurons, each column index corresponds to that neuron number) is still
+available for the MATLAB scripts with --dense. It is filled one column at a
+time, so it no longer needs to fit in memory either.
+
+With --workers the neurons are read by a process pool (see
+spikeExtraction.py); each worker writes its share to a temporary file next
+to the input, and the shares are copied into spike_times in neuron order.
+
+Reruns replace the datasets. With --incremental, only the spikes appended
+to the Neuron_* datasets since the last run are read, and they are added to
+the end of spike_times as a new segment: offsets then has one row per
+segment, and the spikes of neuron n are the concatenation of
+spike_times[offsets[s, n]:offsets[s, n+1]] over the rows s. A file written
+in a single pass keeps the 1-D offsets described above. The dense matrix is
+grown in place and only the new rows of each column are written.
 
 Input:
 datasetName - Graphitti dataset the entire path can be used; for example
               '/CSSDIV/research/biocomputing/data/2025/tR_1.0--fE_0.90_10000'
+--dense     - also write the zero-padded spikesProbedNeurons matrix
+--workers   - number of processes reading neuron datasets, default 1
+--incremental - only append spikes added since the previous run
 
 Output:
-  - The spikesProbedNeurons dataset is added to the input h5 file
+  - The spike_times and offsets datasets are added to the input h5 file
+  - (optional) The spikesProbedNeurons dataset is added to the input h5 file
 
 Author: Vanessa Arndorfer (vanessa.arndorfer@gmail.com)
-Last updated: 05/03/2025
+Last updated: 10/18/2026
 '''
 
+import argparse
+import os
+import shutil
 import h5py
 import numpy as np
-import sys
 import time
+from spikeExtraction import StageTimer, extractNeurons, getNumNeurons, getParamsHash, getRaggedCounts, \
+    makeTempDir, readNeuron
+
+
+CHUNK_SIZE = 1 << 20    # spike times per HDF5 chunk and per buffered write
+DENSE_CHUNK_ROWS = 1 << 16
+PARAMS_HASH = getParamsHash({'layout': 'ragged', 'segments': True})
+
+
+def appendSpikes(dataset, arrays):
+    # write a batch of neuron arrays to the end of a resizable dataset
+    data = np.concatenate(arrays)
+    start = dataset.shape[0]
+    dataset.resize((start + len(data),))
+    dataset[start:] = data
+
+
+def createSpikeTimes(f):
+    if "spike_times" in f:
+        del f["spike_times"]
+    sT = f.create_dataset("spike_times", shape=(0,), maxshape=(None,),
+                          dtype=np.uint32, chunks=(CHUNK_SIZE,),
+                          compression='gzip', shuffle=True)
+    sT.attrs["paramsHash"] = PARAMS_HASH
+    return sT
+
+
+def loadMarks(f, totalNeurons):
+    # spikes per neuron already in spike_times, or None if it has to be rebuilt
+    if "spike_times" not in f or "offsets" not in f:
+        return None
+    if f["spike_times"].attrs.get("paramsHash") != PARAMS_HASH:
+        return None
+    marks = getRaggedCounts(f["offsets"][()])
+    if len(marks) != totalNeurons:
+        return None
+    return marks
+
+
+def writeOffsets(f, offsets, append):
+    # one row per segment; an appended segment is stacked below the old rows
+    if append:
+        offsets = np.vstack([np.atleast_2d(f["offsets"][()]), offsets])
+    if "offsets" in f:
+        del f["offsets"]
+    f.create_dataset("offsets", data=offsets, compression='gzip')
+    return offsets
+
+
+def writeRagged(f, totalNeurons, marks=None):
+    sT = createSpikeTimes(f) if marks is None else f["spike_times"]
+    offsets = np.zeros(totalNeurons + 1, dtype=np.uint64)
+    offsets[0] = sT.shape[0]
 
+    # buffer small neurons so that every write covers whole chunks
+    pending = []
+    nPending = 0
+    for n in range(totalNeurons):
+        n_arr = readNeuron(f, n, int(marks[n]) if marks is not None else 0)
+        offsets[n + 1] = offsets[n] + len(n_arr)
+        if len(n_arr) > 0:
+            pending.append(n_arr)
+            nPending += len(n_arr)
+        if nPending >= CHUNK_SIZE:
+            appendSpikes(sT, pending)
+            pending = []
+            nPending = 0
+    if nPending > 0:
+        appendSpikes(sT, pending)
 
-def getSpikesProbedNeurons(h5dir): 
-    maxSpikes = 0
-    totalNeurons = 10000
-        
-    with h5py.File(h5dir + '.h5', 'r+') as f:
-        # get the max spikes per array
-        for n in f.keys():
-            if n.startswith("Neuron_") and n in f:
-                n_len = len(f[n])
-                maxSpikes = n_len if n_len > maxSpikes else maxSpikes
+    if marks is not None and offsets[-1] == offsets[0]:
+        return f["offsets"][()]
+    return writeOffsets(f, offsets, marks is not None)
 
-        print('Max Spikes: ' + str(maxSpikes))
 
-        spikes = np.zeros((maxSpikes, totalNeurons))
-        # concatenate neuron arrays with zero padding
+def writeRaggedPieces(f, results, marks=None):
+    # copy the workers' temporary pieces in neuron order, one piece in memory
+    sT = createSpikeTimes(f) if marks is None else f["spike_times"]
+    counts = np.concatenate([r['counts'] for r in results]) if results else np.empty(0)
+    offsets = np.zeros(len(counts) + 1, dtype=np.uint64)
+    offsets[0] = sT.shape[0]
+    offsets[1:] = offsets[0] + np.cumsum(counts)
+    for r in results:
+        piece = np.load(r['piece'])
+        if len(piece) > 0:
+            appendSpikes(sT, [piece])
+        os.remove(r['piece'])
+
+    if marks is not None and offsets[-1] == offsets[0]:
+        return f["offsets"][()]
+    return writeOffsets(f, offsets, marks is not None)
+
+
+def readSegments(sT, offsets, n, first=0):
+    # spike times of neuron n from segment first on
+    return np.concatenate([sT[o[n]:o[n + 1]] for o in offsets[first:]])
+
+
+def writeDense(f, offsets, marks=None):
+    # zero-padded maxSpikes * numNeurons view for the MATLAB scripts
+    offsets = np.atleast_2d(offsets)
+    counts = getRaggedCounts(offsets)
+    totalNeurons = len(counts)
+    maxSpikes = int(counts.max()) if totalNeurons > 0 else 0
+    print('Max Spikes: ' + str(maxSpikes))
+    sT = f["spike_times"]
+
+    # an update only writes the rows each neuron gained in the last segment
+    if marks is not None and "spikesProbedNeurons" in f \
+            and f["spikesProbedNeurons"].maxshape[0] is None:
+        sPN = f["spikesProbedNeurons"]
+        if maxSpikes > sPN.shape[0]:
+            sPN.resize((maxSpikes, totalNeurons))
+        last = offsets[-1]
         for n in range(totalNeurons):
-            key = "Neuron_" + str(n)
-            if key in f:
-                n_arr = np.array(f[key])
-                n_t = n_arr[:, np.newaxis]
-                n_len = len(n_t)
-                spikes[0:n_len, n] = n_t[:,0]
-
-        sPN = f.create_dataset("spikesProbedNeurons", data=spikes)
-    
-    
-if __name__ == "__main__": 
-    # example execution: python ./getSpikesHistory.py /CSSDIV/research/biocomputing/data/2025/tR_1.0--fE_0.90_10000
-    h5dir = sys.argv[1]
-    
+            if counts[n] > marks[n]:
+                sPN[int(marks[n]):int(counts[n]), n] = sT[last[n]:last[n + 1]]
+        return
+
+    if "spikesProbedNeurons" in f:
+        del f["spikesProbedNeurons"]
+    chunks = (max(1, min(maxSpikes, DENSE_CHUNK_ROWS)), 1)
+    sPN = f.create_dataset("spikesProbedNeurons", shape=(maxSpikes, totalNeurons),
+                           maxshape=(None, totalNeurons), dtype=np.float64,
+                           chunks=chunks, compression='gzip', fillvalue=0)
+    for n in range(totalNeurons):
+        if counts[n] > 0:
+            sPN[0:counts[n], n] = readSegments(sT, offsets, n)
+
+
+def getSpikesProbedNeurons(h5dir, dense=False, workers=1, incremental=False):
+    timer = StageTimer()
+    marks = None
+    if incremental:
+        with h5py.File(h5dir + '.h5', 'r') as f:
+            marks = loadMarks(f, getNumNeurons(f))
+        if marks is None:
+            print('No matching earlier run, processing every spike')
+
+    if workers > 1:
+        tmpdir = makeTempDir(h5dir + '.h5')
+        try:
+            results = extractNeurons(h5dir + '.h5', workers, tmpdir=tmpdir, timer=timer, marks=marks)
+            timer.begin('write')
+            with h5py.File(h5dir + '.h5', 'r+') as f:
+                offsets = writeRaggedPieces(f, results, marks)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    else:
+        timer.begin('extract')
+        with h5py.File(h5dir + '.h5', 'r+') as f:
+            totalNeurons = getNumNeurons(f)
+            print('Number of neurons: ' + str(totalNeurons))
+            offsets = writeRagged(f, totalNeurons, marks)
+    print('Total spikes: ' + str(int(getRaggedCounts(offsets).sum())))
+
+    if dense:
+        timer.begin('dense')
+        with h5py.File(h5dir + '.h5', 'r+') as f:
+            writeDense(f, offsets, marks)
+    timer.end()
+
+
+if __name__ == "__main__":
+    # example execution: python ./getSpikesProbedNeurons.py /CSSDIV/research/biocomputing/data/2025/tR_1.0--fE_0.90_10000
+    parser = argparse.ArgumentParser(description='Add the ragged spike_times/offsets datasets to a Graphitti h5 file')
+    parser.add_argument('h5dir', help='Graphitti dataset path without the .h5 extension')
+    parser.add_argument('--dense', action='store_true',
+                        help='also write the zero-padded spikesProbedNeurons matrix')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes reading neuron datasets (default: 1)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only append spikes added since the last run')
+    args = parser.parse_args()
+
     start = time.time()
-    getSpikesProbedNeurons(h5dir) 
+    getSpikesProbedNeurons(args.h5dir, args.dense, args.workers, args.incremental)
     end = time.time()
 
     elapsed_time = end - start
-    print('Elapsed time: ' + str(elapsed_time) + ' seconds')
\ No newline at end of file
+    print('Elapsed time: ' + str(elapsed_time) + ' seconds')
@@ -2,52 +2,104 @@
 
 #import everything needed
 from optparse import OptionParser
+from concurrent.futures import ProcessPoolExecutor
 import xml.etree.ElementTree as ET
+import numpy as np
 import subprocess
 import sys
 import os
 
 
-#parse args
-parser = OptionParser()
-parser.add_option("-f", "--file", dest="filename",
-                    help = "xml file to read in", type="string", action="store")
-parser.add_option("-g", "--gnuplot", action="store_false", dest="R")
-parser.add_option("-r", "--R", action="store_true", dest="R")
-(option, args) = parser.parse_args()
+#create directory to dump images and files into
+directory = 'graphs'
 
-if(len(option.filename) <= 0):
-    sys.exit(0)
 
-R = False;
+#parse the matrix text straight into an array of (row, value) pairs
+def parseMatrix(text, rows, columns):
+    values = np.fromstring(text, sep=' ')
+    rowIndex = np.arange(len(values)) // columns
+    return rowIndex, values
 
-if(option.R):
-    R = True;
 
-#set up xml tree
-tree = ET.parse(option.filename)
-root = tree.getroot()
+#write the matrix in the two column format the gnuplot/R scripts read;
+#values keep their text from the XML, so unchanged matrices export unchanged
+def writeMatrix(path, text, columns):
+    tokens = text.split()
+    rowIndex = (np.arange(len(tokens)) // columns).tolist()
+    with open(path, 'w') as output:
+        output.write(''.join('%d %s\n' % pair for pair in zip(rowIndex, tokens)))
 
-#create directory to dump images and files into
-directory = 'graphs'
-if not os.path.exists(directory):
-    os.makedirs(directory)
-
-for child in root:
-    with open(directory+'/'+child.get('name'), 'w') as output:
-        arr = child.text.split()
-        rows = int(child.get('rows'))
-        columns = int(child.get('columns'))
-        for x in range(0, len(arr)):
-            temp = str(x/columns) + ' ' + arr[x] + '\n'
-            output.write(temp)
-        output.close()
+
+#render one matrix with gnuplot or R through a temporary data file
+def renderExternal(name, text, rows, columns, R):
+    dataFile = directory+'/'+name
+    writeMatrix(dataFile, text, columns)
 
     if(R):
-        command = 'r '+directory+'/'+child.get('name')+' '+directory+'/'+child.get('name')+'.png < rScript.R'
+        with open('rScript.R') as script:
+            subprocess.run(['r', dataFile, dataFile+'.png'], stdin=script, stdout=subprocess.PIPE)
     else:
-        command = 'gnuplot -e \"filename=\''+directory+'/'+child.get('name')+'\'; outputname=\''+directory+'/'+child.get('name')+'.png\'\" gnuplotScript.cfg'
-    
-    process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE)
-    tempOutput = process.communicate()[0]    
-    os.remove(directory+'/'+child.get('name'))
+        subprocess.run(['gnuplot', '-e', "filename='"+dataFile+"'; outputname='"+dataFile+".png'",
+                        'gnuplotScript.cfg'], stdout=subprocess.PIPE)
+    os.remove(dataFile)
+    return name
+
+
+#render one matrix in-process with a headless matplotlib, no temp files
+def renderMatplotlib(name, text, rows, columns):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    rowIndex, values = parseMatrix(text, rows, columns)
+    fig, ax = plt.subplots()
+    ax.plot(rowIndex, values, '.', markersize=2)
+    ax.set_title(name)
+    fig.savefig(directory+'/'+name+'.png')
+    plt.close(fig)
+    return name
+
+
+def main():
+    #parse args
+    parser = OptionParser()
+    parser.add_option("-f", "--file", dest="filename",
+                        help = "xml file to read in", type="string", action="store")
+    parser.add_option("-g", "--gnuplot", action="store_false", dest="R")
+    parser.add_option("-r", "--R", action="store_true", dest="R")
+    parser.add_option("-m", "--matplotlib", action="store_true", dest="matplotlib",
+                        help = "render in-process with matplotlib instead of gnuplot/R")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int", default=os.cpu_count(),
+                        help = "number of matrices rendered at the same time")
+    (option, args) = parser.parse_args()
+
+    if(not option.filename):
+        sys.exit(0)
+
+    R = False;
+
+    if(option.R):
+        R = True;
+
+    #set up xml tree
+    tree = ET.parse(option.filename)
+    root = tree.getroot()
+
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    #every matrix is independent, so render them concurrently
+    with ProcessPoolExecutor(max_workers=max(1, option.jobs)) as pool:
+        jobs = []
+        for child in root:
+            matrix = (child.get('name'), child.text, int(child.get('rows')), int(child.get('columns')))
+            if(option.matplotlib):
+                jobs.append(pool.submit(renderMatplotlib, *matrix))
+            else:
+                jobs.append(pool.submit(renderExternal, *matrix, R))
+        for job in jobs:
+            job.result()
+
+
+if __name__ == '__main__':
+    main()
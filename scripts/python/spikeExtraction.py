@@ -0,0 +1,217 @@
+'''
+SPIKEEXTRACTION Shared helpers for reading the per-neuron Neuron_* datasets
+
+Used by getSpikesHistory.py and getSpikesProbedNeurons.py. With more than
+one worker the neurons are split into contiguous ranges holding roughly
+the same number of spikes, and each range is read by a process of its own
+through its own read-only h5py handle. Workers return partial histograms
+(summed by the caller) and write their share of the ragged spike times to
+a temporary .npy file, which the caller copies into the output in neuron
+order. Each stage is timed so it is easy to see where a run stops scaling.
+
+For incremental runs the caller passes marks, the number of spikes of each
+neuron that were already processed. Neuron_* datasets only grow at the
+end, so only dataset[marks[n]:] is read. getParamsHash() fingerprints the
+parameters a derived dataset was built with, so that a rerun with
+different parameters starts over instead of mixing results.
+
+Last updated: 10/18/2026
+'''
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import h5py
+import numpy as np
+
+
+MAX_TIMESTEP = np.iinfo(np.uint32).max
+
+
+def getNumNeurons(f):
+    # neuron datasets are named Neuron_<index>, some may be missing
+    ids = [int(n[len('Neuron_'):]) for n in f.keys() if n.startswith('Neuron_')]
+    return max(ids) + 1 if ids else 0
+
+
+def readNeuron(f, n, start=0):
+    # spike times of neuron n from position start on
+    key = 'Neuron_' + str(n)
+    if key not in f:
+        return np.empty(0, dtype=np.uint32)
+
+    n_arr = f[key][start:]
+    if n_arr.size > 0 and (n_arr.min() < 0 or n_arr.max() > MAX_TIMESTEP):
+        raise ValueError(key + ' has spike times outside the uint32 range')
+    return n_arr.astype(np.uint32, copy=False)
+
+
+def getSpikeCounts(f, totalNeurons):
+    # dataset shapes are metadata, so this does not read any spike times
+    counts = np.zeros(totalNeurons, dtype=np.int64)
+    for n in range(totalNeurons):
+        key = 'Neuron_' + str(n)
+        if key in f:
+            counts[n] = f[key].shape[0]
+    return counts
+
+
+def getParamsHash(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def getRaggedCounts(offsets):
+    # spikes per neuron summed over every segment of a ragged offsets dataset
+    return np.diff(np.atleast_2d(offsets), axis=1).sum(axis=0)
+
+
+def getNeuronRanges(counts, parts):
+    # contiguous neuron ranges holding about the same number of spikes
+    total = np.cumsum(counts)
+    targets = total[-1] * np.arange(1, parts) / parts if len(total) > 0 else []
+    bounds = [0] + [int(b) + 1 for b in np.searchsorted(total, targets)] + [len(counts)]
+    bounds = sorted(set(min(b, len(counts)) for b in bounds))
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+
+# -----------------------------------------------------------------------------
+# CLASS: SpikeHistogram()
+# spike counts per bin for one or more bin widths, grown as later spikes show up
+# -----------------------------------------------------------------------------
+class SpikeHistogram(object):
+    def __init__(self, binWidths, nTimesteps=0):
+        self.binWidths = [int(w) for w in binWidths]
+        self.nTimesteps = nTimesteps
+        self.counts = [np.zeros(-(-nTimesteps // w), dtype=np.uint32)
+                       for w in self.binWidths]
+
+    def __grow(self, nTimesteps):
+        # at least double so that growing stays amortized O(1) per bin
+        nTimesteps = max(nTimesteps, 2 * self.nTimesteps)
+        for i, w in enumerate(self.binWidths):
+            grown = np.zeros(-(-nTimesteps // w), dtype=np.uint32)
+            grown[:len(self.counts[i])] = self.counts[i]
+            self.counts[i] = grown
+        self.nTimesteps = nTimesteps
+
+    # -----------------------------------------------------------------------------
+    # add one neuron's (or any batch of) spike times to every histogram
+    # -----------------------------------------------------------------------------
+    def add(self, spikeTimes):
+        if len(spikeTimes) == 0:
+            return
+        spikeTimes = np.asarray(spikeTimes, dtype=np.int64)
+        needed = int(spikeTimes.max()) + 1
+        if needed > self.nTimesteps:
+            self.__grow(needed)
+        for w, c in zip(self.binWidths, self.counts):
+            np.add.at(c, spikeTimes // w, 1)
+
+    # -----------------------------------------------------------------------------
+    # add the counts of another histogram with the same bin widths
+    # -----------------------------------------------------------------------------
+    def merge(self, other):
+        if other.nTimesteps > self.nTimesteps:
+            self.__grow(other.nTimesteps)
+        for c, o in zip(self.counts, other.counts):
+            c[:len(o)] += o
+
+    # -----------------------------------------------------------------------------
+    # binned counts covering nTimesteps time steps
+    # -----------------------------------------------------------------------------
+    def result(self, nTimesteps):
+        return [c[:-(-nTimesteps // w)] for w, c in zip(self.binWidths, self.counts)]
+
+
+# -----------------------------------------------------------------------------
+# CLASS: StageTimer()
+# wall clock time of each named stage, printed as the stage finishes
+# -----------------------------------------------------------------------------
+class StageTimer(object):
+    def __init__(self):
+        self.times = {}
+        self.stage = None
+        self.start = None
+
+    def begin(self, stage):
+        self.end()
+        self.stage = stage
+        self.start = time.time()
+
+    def end(self):
+        if self.stage is not None:
+            self.times[self.stage] = time.time() - self.start
+            print('  ' + self.stage + ': ' + '%.2f' % self.times[self.stage] + ' seconds')
+            self.stage = None
+
+
+# -----------------------------------------------------------------------------
+# extractRange()
+# read neurons [start, stop) with a private h5py handle (runs in a worker)
+# -----------------------------------------------------------------------------
+def extractRange(h5file, start, stop, binWidths, nTimesteps, tmpdir, marks=None):
+    t0 = time.time()
+    hist = SpikeHistogram(binWidths, nTimesteps) if binWidths else None
+    counts = np.zeros(stop - start, dtype=np.int64)
+    lastSpike = -1
+    arrays = []
+    with h5py.File(h5file, 'r') as f:
+        for n in range(start, stop):
+            n_arr = readNeuron(f, n, int(marks[n - start]) if marks is not None else 0)
+            counts[n - start] = len(n_arr)
+            if len(n_arr) > 0:
+                lastSpike = max(lastSpike, int(n_arr.max()))
+                if hist is not None:
+                    hist.add(n_arr)
+                if tmpdir is not None:
+                    arrays.append(n_arr)
+
+    # the ragged share goes through disk so the parent never holds all of it
+    piece = None
+    if tmpdir is not None:
+        piece = os.path.join(tmpdir, 'neurons_' + str(start) + '.npy')
+        data = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.uint32)
+        np.save(piece, data)
+    return {'start': start, 'stop': stop, 'hist': hist, 'counts': counts,
+            'lastSpike': lastSpike, 'piece': piece, 'seconds': time.time() - t0}
+
+
+# -----------------------------------------------------------------------------
+# extractNeurons()
+# run extractRange() over all neurons, in a process pool when workers > 1
+# returns the per-range results in neuron order
+# -----------------------------------------------------------------------------
+def extractNeurons(h5file, workers, binWidths=None, nTimesteps=0, tmpdir=None, timer=None, marks=None):
+    timer = timer if timer is not None else StageTimer()
+
+    timer.begin('scan')
+    with h5py.File(h5file, 'r') as f:
+        totalNeurons = getNumNeurons(f)
+        counts = getSpikeCounts(f, totalNeurons)
+    if marks is not None:
+        counts = counts - marks
+    ranges = getNeuronRanges(counts, max(1, workers))
+    print('Number of neurons: ' + str(totalNeurons) + ', neuron ranges: ' + str(len(ranges)))
+    print('Spikes to process: ' + str(int(counts.sum())))
+
+    timer.begin('extract')
+    args = [(h5file, start, stop, binWidths, nTimesteps, tmpdir,
+             marks[start:stop] if marks is not None else None) for start, stop in ranges]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(extractRange, *zip(*args)))
+    else:
+        results = [extractRange(*a) for a in args]
+    timer.end()
+    busy = sum(r['seconds'] for r in results)
+    print('  worker time: ' + '%.2f' % busy + ' seconds in total, '
+          + '%.2f' % max([r['seconds'] for r in results] + [0]) + ' seconds slowest')
+    return results
+
+
+def makeTempDir(h5file):
+    # next to the input, since the pieces add up to the size of the ragged data
+    return tempfile.mkdtemp(prefix='.spikeExtraction_', dir=os.path.dirname(os.path.abspath(h5file)))